@@ -1,26 +1,68 @@
-from flask import Flask, render_template
+import time
+from flask import Flask, render_template, request, g
 from flask_restful import Api
 from services.video_service import VideoService
 from services.youtube_service import VideoDownloadService
+from services.job_service import TranscriptionJobService
+from services.ingest_service import IngestRequest
+from services.url_pipeline import UrlIngestPipeline
+from services.metrics_service import metrics
 from config import Config
 from flask_cors import CORS
 
 import os
-from resources.history_resource import HistoryResource, RecentHistoryResource, HistoryDetailResource
-from resources.transcription_resource import TranscribeVideoResource
+from resources.history_resource import HistoryResource, RecentHistoryResource, HistoryDetailResource, \
+    HistoryTimelineResource, HistorySegmentsResource
+from resources.transcription_resource import TranscribeVideoResource, TranscriptionJobResource
 from resources.upload_resource import UploadVideoResource
-from resources.youtube_resource import YoutubeDownloadResource
+from resources.youtube_resource import YoutubeDownloadResource, DownloadPipelineResource
 from resources.progress_resource import ProgressResource
 from resources.video_file_resource import VideoFileResource
 from resources.player_resource import PlayerResource
+from resources.metrics_resource import MetricsResource, PrometheusMetricsResource
+from resources.search_resource import SearchResource
 
 
 app = Flask(__name__)
+app.request_class = IngestRequest  # 上传文件边接收边校验并写入 records 目录
+app.config['MAX_CONTENT_LENGTH'] = Config.MAX_VIDEO_SIZE + 1024 * 1024  # 预留 multipart 表单的开销
 video_service = VideoService()
 youtube_service = VideoDownloadService()
+transcription_job_service = TranscriptionJobService(video_service)
+url_pipeline = UrlIngestPipeline(youtube_service, video_service, transcription_job_service)
 api = Api(app)
 CORS(app, resources={r"/player/*": {"origins": "*"}})  # 允许所有来源访问 /player/*
 
+# 各队列的当前深度，在导出指标时读取
+metrics.register_gauge('download_queue_depth', lambda: [
+    ({'host': host}, count) for host, count in youtube_service.scheduler.stats()['queued_by_host'].items()
+])
+metrics.register_gauge('downloads_running', lambda: [
+    ({'host': host}, count) for host, count in youtube_service.scheduler.stats()['running'].items()
+])
+metrics.register_gauge('transcription_jobs_active', transcription_job_service.queue_depth)
+metrics.register_gauge('asr_batch_pending', video_service.asr_batcher.pending_count)
+metrics.register_gauge('asr_tasks_in_flight', video_service.asr_batcher.poller.in_flight)
+metrics.register_gauge('ingest_pipelines_running', url_pipeline.running_count)
+
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由模板记录请求耗时和状态码（不用实际路径，避免 task_id 等参数撑爆标签）"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.observe('http_request_seconds', time.perf_counter() - started,
+                        endpoint=endpoint, method=request.method)
+        metrics.inc('http_requests_total', endpoint=endpoint, method=request.method,
+                    status=str(response.status_code))
+    return response
+
 
 
 @app.route('/')
@@ -30,15 +72,22 @@ def index():
 
 api.add_resource(UploadVideoResource, '/upload') 
 api.add_resource(YoutubeDownloadResource, '/download')
+api.add_resource(DownloadPipelineResource, '/download/<task_id>/pipeline')
 api.add_resource(ProgressResource, '/progress/<task_id>')
 api.add_resource(PlayerResource, '/player/<path:video_path>')
 
 api.add_resource(VideoFileResource, '/video/<path:filename>')
 api.add_resource(TranscribeVideoResource, '/transcribe')
+api.add_resource(TranscriptionJobResource, '/transcribe/<job_id>')
 api.add_resource(HistoryResource, '/api/history') # 添加 HistoryResource 到 /api/history 路由
     
 api.add_resource(RecentHistoryResource, '/api/history/recent')
 api.add_resource(HistoryDetailResource, '/api/history/<history_id>')
+api.add_resource(HistoryTimelineResource, '/api/history/<history_id>/timeline')
+api.add_resource(HistorySegmentsResource, '/api/history/<history_id>/segments')
+api.add_resource(SearchResource, '/api/search')
+api.add_resource(MetricsResource, '/api/metrics')
+api.add_resource(PrometheusMetricsResource, '/metrics')
 
 if __name__ == '__main__':
         # 确保必要的目录存在
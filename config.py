@@ -10,31 +10,117 @@ class Config:
     RECORDS_FOLDER = os.path.join(BASE_DIR, 'records')
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
     DOWNLOAD_FOLDER = os.path.join(BASE_DIR, 'downloads')
+    CACHE_FOLDER = os.path.join(BASE_DIR, 'cache')
+    TRANSCRIPTION_CACHE_PATH = os.path.join(CACHE_FOLDER, 'transcriptions.db')  # 按内容哈希缓存转录结果
+    SEARCH_INDEX_PATH = os.path.join(CACHE_FOLDER, 'search_index.db')  # 转录文本全文索引
+    SEARCH_MAX_RESULTS = 50  # 单次搜索最多返回的命中数
     
     # 视频文件限制
     MAX_VIDEO_SIZE = 500 * 1024 * 1024  # 500MB
-    MAX_VIDEO_DURATION = 1800  # 30分钟
+    MAX_VIDEO_DURATION = 1800  # 30分钟，超过后分段转写
+
+    # 长音视频分段转写：在静音处切成多段并发转写，再按时间偏移拼接
+    LONG_MEDIA_MAX_DURATION = int(os.getenv('LONG_MEDIA_MAX_DURATION', 4 * 60 * 60))  # 分段转写允许的最长时长
+    LONG_MEDIA_CHUNK_SECONDS = 10 * 60  # 每段的目标时长
+    LONG_MEDIA_SEARCH_WINDOW = 60  # 在目标切分点前后多少秒内寻找静音
+    SILENCE_NOISE = '-35dB'  # 低于该音量视为静音
+    SILENCE_MIN_DURATION = 0.4  # 最短静音时长（秒）
     ALLOWED_EXTENSIONS = {'mp4'}
+
+    # 转录任务队列配置
+    TRANSCRIBE_MAX_WORKERS = int(os.getenv('TRANSCRIBE_MAX_WORKERS', 2))  # 同时处理的转录任务数
+    TRANSCRIBE_MAX_PENDING = int(os.getenv('TRANSCRIBE_MAX_PENDING', 20))  # 排队+处理中的任务上限
+    TRANSCRIBE_JOB_TTL = 60 * 60  # 已结束任务保留1小时
     
+    # 视频文件发送配置
+    # 设置为 X-Sendfile 或 X-Accel-Redirect 时由前端代理（Apache/Nginx）直接发送文件
+    MEDIA_SENDFILE_HEADER = os.getenv('MEDIA_SENDFILE_HEADER', '')
+    MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-records')  # Nginx internal location
+
+    # 音频提取配置（上传 OSS 前只保留音轨）
+    EXTRACT_AUDIO_BEFORE_UPLOAD = os.getenv('EXTRACT_AUDIO_BEFORE_UPLOAD', 'true').lower() == 'true'
+    FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+    FFPROBE_BINARY = os.getenv('FFPROBE_BINARY', 'ffprobe')  # 仅在 MP4 解析失败时使用
+    AUDIO_SAMPLE_RATE = 16000  # SenseVoice 推荐 16kHz
+    AUDIO_BITRATE = '32k'
+    AUDIO_EXTRACT_TIMEOUT = 10 * 60  # 提取音频最长10分钟
+
     # OSS配置
     OSS_ACCESS_KEY_ID = os.getenv('OSS_ACCESS_KEY_ID')
     OSS_ACCESS_KEY_SECRET = os.getenv('OSS_ACCESS_KEY_SECRET')
     OSS_ENDPOINT = os.getenv('OSS_ENDPOINT')
     OSS_BUCKET_NAME = os.getenv('OSS_BUCKET_NAME')
+    OSS_MULTIPART_THRESHOLD = int(os.getenv('OSS_MULTIPART_THRESHOLD', 10 * 1024 * 1024))  # 超过10MB使用分片上传
+    OSS_PART_SIZE = int(os.getenv('OSS_PART_SIZE', 8 * 1024 * 1024))  # 每个分片8MB
+    OSS_UPLOAD_THREADS = int(os.getenv('OSS_UPLOAD_THREADS', 4))  # 并发上传的分片数
+    OSS_UPLOAD_RETRIES = int(os.getenv('OSS_UPLOAD_RETRIES', 3))  # 上传中断后的续传次数
+    OSS_CHECKPOINT_DIR = 'oss_checkpoints'  # 断点记录目录（位于 CACHE_FOLDER 下）
+    EXTRACTED_AUDIO_DIR = 'extracted_audio'  # 按内容哈希命名的提取音轨（位于 CACHE_FOLDER 下），进程中断后续传时复用
     
+    # 远程调用（OSS、DashScope、Supabase、转录结果下载、yt-dlp）的连接池和超时
+    REMOTE_POOL_SIZE = int(os.getenv('REMOTE_POOL_SIZE', 10))  # 每个主机保持的 keep-alive 连接数
+    REMOTE_CONNECT_TIMEOUT = float(os.getenv('REMOTE_CONNECT_TIMEOUT', 5))  # 建立连接超时（秒）
+    REMOTE_READ_TIMEOUT = float(os.getenv('REMOTE_READ_TIMEOUT', 30))  # 读取响应超时（秒）
+    REMOTE_RETRIES = int(os.getenv('REMOTE_RETRIES', 3))  # 连接失败和 429/5xx 的重试次数
+
     # DashScope配置
     DASHSCOPE_API_KEY = os.getenv('DASHSCOPE_API_KEY')
+    DASHSCOPE_REQUEST_TIMEOUT = int(os.getenv('DASHSCOPE_REQUEST_TIMEOUT', 30))  # SDK 默认 300 秒
+    ASR_MODEL = 'sensevoice-v1'
+    ASR_LANGUAGE_HINTS = ['en']
+    # 多个待转写文件合并为一个 SenseVoice 任务：凑够 ASR_BATCH_SIZE 个或最早的文件等待 ASR_BATCH_WAIT 秒后提交
+    # 转录并发数不大，几乎凑不到一批，等待时间只取几百毫秒，避免每个任务都白等；长视频的分段一起提交，不等待
+    ASR_BATCH_SIZE = int(os.getenv('ASR_BATCH_SIZE', 8))
+    ASR_BATCH_WAIT = float(os.getenv('ASR_BATCH_WAIT', 0.3))
+    # 所有进行中的转写任务由一个 asyncio 轮询器查询状态
+    ASR_POLL_MIN_INTERVAL = 1  # 轮询间隔下限（秒）
+    ASR_POLL_MAX_INTERVAL = 15  # 轮询间隔上限（秒）
+    ASR_POLL_WORKERS = int(os.getenv('ASR_POLL_WORKERS', 2))  # 同时发出的查询请求数
+    ASR_POLL_MAX_ERRORS = 5  # 连续查询失败多少次后放弃任务
+    ASR_REALTIME_FACTOR = 0.1  # 预计转写耗时与音频时长之比，用于决定何时开始密集轮询
     
+    # 追踪：保留最近多少次处理的各阶段明细（/api/metrics 中查看）
+    TRACE_HISTORY = int(os.getenv('TRACE_HISTORY', 50))
+
+    # 下载进度推送配置
+    PROGRESS_MAX_RATE = 4  # SSE 每秒最多推送的进度次数
+    PROGRESS_HEARTBEAT = 15  # SSE 心跳间隔（秒）
+    PROGRESS_TTL = 5 * 60  # 已结束任务的进度保留5分钟
+    PROGRESS_STALE_TTL = 60 * 60  # 超过1小时没有更新的任务视为失效
+
+    # 下载调度配置：固定数量的下载线程，每个站点单独限制并发数，其余请求排队
+    DOWNLOAD_WORKERS = int(os.getenv('DOWNLOAD_WORKERS', 3))
+    DOWNLOAD_MAX_PENDING = int(os.getenv('DOWNLOAD_MAX_PENDING', 50))  # 排队中的最大任务数
+    DOWNLOAD_HOST_LIMITS = {
+        'youtube': int(os.getenv('DOWNLOAD_YOUTUBE_CONCURRENCY', 2)),
+        'bilibili': int(os.getenv('DOWNLOAD_BILIBILI_CONCURRENCY', 2)),
+    }
+
+    # 下载模式：audio_first 只下载音轨供转录，播放器第一次打开时再下载视频画面；full 直接下载合并好的视频
+    DOWNLOAD_MODE = os.getenv('DOWNLOAD_MODE', 'audio_first')
+
+    # yt-dlp 提取结果缓存（格式直链会过期，缓存时间不宜过长）
+    YTDLP_INFO_CACHE_TTL = 10 * 60
+    YTDLP_INFO_CACHE_MAX_ENTRIES = 64
+
     # YouTube下载配置
     YOUTUBE_DEFAULT_FORMAT = 'mp4'
     YOUTUBE_DEFAULT_RESOLUTION = '720'
     
     # Redis配置
-    REDIS_HOST = os.getenv('REDIS_HOST')
-    REDIS_PORT = int(os.getenv('REDIS_PORT'))
-    REDIS_DB = int(os.getenv('REDIS_DB'))
+    REDIS_HOST = os.getenv('REDIS_HOST', 'localhost')
+    REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
+    REDIS_DB = int(os.getenv('REDIS_DB', 0))
     REDIS_PASSWORD = os.getenv('REDIS_PASSWORD')
     REDIS_CACHE_TTL = 24 * 60 * 60  # 缓存24小时
+
+    # 历史记录列表中转录文本预览的最大长度
+    HISTORY_PREVIEW_LENGTH = 120
+
+    # 历史记录缓存配置
+    HISTORY_CACHE_BACKEND = os.getenv('HISTORY_CACHE_BACKEND', 'memory')  # memory 或 redis
+    HISTORY_CACHE_MAX_ENTRIES = int(os.getenv('HISTORY_CACHE_MAX_ENTRIES', 1024))  # 进程内缓存的最大条目数
+    HISTORY_CACHE_TTL = REDIS_CACHE_TTL
     
     # YouTube配置
     YOUTUBE_COOKIES_PATH = os.getenv('YOUTUBE_COOKIES_PATH')
@@ -44,12 +130,17 @@ class Config:
     #Supabase
     SUPABASE_URL=os.getenv('SUPABASE_URL')
     SUPABASE_KEY=os.getenv('SUPABASE_KEY')
+
+    # 历史记录存储：supabase 或 sqlite（本地 WAL 数据库，适合单机部署和离线运行）
+    HISTORY_BACKEND = os.getenv('HISTORY_BACKEND', 'supabase')
+    HISTORY_DB_PATH = os.getenv('HISTORY_DB_PATH', os.path.join(BASE_DIR, 'data', 'history.db'))
     
     @classmethod
     def init_folders(cls):
         """初始化必要的文件夹"""
-        if not os.path.exists(cls.RECORDS_FOLDER):
-            os.makedirs(cls.RECORDS_FOLDER)
+        for folder in [cls.RECORDS_FOLDER, cls.CACHE_FOLDER]:
+            if not os.path.exists(folder):
+                os.makedirs(folder)
         
     @classmethod
     def allowed_file(cls, filename):
@@ -1,37 +1,52 @@
-from flask import request, jsonify
+from flask import request, jsonify, make_response
 from flask_restful import Resource
 
+
+def not_modified(etag):
+    """客户端缓存的 ETag 与当前版本一致时返回 304，不查询数据库"""
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        return with_etag(response, etag)
+    return None
+
+
+def with_etag(response, etag):
+    """为响应附加 ETag，no-cache 让浏览器每次都带上 If-None-Match 重新验证"""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 class HistoryResource(Resource):
     def get(self):
+        """按游标分页获取历史记录，翻页时传入上一页返回的 next_cursor"""
         try:
-            page = request.args.get('page', 1, type=int)
-            per_page = request.args.get('per_page', 10, type=int)
+            cursor = request.args.get('cursor', '')
+            per_page = min(max(request.args.get('per_page', 10, type=int), 1), 100)
             from app import video_service  # 延迟导入
 
-            # 从 Supabase 查询历史记录
-            start = (page - 1) * per_page
-            end = start + per_page - 1
-
-            # 假设你的 Supabase 表名为 'video_history'
-            result = video_service.supabase.table('video_history') \
-                .select('*') \
-                .order('created_at', desc=True) \
-                .range(start, end) \
-                .execute()
-
-            if result.data:
-                return jsonify({
-                    'items': result.data,  # 直接返回 Supabase 查询结果
-                    'page': page,
-                    'per_page': per_page
-                })
-            else:
-                print("获取历史记录失败:", result)
-                return jsonify({'error': '获取历史记录失败'}), 500
+            # 在查询之前取版本号，查询期间发生的写入会让下一次请求拿到新数据
+            etag = video_service.history_etag('list', cursor, per_page)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+            # 查询历史记录（优先读取缓存）
+            try:
+                items, next_cursor = video_service.get_history_page(cursor or None, per_page)
+            except ValueError as e:
+                return {'error': str(e)}, 400
+
+            return with_etag(jsonify({
+                'items': items,
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None
+            }), etag)
 
         except Exception as e:
-            print(f"从 Supabase 获取历史记录失败: {str(e)}")
-            return jsonify({'error': str(e)}), 500
+            print(f"获取历史记录失败: {str(e)}")
+            return {'error': str(e)}, 500
         
 
 class RecentHistoryResource(Resource):
@@ -40,44 +55,50 @@ class RecentHistoryResource(Resource):
             # 需要在 app.py 中导入 video_service
             from app import video_service
 
-            # 从 Supabase 查询最近历史记录
+            # 首页每5秒轮询一次，历史记录没有变化时直接返回 304
+            etag = video_service.history_etag('recent', 10)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+            # 查询最近历史记录
             history_list = video_service.get_recent_history(limit=10)
-            return jsonify({
+            return with_etag(jsonify({
                     'success': True,
                     'history': history_list
-                })
+                }), etag)
 
         except Exception as e:
-            return jsonify({'success': False, 'error': str(e)}), 500
+            return {'success': False, 'error': str(e)}, 500
 
 class HistoryDetailResource(Resource):
     def get(self, history_id):
-        """根据 Supabase 中的 ID 获取视频记录详情"""
+        """根据 ID 获取视频记录详情"""
         try:
             from app import video_service  # 延迟导入
 
-            # 从 Supabase 查询单个记录
-            # 假设你的 Supabase 表名为 'video_history'，主键字段名为 'id'
-            result = video_service.supabase.table('video_history') \
-                .select('*') \
-                .eq('id', history_id) \
-                .single() \
-                .execute()
+            etag = video_service.history_etag('detail', history_id)
+            cached = not_modified(etag)
+            if cached:
+                return cached
 
-            if result.data:
-                return jsonify({
+            # 查询单个记录（优先读取缓存）
+            history_item = video_service.get_history_detail(history_id)
+
+            if history_item:
+                return with_etag(jsonify({
                     'success': True,
-                    'history_item': result.data
-                })
+                    'history_item': history_item
+                }), etag)
             else:
-                return jsonify({
+                return {
                     'success': False,
                     'error': '历史记录未找到'
-                }), 404
+                }, 404
 
         except Exception as e:
-            print(f"从 Supabase 获取历史记录详情失败: {str(e)}")
-            return jsonify({'success': False, 'error': str(e)}), 500
+            print(f"获取历史记录详情失败: {str(e)}")
+            return {'success': False, 'error': str(e)}, 500
 
 
     def delete(self, history_id):
@@ -91,10 +112,76 @@ class HistoryDetailResource(Resource):
                     'message': message
                 })
             else:
-                return jsonify({
+                return {
                     'success': False,
                     'error': message
-                }), 400
+                }, 400
+
+        except Exception as e:
+            return {'success': False, 'error': str(e)}, 500
+
+
+class HistoryTimelineResource(Resource):
+    def get(self, history_id):
+        """返回记录的句子时间轴
+
+        默认返回紧凑的二进制格式（见 services/timeline.py），format=json 时返回列式 JSON
+        """
+        try:
+            from app import video_service  # 延迟导入
+
+            response_format = request.args.get('format', 'binary')
+            etag = video_service.history_etag('timeline', history_id, response_format)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+            timeline = video_service.get_history_timeline(history_id)
+            if not timeline:
+                return {'success': False, 'error': '没有时间轴数据'}, 404
+
+            if response_format == 'json':
+                response = jsonify({'success': True, 'timeline': timeline.to_columns()})
+            else:
+                response = make_response(timeline.pack())
+                response.mimetype = 'application/octet-stream'
+            return with_etag(response, etag)
+
+        except Exception as e:
+            print(f"获取时间轴失败: {str(e)}")
+            return {'success': False, 'error': str(e)}, 500
+
+
+class HistorySegmentsResource(Resource):
+    def get(self, history_id):
+        """按时间窗口返回句子，播放器随播放进度分段加载
+
+        查询参数 from_ms/to_ms（毫秒），省略 to_ms 时返回到结尾
+        """
+        try:
+            from app import video_service  # 延迟导入
+
+            try:
+                from_ms = max(int(request.args.get('from_ms', 0)), 0)
+                to_ms = request.args.get('to_ms')
+                to_ms = int(to_ms) if to_ms is not None else None
+            except ValueError:
+                return {'success': False, 'error': 'from_ms/to_ms 必须是整数'}, 400
+            if to_ms is not None and to_ms <= from_ms:
+                return {'success': False, 'error': 'to_ms 必须大于 from_ms'}, 400
+
+            etag = video_service.history_etag('segments', history_id, from_ms, to_ms)
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+            result = video_service.get_history_segments(history_id, from_ms, to_ms)
+            if not result:
+                return {'success': False, 'error': '没有时间轴数据'}, 404
+
+            result['success'] = True
+            return with_etag(jsonify(result), etag)
 
         except Exception as e:
-            return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
+            print(f"获取转录分段失败: {str(e)}")
+            return {'success': False, 'error': str(e)}, 500
@@ -0,0 +1,23 @@
+from flask import Response
+from flask_restful import Resource
+from services.metrics_service import metrics
+from services.tracing import recent_traces
+
+class MetricsResource(Resource):
+    def get(self):
+        """返回进程内累计的指标（缓存命中率等）和最近几次处理的各阶段明细"""
+        from app import video_service, youtube_service  # 延迟导入
+        return {
+            'success': True,
+            'metrics': metrics.snapshot(),
+            'history_cache': video_service.history_cache.stats(),
+            'downloads': youtube_service.scheduler.stats(),
+            'traces': list(reversed(recent_traces))
+        }
+
+
+class PrometheusMetricsResource(Resource):
+    def get(self):
+        """以 Prometheus 文本格式导出指标，供 Prometheus 抓取"""
+        return Response(metrics.render_prometheus(),
+                        content_type='text/plain; version=0.0.4; charset=utf-8')
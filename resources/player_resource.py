@@ -1,7 +1,10 @@
 import os
-from flask import render_template, request, send_from_directory, make_response
+import mimetypes
+from flask import render_template, request, make_response
 from flask_restful import Resource
 from config import Config
+from services.media_service import find_audio_file
+from services.download_scheduler import QueueFullError
 
 class PlayerResource(Resource):
     def get(self, video_path):
@@ -11,40 +14,53 @@ class PlayerResource(Resource):
             history_id = request.args.get('history_id')
 
             # 需要在 app.py 中导入 video_service
-            from app import video_service
+            from app import video_service, youtube_service
 
-
-            # 检查文件是否存在 (这部分逻辑保留，因为仍然需要检查本地文件)
-            video_file_path = os.path.join(Config.RECORDS_FOLDER, video_path)
-            if not os.path.exists(video_file_path):
-                return "视频文件不存在", 404
-
-            # 构建视频URL
-            video_url = f'/video/{video_path}'
-
-            # 获取转录状态和文本
+            # 获取转录状态，转录文本由播放器通过 /api/history/<id>/segments 分段加载
             transcribed = "0"  # 默认值
-            transcription = None  # 默认值
+            video_data = None
 
             if history_id:
-                # 从 Supabase 获取视频信息
+                # 从历史记录获取视频信息
                 video_data = video_service.get_history_detail(history_id) # 调用 video_service 的方法
-                print("Supabase 数据:", video_data)
+                print("历史记录数据:", video_data)
 
                 if video_data:
-                    transcribed = video_data.get('transcribed', '0')  # 从 Supabase 数据中获取
-                    transcription = video_data.get('transcription', '')  # 从 Supabase 数据中获取
+                    transcribed = video_data.get('transcribed', '0')  # 从历史记录数据中获取
                     print("转录状态:", transcribed)
-                    print("转录文本:", transcription)
+
+            # 检查文件是否存在 (这部分逻辑保留，因为仍然需要检查本地文件)
+            video_file_path = os.path.join(Config.RECORDS_FOLDER, video_path)
+            video_url = f'/video/{video_path}'
+            media_type = 'video/mp4'
+            video_task_id = None
+
+            if not os.path.exists(video_file_path):
+                # 只下载了音轨：先播放音频，同时在后台补下载视频画面，下载完成后播放器切换到视频
+                audio_path = find_audio_file(video_path)
+                if not audio_path:
+                    return "视频文件不存在", 404
+                audio_name = os.path.relpath(audio_path, Config.RECORDS_FOLDER)
+                video_url = f'/video/{audio_name}'
+                media_type = mimetypes.guess_type(audio_path)[0] or 'audio/mp4'
+
+                source_url = (video_data or {}).get('source_url')
+                if source_url:
+                    try:
+                        video_task_id = youtube_service.fetch_video(source_url, video_path)
+                    except QueueFullError as e:
+                        # 下载队列已满时只播放音频，不影响页面打开
+                        print(f"补下载视频画面失败: {str(e)}")
 
             # 使用 make_response 创建响应对象，并设置 Content-Type
             response = make_response(render_template('player.html',
                                  video_path=video_path,
                                  video_url=video_url,
+                                 media_type=media_type,
+                                 video_task_id=video_task_id,
                                  source=source,
                                  history_id=history_id,
-                                 transcribed=transcribed,
-                                 transcription=transcription))
+                                 transcribed=transcribed))
             response.headers['Content-Type'] = 'text/html; charset=utf-8'
             return response
 
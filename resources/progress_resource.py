@@ -1,8 +1,54 @@
+import json
+import time
+from flask import Response, request, stream_with_context
 from flask_restful import Resource
-from flask import jsonify
+from config import Config
+
+FINISHED_STATUSES = ('completed', 'error')
 
 class ProgressResource(Resource):
     def get(self, task_id):
-        from app import video_download_service
-        progress = video_download_service.get_progress(task_id)
-        return jsonify(progress)
\ No newline at end of file
+        """下载进度
+
+        浏览器以 EventSource 访问时返回 SSE 流，每秒最多推送 PROGRESS_MAX_RATE 次最新状态；
+        其他客户端可以带上 since 参数长轮询，有新状态或超时后返回。
+        """
+        from app import youtube_service  # 延迟导入
+        store = youtube_service.progress
+
+        if 'text/event-stream' not in request.headers.get('Accept', ''):
+            since = request.args.get('since', 0, type=int)
+            timeout = min(request.args.get('timeout', 0, type=float), Config.PROGRESS_HEARTBEAT)
+            version, state = store.wait_for_update(task_id, since, timeout) if timeout > 0 \
+                else store.get(task_id)
+            if state is None:
+                return {'success': False, 'error': '任务不存在或已过期'}, 404
+            return {'success': True, 'version': version, 'progress': state}
+
+        def stream():
+            version = 0
+            started = time.time()
+            interval = 1.0 / Config.PROGRESS_MAX_RATE
+            while True:
+                new_version, state = store.wait_for_update(task_id, version, Config.PROGRESS_HEARTBEAT)
+                if state is None:
+                    # 下载线程可能还没来得及登记任务，超过等待时间仍不存在则结束
+                    if time.time() - started > Config.PROGRESS_HEARTBEAT:
+                        yield f"data: {json.dumps({'status': 'error', 'message': '任务不存在或已过期'})}\n\n"
+                        return
+                    yield ": keep-alive\n\n"
+                    continue
+                if new_version == version:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                version = new_version
+                yield f"data: {json.dumps(state, ensure_ascii=False)}\n\n"
+                if state.get('status') in FINISHED_STATUSES:
+                    return
+                # 限制推送频率，期间的多次更新会被合并为最新的一次
+                time.sleep(interval)
+
+        return Response(stream_with_context(stream()),
+                        mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
@@ -0,0 +1,35 @@
+import time
+from flask import request, jsonify
+from flask_restful import Resource
+
+
+class SearchResource(Resource):
+    def get(self):
+        """在所有转录文本中搜索，返回按相关度排序的 (history_id, begin_time, snippet)
+
+        查询参数：q 搜索词（空格分隔多个词，需同时命中），limit 返回数量
+        snippet 是已转义的 HTML，命中词用 <mark> 标记
+        """
+        try:
+            from app import video_service  # 延迟导入
+
+            query = request.args.get('q', '').strip()
+            if not query:
+                return {'success': False, 'error': '缺少搜索词'}, 400
+            try:
+                limit = max(int(request.args.get('limit', 20)), 1)
+            except ValueError:
+                return {'success': False, 'error': 'limit 必须是整数'}, 400
+
+            start = time.perf_counter()
+            hits = video_service.search_index.search(query, limit)
+            return jsonify({
+                'success': True,
+                'query': query,
+                'hits': hits,
+                'took_ms': round((time.perf_counter() - start) * 1000, 2)
+            })
+
+        except Exception as e:
+            print(f"搜索转录文本失败: {str(e)}")
+            return {'success': False, 'error': str(e)}, 500
@@ -3,6 +3,7 @@ from flask_restful import Resource
 
 class TranscribeVideoResource(Resource):
     def post(self):
+        """提交转录任务，立即返回任务 ID"""
         try:
             data = request.json
             if not data or 'filename' not in data or 'source' not in data:
@@ -11,31 +12,50 @@ class TranscribeVideoResource(Resource):
             filename = data['filename']
             source = data['source']
 
-            from app import video_service  # 延迟导入
-            result = video_service.process_video(filename, source_type=source)
-            if result:
-                # 确保返回的数据是可 JSON 序列化的
-                transcription_data = {
-                    'sentences': [
-                        {
-                            'begin_time': sentence.get('begin_time', 0),
-                            'end_time': sentence.get('end_time', 0),
-                            'text': sentence.get('text', '')
-                        }
-                        for sentence in result['transcription'].get('sentences', [])
-                    ]
-                }
-                
-                return {
-                    'success': True,
-                    'message': '转录成功',
-                    'transcription': transcription_data,
-                    'video_url': result.get('video_url', ''),
-                    'history_id': result.get('history_id', '')
-                }
-            else:
-                return {'error': '视频转录失败'}, 500
+            from app import transcription_job_service  # 延迟导入
+            job, error = transcription_job_service.submit(filename, source_type=source)
+            if not job:
+                return {'error': error}, 503
+
+            return {
+                'success': True,
+                'message': '转录任务已提交',
+                'job_id': job['id'],
+                'stage': job['stage']
+            }, 202
 
         except Exception as e:
             print(f"处理视频转录时出错: {str(e)}")
-            return {'error': str(e)}, 500
\ No newline at end of file
+            return {'error': str(e)}, 500
+
+
+class TranscriptionJobResource(Resource):
+    def get(self, job_id):
+        """查询转录任务所处阶段，完成后返回转录结果"""
+        try:
+            from app import transcription_job_service  # 延迟导入
+            job = transcription_job_service.get_job(job_id)
+            if not job:
+                return {'success': False, 'error': '任务不存在或已过期'}, 404
+
+            response = {
+                'success': True,
+                'job_id': job['id'],
+                'filename': job['filename'],
+                'source': job['source'],
+                'stage': job['stage'],
+                'created_at': job['created_at'],
+                'updated_at': job['updated_at'],
+                'timings': job['timings']
+            }
+            if job['stage'] == 'completed':
+                response.update(job['result'])
+                response['message'] = '转录成功'
+            elif job['stage'] == 'failed':
+                response['error'] = job['error']
+
+            return response
+
+        except Exception as e:
+            print(f"查询转录任务时出错: {str(e)}")
+            return {'error': str(e)}, 500
@@ -1,13 +1,15 @@
-import os
-from flask import request, jsonify
+from flask import request
 from flask_restful import Resource
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
 from datetime import datetime
-from config import Config
+from services.media_probe import media_probe
 
 class UploadVideoResource(Resource):
     def post(self):
         try:
+            # 访问 request.files 时上传内容会被流式写入 records 目录，
+            # 超出大小或不是 MP4 的文件会在接收过程中直接被拒绝
             if 'file' not in request.files:
                 return {'error': '没有文件'}, 400
                 
@@ -16,25 +18,35 @@ class UploadVideoResource(Resource):
                 return {'error': '没有选择文件'}, 400
 
             if not file.filename.lower().endswith('.mp4'):
-                return jsonify({'error': '只支持MP4格式的视频'}), 415
+                return {'error': '只支持MP4格式的视频'}, 415
 
             # 使用 secure_filename 确保文件名安全
             filename = secure_filename(file.filename)
 
-            # 保存文件
-            file_path = os.path.join(Config.RECORDS_FOLDER, filename)
-            file.save(file_path)
+            # 检查文件是否完整，并在重命名之前读取视频信息
+            ingest_file = file.stream
+            ingest_file.validate()
+            ingest_file.sync()
+            try:
+                video_info = media_probe.probe(ingest_file.temp_path)
+            except Exception as e:
+                return {'error': f'无法解析视频文件: {str(e)}'}, 415
+            if not video_info.get('has_video'):
+                return {'error': '视频文件缺少视频轨'}, 415
 
-            # 获取视频信息
+            # 原子地重命名为正式文件，播放器不会读到写了一半的文件
+            file_path = ingest_file.commit(filename)
+
+            # 记录上传时计算的内容哈希，转录时无需再次读取整个文件
             from app import video_service  # 延迟导入
-            video_info = video_service.get_video_info(file_path)
+            video_service.transcription_cache.remember_hash(file_path, ingest_file.content_hash)
             
             # 准备要保存的数据
             video_data = {
                 'title': filename,
                 'source': 'upload',
                 'video_path': filename,
-                'duration': str(video_info['duration']) if video_info and 'duration' in video_info else '0:00',
+                'duration': str(video_info['duration']),
                 'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
 
@@ -48,10 +60,14 @@ class UploadVideoResource(Resource):
                 'data': {
                     'filename': filename,
                     'history_id': str(history_id) if history_id else None,
-                    'duration': str(video_info['duration']) if video_info and 'duration' in video_info else '0:00'
+                    'duration': str(video_info['duration'])
                 }
             }, 201
 
+        except HTTPException as e:
+            print(f"上传被拒绝: {e.description}")
+            return {'error': e.description}, e.code
+
         except Exception as e:
             print(f"上传处理失败: {str(e)}")
-            return {'error': str(e)}, 500
\ No newline at end of file
+            return {'error': str(e)}, 500
@@ -1,6 +1,8 @@
-from flask import send_from_directory, abort
+from flask import request, abort
 from flask_restful import Resource
 import os
+from config import Config
+from services.media_service import resolve_media_path, build_media_response
 
 class VideoFileResource(Resource):
     def get(self, filename):
@@ -8,19 +10,14 @@ class VideoFileResource(Resource):
         if ".." in filename or not filename:
             abort(400, description="Invalid filename")
 
-        # 2. 构造 records 目录的绝对路径
-        base_dir = os.getcwd()  # 获取当前工作目录 (通常是 Flask 应用的根目录)
-        records_dir = os.path.abspath(os.path.join(base_dir, 'records'))
-
-        # 3. 构建文件的绝对路径
-        abs_path = os.path.abspath(os.path.join(records_dir, filename))
-
-        # 4. 【安全性】确保文件路径在 records 目录下
-        if not abs_path.startswith(records_dir + os.sep) and abs_path != records_dir:
+        # 2. 【安全性】确保文件路径在 records 目录下
+        abs_path = resolve_media_path(filename)
+        if not abs_path:
             abort(403, description="Access denied")  # 403 Forbidden
 
-        # 5. 拆分目录和文件名
-        directory, filename = os.path.split(abs_path)
+        if not os.path.isfile(abs_path):
+            abort(404, description="File not found")
 
-        # 6. 使用 send_from_directory 发送文件
-        return send_from_directory(directory, filename)
\ No newline at end of file
+        # 3. 支持 Range/ETag 的媒体响应，拖动进度条时只发送需要的字节
+        accel_path = Config.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + filename
+        return build_media_response(request, abs_path, accel_path=accel_path)
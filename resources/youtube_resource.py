@@ -1,47 +1,79 @@
 from flask import request, jsonify
 from flask_restful import Resource
-import threading
-import time
 from datetime import datetime
+from services.download_scheduler import QueueFullError
 
 class YoutubeDownloadResource(Resource):
     def post(self):
         try:
             url = request.json.get('url')
             if not url:
-                return jsonify({'error': '请提供YouTube视频链接'}), 400
+                return {'error': '请提供YouTube视频链接'}, 400
+            priority = request.json.get('priority', 0)
+            if not isinstance(priority, int):
+                return {'error': 'priority 必须是整数'}, 400
+            # 数值越小越先下载；客户端只能把自己的任务往后排，提前由服务端决定（如播放时补下载视频）
+            priority = max(priority, 0)
 
-            task_id = str(int(time.time()))
+            from app import youtube_service, video_service, url_pipeline  # 延迟导入
 
-            def download_and_save_history():
+            if request.json.get('auto_transcribe'):
+                # 音轨下载完成后立即转录，视频画面和历史记录并行处理
                 try:
-                    from app import youtube_service, video_service  # 延迟导入
+                    task_id, position = url_pipeline.start(url, priority=priority)
+                except ValueError as e:
+                    return {'error': str(e)}, 400
+                except QueueFullError as e:
+                    return {'error': str(e)}, 503
+                return jsonify({
+                    'success': True,
+                    'message': '开始下载并转录',
+                    'task_id': task_id,
+                    'position': position,
+                    'pipeline': True
+                })
 
-                    video_info = youtube_service.download_video(url, task_id)
-
-                    if video_info:
-                        video_data = {
-                            'title': video_info['title'],
-                            'source': 'youtube',
-                            'video_path': video_info['filename'],  # 保存本地文件名
-                            'duration': video_info['duration'],
-                            'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                        }
+            def save_history(video_info):
+                if not video_info:
+                    return
+                try:
+                    video_data = {
+                        'title': video_info['title'],
+                        'source': 'youtube',
+                        'video_path': video_info['filename'],  # 保存本地文件名
+                        'duration': video_info['duration'],
+                        'source_url': video_info['source_url'],  # 只下载了音轨时，播放前据此补下载视频
+                        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                    }
 
-                        video_service.save_to_history(video_data) 
+                    video_service.save_to_history(video_data, reuse_existing=True)
                 except Exception as e:
                     print(f"下载和保存历史记录失败: {str(e)}")
 
-            thread = threading.Thread(target=download_and_save_history)
-            thread.daemon = True
-            thread.start()
+            try:
+                task_id, position = youtube_service.enqueue(url, on_finished=save_history, priority=priority)
+            except ValueError as e:
+                return {'error': str(e)}, 400
+            except QueueFullError as e:
+                return {'error': str(e)}, 503
 
             return jsonify({
                 'success': True,
-                'message': '开始下载视频',
-                'task_id': task_id
+                'message': '开始下载视频' if position <= 1 else f'已加入下载队列，前面还有 {position - 1} 个任务',
+                'task_id': task_id,
+                'position': position
             })
 
         except Exception as e:
             print(f"处理YouTube视频时出错: {str(e)}")
-            return jsonify({'error': str(e)}), 500
\ No newline at end of file
+            return {'error': str(e)}, 500
+
+
+class DownloadPipelineResource(Resource):
+    def get(self, task_id):
+        """自动转录流水线的状态：转录任务 ID、视频画面下载任务 ID 和各阶段耗时"""
+        from app import url_pipeline  # 延迟导入
+        run = url_pipeline.get(task_id)
+        if not run:
+            return {'success': False, 'error': '任务不存在或已过期'}, 404
+        return {'success': True, 'pipeline': run}
@@ -0,0 +1,149 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import threading
+import time
+from concurrent.futures import Future
+from http import HTTPStatus
+import dashscope
+from config import Config
+from services.metrics_service import metrics
+from services.asr_poller import AsrTaskPoller
+from services.remote_client import track_call
+
+
+class TranscriptionBatcher:
+    """把多个待转写文件合并为一个 SenseVoice 任务
+
+    Transcription.async_call 的 file_urls 接受多个文件，同时有多个视频等待转写时
+    合并提交可以减少 API 调用和任务调度开销。调用方 submit 后得到 Future，
+    批量任务完成后按 file_url 把每个文件的 transcription_url 分发回各自的 Future。
+    任务提交后交给 AsrTaskPoller 统一轮询，不占用等待线程。
+    """
+
+    def __init__(self, batch_size=None, max_wait=None, poller=None):
+        self.batch_size = batch_size or Config.ASR_BATCH_SIZE
+        self.max_wait = max_wait if max_wait is not None else Config.ASR_BATCH_WAIT
+        self.poller = poller or AsrTaskPoller()
+        self.pending = []  # [(file_url, future, 入队时间, 预计耗时)]
+        self.flush = False  # 已知不会再有文件加入（submit_many），不再等待凑批
+        self.condition = threading.Condition()
+        self.collector = threading.Thread(target=self._collect, name='asr-batcher', daemon=True)
+        self.collector.start()
+
+    def submit(self, file_url, expected_seconds=None):
+        """提交一个待转写的文件
+
+        Args:
+            file_url: 文件的 OSS 地址
+            expected_seconds: 预计转写耗时（秒），用于决定轮询节奏
+
+        Returns:
+            Future: 结果为该文件的 transcription_url，转写失败时抛出异常
+        """
+        future = Future()
+        with self.condition:
+            self.pending.append((file_url, future, time.monotonic(), expected_seconds))
+            self.condition.notify()
+        return future
+
+    def submit_many(self, items):
+        """一次提交一组文件（例如长视频的各个分段），不等待凑批直接提交
+
+        Args:
+            items: [(file_url, expected_seconds)]
+
+        Returns:
+            list: 与 items 一一对应的 Future
+        """
+        futures = [Future() for _ in items]
+        now = time.monotonic()
+        with self.condition:
+            for (file_url, expected_seconds), future in zip(items, futures):
+                self.pending.append((file_url, future, now, expected_seconds))
+            self.flush = True
+            self.condition.notify()
+        return futures
+
+    def pending_count(self):
+        """等待凑批提交的文件数"""
+        with self.condition:
+            return len(self.pending)
+
+    def _collect(self):
+        """凑批：达到批量大小、最早的文件等待超时或 submit_many 要求立即提交时提交"""
+        while True:
+            with self.condition:
+                while not self.pending:
+                    self.condition.wait()
+                deadline = self.pending[0][2] + self.max_wait
+                while len(self.pending) < self.batch_size and not self.flush:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                batch = self.pending[:self.batch_size]
+                del self.pending[:self.batch_size]
+                if not self.pending:
+                    self.flush = False
+            self._submit_batch(batch)
+
+    def _submit_batch(self, batch):
+        """提交一个批量任务，完成后由轮询器回调"""
+        file_urls = [item[0] for item in batch]
+        hints = [item[3] for item in batch]
+        metrics.inc('asr_tasks_total')
+        metrics.inc('asr_files_total', len(file_urls))
+        print(f"提交批量转写任务: {len(file_urls)} 个文件")
+
+        try:
+            with track_call('dashscope', 'async_call'):
+                task_response = dashscope.audio.asr.Transcription.async_call(
+                    model=Config.ASR_MODEL,
+                    file_urls=file_urls,
+                    language_hints=Config.ASR_LANGUAGE_HINTS,
+                    request_timeout=Config.DASHSCOPE_REQUEST_TIMEOUT,
+                )
+            if task_response.status_code != HTTPStatus.OK:
+                raise RuntimeError(f"创建转写任务失败: {task_response.status_code} {task_response.message}")
+
+            # 批量任务的耗时取决于最长的文件
+            expected = max(hints) if None not in hints else None
+            self.poller.track(task_response.output.task_id, expected).add_done_callback(
+                lambda poll_future: self._on_finished(batch, poll_future)
+            )
+
+        except Exception as e:
+            self._fail(batch, e)
+
+    def _on_finished(self, batch, poll_future):
+        """批量任务结束（由轮询器线程调用）"""
+        try:
+            response = poll_future.result()
+            status = response.output.get('task_status')
+            if status != 'SUCCEEDED':
+                raise RuntimeError(f"转写任务状态：{status}")
+            self._dispatch(batch, response.output.get('results') or [])
+        except Exception as e:
+            self._fail(batch, e)
+
+    def _fail(self, batch, error):
+        print(f"批量转写任务失败: {str(error)}")
+        for item in batch:
+            if not item[1].done():
+                item[1].set_exception(error)
+
+    def _dispatch(self, batch, results):
+        """按 file_url 把子任务结果分发给对应的 Future"""
+        by_url = {result.get('file_url'): result for result in results}
+        for index, (file_url, future, _, _) in enumerate(batch):
+            result = by_url.get(file_url)
+            if result is None and len(results) == len(batch):
+                result = results[index]  # 结果中没有 file_url 时按提交顺序对应
+
+            if result and result.get('subtask_status', 'SUCCEEDED') == 'SUCCEEDED' \
+                    and result.get('transcription_url'):
+                future.set_result(result['transcription_url'])
+            else:
+                message = (result or {}).get('message') or '未找到转录URL'
+                future.set_exception(RuntimeError(f"文件转写失败: {message}"))
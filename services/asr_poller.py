@@ -0,0 +1,98 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+import dashscope
+from config import Config
+from services.metrics_service import metrics
+from services.remote_client import track_call
+
+FINISHED_STATUSES = ('SUCCEEDED', 'FAILED', 'CANCELED', 'UNKNOWN')
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class AsrTaskPoller:
+    """在一个 asyncio 事件循环中轮询所有进行中的 SenseVoice 任务
+
+    Transcription.wait 会让每个任务占住一个线程各自轮询。这里所有任务共用一个事件循环线程，
+    查询请求交给固定大小的线程池发出，线程数和并发请求数与进行中的任务数量无关。
+    轮询间隔按预计耗时自适应：预计完成之前稀疏查询，超过预计时间后按已等待时长逐步拉长。
+    """
+
+    def __init__(self, min_interval=None, max_interval=None, workers=None):
+        self.min_interval = min_interval or Config.ASR_POLL_MIN_INTERVAL
+        self.max_interval = max_interval or Config.ASR_POLL_MAX_INTERVAL
+        self.fetch_executor = ThreadPoolExecutor(max_workers=workers or Config.ASR_POLL_WORKERS,
+                                                 thread_name_prefix='asr-poll')
+        self.tasks = {}  # task_id -> 开始轮询的时间，只在事件循环线程中访问
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run_loop, name='asr-poller', daemon=True)
+        self.thread.start()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def track(self, task_id, expected_seconds=None):
+        """开始跟踪一个任务
+
+        Args:
+            task_id: async_call 返回的任务 ID
+            expected_seconds: 预计转写耗时（秒），未知时为 None
+
+        Returns:
+            concurrent.futures.Future: 任务结束后得到最后一次查询的响应
+        """
+        return asyncio.run_coroutine_threadsafe(self._poll(task_id, expected_seconds), self.loop)
+
+    def in_flight(self):
+        """正在跟踪的任务数"""
+        return len(self.tasks)
+
+    def next_interval(self, elapsed, expected_seconds=None):
+        """根据已等待时长和预计耗时计算下一次查询前的等待时间"""
+        if expected_seconds and elapsed < expected_seconds:
+            interval = (expected_seconds - elapsed) / 2
+        else:
+            interval = elapsed / 4
+        return max(self.min_interval, min(self.max_interval, interval))
+
+    def _fetch(self, task_id):
+        with track_call('dashscope', 'fetch'):
+            return dashscope.audio.asr.Transcription.fetch(task_id)
+
+    async def _poll(self, task_id, expected_seconds):
+        started = time.monotonic()
+        self.tasks[task_id] = started
+        errors = 0
+        try:
+            while True:
+                await asyncio.sleep(self.next_interval(time.monotonic() - started, expected_seconds))
+                metrics.inc('asr_polls_total')
+                try:
+                    # SDK 的 fetch 不接受超时参数，超时后本次查询按失败处理，下一轮重新查询
+                    response = await asyncio.wait_for(
+                        self.loop.run_in_executor(self.fetch_executor, self._fetch, task_id),
+                        timeout=Config.DASHSCOPE_REQUEST_TIMEOUT
+                    )
+                except Exception as e:
+                    response = None
+                    print(f"查询转写任务 {task_id} 失败: {str(e)}")
+
+                if response is None or response.status_code in RETRYABLE_STATUS_CODES:
+                    errors += 1
+                    if errors >= Config.ASR_POLL_MAX_ERRORS:
+                        raise RuntimeError(f"查询转写任务 {task_id} 连续失败 {errors} 次")
+                    continue
+                if response.status_code != HTTPStatus.OK:
+                    raise RuntimeError(f"查询转写任务失败，状态码：{response.status_code}")
+
+                errors = 0
+                if response.output.get('task_status') in FINISHED_STATUSES:
+                    return response
+        finally:
+            self.tasks.pop(task_id, None)
@@ -0,0 +1,132 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bisect
+import itertools
+import threading
+from config import Config
+from services.metrics_service import metrics
+
+
+class QueueFullError(Exception):
+    """下载队列已满"""
+
+
+class DownloadScheduler:
+    """有界的下载调度器
+
+    固定数量的工作线程从一个按 (优先级, 入队顺序) 排列的队列中取任务，
+    同时限制每个站点（youtube / bilibili）正在下载的任务数：
+    某个站点已达上限时跳过它的任务，先执行排在后面的其他站点任务。
+    突发的大量请求会排队等待，而不是同时抢占带宽、触发站点限流。
+    队列变化时通过 on_position 回调报告每个排队任务的当前位置（从 1 开始）。
+    """
+
+    def __init__(self, handler, workers=None, host_limits=None, max_pending=None, on_position=None):
+        """
+        Args:
+            handler: 执行下载的函数 handler(task_id, payload)
+            workers: 工作线程数
+            host_limits: {站点: 最大并发数}，未列出的站点只受工作线程数限制
+            max_pending: 排队中的最大任务数，超过后拒绝新任务
+            on_position: 排队位置变化时的回调 on_position(task_id, position)
+        """
+        self.handler = handler
+        self.workers = workers or Config.DOWNLOAD_WORKERS
+        self.host_limits = host_limits if host_limits is not None else Config.DOWNLOAD_HOST_LIMITS
+        self.max_pending = max_pending or Config.DOWNLOAD_MAX_PENDING
+        self.on_position = on_position
+
+        self.queue = []  # [(优先级, 序号, task_id, host, payload)]，保持有序
+        self.positions = {}  # task_id -> 最近一次报告的位置
+        self.running = {}  # host -> 正在下载的任务数
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.threads = [
+            threading.Thread(target=self._work, name=f'download-{index}', daemon=True)
+            for index in range(self.workers)
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, task_id, host, payload, priority=0):
+        """任务入队
+
+        Args:
+            priority: 数值越小越先执行，相同优先级按入队顺序执行
+
+        Returns:
+            int: 入队后的排队位置
+
+        Raises:
+            QueueFullError: 排队任务数已达上限
+        """
+        with self.condition:
+            if len(self.queue) >= self.max_pending:
+                raise QueueFullError("下载队列已满，请稍后重试")
+            bisect.insort(self.queue, (priority, next(self.counter), task_id, host, payload))
+            metrics.inc('downloads_queued_total', host=host)
+            self._report_positions()
+            self.condition.notify()
+            return self.positions.get(task_id, 0)
+
+    def position(self, task_id):
+        """任务的排队位置，已开始或不存在时返回 None"""
+        with self.condition:
+            return self.positions.get(task_id)
+
+    def stats(self):
+        """排队和执行中的任务数"""
+        with self.condition:
+            queued = {}
+            for item in self.queue:
+                queued[item[3]] = queued.get(item[3], 0) + 1
+            return {
+                'queued': len(self.queue),
+                'queued_by_host': queued,
+                'running': dict(self.running),
+                'workers': self.workers
+            }
+
+    def _can_start(self, host):
+        limit = self.host_limits.get(host)
+        return limit is None or self.running.get(host, 0) < limit
+
+    def _take(self):
+        """取出第一个所在站点未达并发上限的任务（调用方需持有锁）"""
+        for index, item in enumerate(self.queue):
+            if self._can_start(item[3]):
+                del self.queue[index]
+                self.running[item[3]] = self.running.get(item[3], 0) + 1
+                self.positions.pop(item[2], None)
+                self._report_positions()
+                return item
+        return None
+
+    def _report_positions(self):
+        """报告位置发生变化的排队任务（调用方需持有锁）"""
+        for position, item in enumerate(self.queue, start=1):
+            task_id = item[2]
+            if self.positions.get(task_id) != position:
+                self.positions[task_id] = position
+                if self.on_position:
+                    self.on_position(task_id, position)
+
+    def _work(self):
+        while True:
+            with self.condition:
+                item = self._take()
+                while item is None:
+                    self.condition.wait()
+                    item = self._take()
+
+            _, _, task_id, host, payload = item
+            try:
+                self.handler(task_id, payload)
+            except Exception as e:
+                print(f"下载任务 {task_id} 执行失败: {str(e)}")
+            finally:
+                with self.condition:
+                    self.running[host] -= 1
+                    # 站点名额释放后，之前被跳过的任务可能可以开始了
+                    self.condition.notify_all()
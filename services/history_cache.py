@@ -0,0 +1,194 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import threading
+import time
+from collections import OrderedDict
+from config import Config
+from services.metrics_service import metrics
+
+
+class MemoryCacheBackend:
+    """进程内 LRU 缓存，条目带过期时间"""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries or Config.HISTORY_CACHE_MAX_ENTRIES
+        self.entries = OrderedDict()  # key -> (过期时间, 值)
+        self.counters = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self.lock:
+            self.entries[key] = (time.time() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def incr(self, key):
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def get_counter(self, key):
+        with self.lock:
+            return self.counters.get(key, 0)
+
+
+class RedisCacheBackend:
+    """Redis 缓存，多个进程共享同一份缓存和失效计数"""
+
+    def __init__(self):
+        from redis import Redis  # 仅在启用 Redis 缓存时需要
+        self.client = Redis(
+            host=Config.REDIS_HOST,
+            port=Config.REDIS_PORT,
+            db=Config.REDIS_DB,
+            password=Config.REDIS_PASSWORD,
+            socket_timeout=1,
+            socket_connect_timeout=1
+        )
+
+    def get(self, key):
+        value = self.client.get(key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(key, value, ex=ttl)
+
+    def delete(self, key):
+        self.client.delete(key)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def get_counter(self, key):
+        value = self.client.get(key)
+        return int(value) if value is not None else 0
+
+
+class HistoryCache:
+    """历史记录读穿缓存
+
+    - 详情按记录 ID 缓存，键中带有该记录的代数，记录更新或删除时递增代数
+    - 列表页按查询参数缓存，键中带有列表代数，任何写入都会递增代数使所有列表页失效
+    - 写入缓存用的是读取数据库之前的代数：读取期间发生的写入会递增代数，
+      读到的旧数据只会写到再也不会被读取的旧键上，不会在新版本下被返回
+    - Redis 不可用时视为未命中，直接查询数据库
+    """
+
+    KEY_PREFIX = 'history:'
+    DETAIL_PARTS = ('detail', 'timeline')  # 按记录 ID 缓存的数据，记录变化时一起失效
+
+    def __init__(self, backend=None, ttl=None):
+        self.backend = backend or self._create_backend()
+        self.ttl = ttl or Config.HISTORY_CACHE_TTL
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def _create_backend(self):
+        """根据配置创建缓存后端"""
+        if Config.HISTORY_CACHE_BACKEND == 'redis':
+            try:
+                return RedisCacheBackend()
+            except Exception as e:
+                print(f"Redis 缓存初始化失败，使用进程内缓存: {str(e)}")
+        return MemoryCacheBackend()
+
+    def _record(self, kind, hit):
+        """记录命中/未命中次数"""
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        metrics.inc('history_cache_requests_total', kind=kind, result='hit' if hit else 'miss')
+
+    def _read_through(self, kind, key, loader):
+        """先查缓存，未命中时调用 loader 并写回缓存（空结果不缓存）"""
+        try:
+            cached = self.backend.get(key)
+        except Exception as e:
+            print(f"读取历史记录缓存失败: {str(e)}")
+            cached = None
+
+        if cached is not None:
+            self._record(kind, True)
+            return json.loads(cached)
+
+        self._record(kind, False)
+        value = loader()
+        if value:
+            try:
+                self.backend.set(key, json.dumps(value, ensure_ascii=False), self.ttl)
+            except Exception as e:
+                print(f"写入历史记录缓存失败: {str(e)}")
+        return value
+
+    def _generation(self, name):
+        try:
+            return self.backend.get_counter(self.KEY_PREFIX + name)
+        except Exception as e:
+            print(f"读取历史记录缓存失败: {str(e)}")
+            return None
+
+    def _list_generation(self):
+        return self._generation('list_gen')
+
+    def get_detail(self, history_id, loader, part='detail'):
+        """读取单条记录的详情或时间轴等部分数据"""
+        generation = self._generation(f'detail_gen:{history_id}')
+        if generation is None:
+            return loader()
+        return self._read_through(part, f"{self.KEY_PREFIX}{part}:{history_id}:{generation}", loader)
+
+    def get_list(self, name, loader, *params):
+        """读取列表页，name 和 params 共同区分不同的查询"""
+        generation = self._list_generation()
+        if generation is None:
+            return loader()
+        key = f"{self.KEY_PREFIX}list:{generation}:{name}:" + ':'.join(str(p) for p in params)
+        return self._read_through('list', key, loader)
+
+    def invalidate(self, history_id=None):
+        """历史记录写入后失效相关缓存
+
+        Args:
+            history_id: 被更新或删除的记录 ID，新增记录时为 None
+        """
+        try:
+            if history_id is not None:
+                generation = self.backend.incr(f"{self.KEY_PREFIX}detail_gen:{history_id}")
+                # 旧代数的键不会再被读取，删除只是为了及时释放空间
+                for part in self.DETAIL_PARTS:
+                    self.backend.delete(f"{self.KEY_PREFIX}{part}:{history_id}:{generation - 1}")
+            self.backend.incr(self.KEY_PREFIX + 'list_gen')
+        except Exception as e:
+            print(f"失效历史记录缓存失败: {str(e)}")
+
+    def stats(self):
+        """返回命中率统计"""
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0
+            }
@@ -0,0 +1,258 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from config import Config
+from services.remote_client import track_call
+
+TABLE = 'video_history'
+# video_history 表的全部列（id 之外）
+COLUMNS = (
+    'title', 'source', 'video_path', 'duration', 'file_size', 'fps', 'resolution',
+    'created_at', 'transcribed', 'transcription', 'origin', 'text_preview', 'timeline', 'video_url',
+    'source_url'
+)
+# 建表之后新增的列，打开已有数据库时自动补上
+ADDED_COLUMNS = {'source_url': 'TEXT'}
+
+
+class HistoryRepository(ABC):
+    """历史记录存储接口
+
+    VideoService 只通过这些方法读写 video_history，不关心数据保存在 Supabase 还是本地 SQLite。
+    columns 参数是逗号分隔的列名（与 Supabase select 的写法一致）。
+    """
+
+    @abstractmethod
+    def insert(self, data):
+        """插入一条记录，返回包含 id 的记录，失败时返回 None"""
+
+    @abstractmethod
+    def update(self, history_id, data):
+        """更新一条记录，返回是否有记录被更新"""
+
+    @abstractmethod
+    def find_id(self, video_path, source):
+        """按本地文件名和来源查找记录 ID，不存在时返回 None"""
+
+    @abstractmethod
+    def get(self, history_id, columns):
+        """读取一条记录，不存在时返回 None"""
+
+    @abstractmethod
+    def find_by_oss_object(self, object_key):
+        """查找 video_url 中包含该 OSS 对象名的记录，返回 [{'id', 'video_url'}]
+
+        只做子串匹配，调用方需要再按对象名精确比较。
+        """
+
+    @abstractmethod
+    def list_page(self, position, limit, columns):
+        """按 (created_at, id) 降序读取 position 之后的最多 limit 条记录
+
+        Args:
+            position: 上一页最后一条记录的 (created_at, id)，为 None 时从头开始
+        """
+
+    @abstractmethod
+    def delete(self, history_id):
+        """删除一条记录，返回是否有记录被删除"""
+
+
+class SupabaseHistoryRepository(HistoryRepository):
+    """保存在 Supabase 的 video_history 表中"""
+
+    def __init__(self, url=None, key=None):
+        from supabase import create_client, ClientOptions  # 仅在使用 Supabase 存储时需要
+        self.client = create_client(
+            url or Config.SUPABASE_URL,
+            key or Config.SUPABASE_KEY,
+            options=ClientOptions(postgrest_client_timeout=Config.REMOTE_READ_TIMEOUT)
+        )
+
+    def _table(self):
+        return self.client.table(TABLE)
+
+    def _execute(self, operation, query):
+        """执行查询，耗时按操作名记入 remote_call_seconds"""
+        with track_call('supabase', operation):
+            return query.execute()
+
+    def insert(self, data):
+        result = self._execute('insert', self._table().insert(data))
+        return result.data[0] if result.data else None
+
+    def update(self, history_id, data):
+        result = self._execute('update', self._table().update(data).eq('id', history_id))
+        return bool(result.data)
+
+    def find_id(self, video_path, source):
+        query = self._table() \
+            .select('id') \
+            .eq('video_path', video_path) \
+            .eq('source', source) \
+            .limit(1)
+        result = self._execute('find_id', query)
+        return result.data[0]['id'] if result.data else None
+
+    def get(self, history_id, columns):
+        result = self._execute('get', self._table().select(columns).eq('id', history_id))
+        return result.data[0] if result.data else None
+
+    def find_by_oss_object(self, object_key):
+        query = self._table().select('id,video_url').like('video_url', f'%/{object_key}%')
+        return self._execute('find_by_oss_object', query).data or []
+
+    def list_page(self, position, limit, columns):
+        query = self._table() \
+            .select(columns) \
+            .order('created_at', desc=True) \
+            .order('id', desc=True) \
+            .limit(limit)
+
+        if position:
+            created_at, record_id = position
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt."{record_id}")'
+            )
+        return self._execute('list_page', query).data or []
+
+    def delete(self, history_id):
+        result = self._execute('delete', self._table().delete().eq('id', history_id))
+        return bool(result.data)
+
+
+class SqliteHistoryRepository(HistoryRepository):
+    """保存在本地 SQLite 数据库中（WAL 模式），适合单机部署和离线运行
+
+    WAL 模式下读写互不阻塞，列表分页使用 (created_at, id) 上的索引。
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.HISTORY_DB_PATH
+        self.local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        """每个线程复用一个连接"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def _init_db(self):
+        folder = os.path.dirname(self.db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        with self._connect() as conn:
+            conn.executescript(f'''
+                CREATE TABLE IF NOT EXISTS {TABLE} (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    source TEXT,
+                    video_path TEXT,
+                    duration TEXT,
+                    file_size INTEGER,
+                    fps REAL,
+                    resolution TEXT,
+                    created_at TEXT NOT NULL,
+                    transcribed TEXT DEFAULT '0',
+                    transcription TEXT DEFAULT '',
+                    origin TEXT DEFAULT '',
+                    text_preview TEXT DEFAULT '',
+                    timeline TEXT,
+                    video_url TEXT,
+                    source_url TEXT
+                );
+                CREATE INDEX IF NOT EXISTS {TABLE}_created ON {TABLE} (created_at DESC, id DESC);
+                CREATE INDEX IF NOT EXISTS {TABLE}_video ON {TABLE} (video_path, source);
+            ''')
+            existing = {row['name'] for row in conn.execute(f'PRAGMA table_info({TABLE})')}
+            for name, column_type in ADDED_COLUMNS.items():
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE {TABLE} ADD COLUMN {name} {column_type}')
+
+    def _columns(self, columns):
+        """校验列名，只允许 video_history 中存在的列"""
+        if columns.strip() == '*':
+            return '*'
+        names = [name.strip() for name in columns.split(',')]
+        unknown = [name for name in names if name != 'id' and name not in COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的列: {', '.join(unknown)}")
+        return ', '.join(names)
+
+    def _fields(self, data):
+        unknown = [name for name in data if name not in COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的列: {', '.join(unknown)}")
+        return list(data)
+
+    def insert(self, data):
+        fields = self._fields(data)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO {TABLE} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+                [data[name] for name in fields]
+            )
+        return dict(data, id=cursor.lastrowid)
+
+    def update(self, history_id, data):
+        fields = self._fields(data)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE {TABLE} SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?",
+                [data[name] for name in fields] + [history_id]
+            )
+        return cursor.rowcount > 0
+
+    def find_id(self, video_path, source):
+        row = self._connect().execute(
+            f'SELECT id FROM {TABLE} WHERE video_path = ? AND source = ? LIMIT 1',
+            (video_path, source)
+        ).fetchone()
+        return row['id'] if row else None
+
+    def get(self, history_id, columns):
+        row = self._connect().execute(
+            f'SELECT {self._columns(columns)} FROM {TABLE} WHERE id = ?',
+            (history_id,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def find_by_oss_object(self, object_key):
+        rows = self._connect().execute(
+            f'SELECT id, video_url FROM {TABLE} WHERE instr(video_url, ?) > 0',
+            (f'/{object_key}',)
+        )
+        return [dict(row) for row in rows]
+
+    def list_page(self, position, limit, columns):
+        sql = f'SELECT {self._columns(columns)} FROM {TABLE}'
+        params = []
+        if position:
+            sql += ' WHERE (created_at, id) < (?, ?)'
+            params.extend(position)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit)
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def delete(self, history_id):
+        with self._connect() as conn:
+            cursor = conn.execute(f'DELETE FROM {TABLE} WHERE id = ?', (history_id,))
+        return cursor.rowcount > 0
+
+
+def create_history_repository():
+    """根据 HISTORY_BACKEND 配置创建历史记录存储"""
+    if Config.HISTORY_BACKEND == 'sqlite':
+        return SqliteHistoryRepository()
+    return SupabaseHistoryRepository()
@@ -0,0 +1,117 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hashlib
+import uuid
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from config import Config
+from services.media_probe import Mp4StreamValidator, MediaProbeError
+
+
+class IngestFile:
+    """边接收边写入 records 目录的上传文件
+
+    werkzeug 解析 multipart 时每收到一块数据就调用 write：
+    - 超过 MAX_VIDEO_SIZE 立即中止
+    - 同时计算 SHA-256，后续转录缓存无需再完整读取一次文件
+    - 逐块校验 MP4 box 结构，非 MP4 文件在开头几个字节就会被拒绝
+    数据先写入隐藏的临时文件，调用 commit 后才原子地重命名为正式文件名。
+    """
+
+    def __init__(self, folder=None, max_size=None):
+        self.folder = folder or Config.RECORDS_FOLDER
+        self.max_size = max_size or Config.MAX_VIDEO_SIZE
+        self.temp_path = os.path.join(self.folder, f".upload-{uuid.uuid4().hex}.part")
+        self.file = open(self.temp_path, 'w+b')
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.validator = Mp4StreamValidator(max_size=self.max_size)
+        self.committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge(f"视频文件过大，最大允许 {self.max_size/(1024*1024)}MB")
+
+        try:
+            self.validator.feed(data)
+        except MediaProbeError as e:
+            self.discard()
+            raise UnsupportedMediaType(f"只支持MP4格式的视频: {str(e)}")
+
+        self.digest.update(data)
+        return self.file.write(data)
+
+    def seek(self, *args):
+        return self.file.seek(*args)
+
+    def tell(self):
+        return self.file.tell()
+
+    def read(self, *args):
+        return self.file.read(*args)
+
+    def flush(self):
+        return self.file.flush()
+
+    @property
+    def content_hash(self):
+        return self.digest.hexdigest()
+
+    def validate(self):
+        """数据接收完毕后检查 MP4 结构是否完整"""
+        try:
+            self.validator.finish()
+        except MediaProbeError as e:
+            raise UnsupportedMediaType(f"视频文件不完整或已损坏: {str(e)}")
+
+    def sync(self):
+        """将临时文件落盘，之后可以按路径读取（例如探测时长）"""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def commit(self, filename):
+        """落盘并原子地重命名为正式文件，返回最终路径"""
+        self.sync()
+        self.file.close()
+        final_path = os.path.join(self.folder, filename)
+        os.replace(self.temp_path, final_path)
+        self.committed = True
+        return final_path
+
+    def discard(self):
+        """丢弃未提交的临时文件"""
+        if self.committed:
+            return
+        if not self.file.closed:
+            self.file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def close(self):
+        self.discard()
+
+
+class IngestRequest(Request):
+    """将上传文件直接流式写入 records 目录的请求类"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # 扩展名不对的文件不接收任何内容
+        if filename and not Config.allowed_file(filename):
+            raise UnsupportedMediaType('只支持MP4格式的视频')
+
+        ingest_file = IngestFile()
+        if not hasattr(self, '_ingest_files'):
+            self._ingest_files = []
+        self._ingest_files.append(ingest_file)
+        return ingest_file
+
+    def close(self):
+        """请求结束时清理解析中途失败或未被提交的临时文件"""
+        try:
+            super().close()
+        finally:
+            for ingest_file in getattr(self, '_ingest_files', []):
+                ingest_file.discard()
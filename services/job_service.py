@@ -0,0 +1,202 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+
+
+class TranscriptionJobService:
+    """转录任务队列服务
+
+    /transcribe 只负责入队并立即返回 job_id，真正的
+    检查 → OSS 上传 → ASR → 保存历史记录流程在有界线程池中执行，
+    前端通过 job_id 轮询任务所处阶段和最终结果。
+    """
+
+    # 任务阶段，按执行顺序排列
+    STAGE_QUEUED = 'queued'
+    STAGE_CHECKING = 'checking'
+    STAGE_EXTRACTING = 'extracting'
+    STAGE_UPLOADING = 'uploading'
+    STAGE_TRANSCRIBING = 'transcribing'
+    STAGE_SAVING = 'saving'
+    STAGE_COMPLETED = 'completed'
+    STAGE_FAILED = 'failed'
+
+    FINISHED_STAGES = (STAGE_COMPLETED, STAGE_FAILED)
+
+    def __init__(self, video_service, max_workers=None, max_pending=None, job_ttl=None):
+        """初始化任务队列
+
+        Args:
+            video_service: 执行实际处理的 VideoService 实例
+            max_workers: 同时处理的最大任务数
+            max_pending: 允许排队+执行中的最大任务数，超过后拒绝新任务
+            job_ttl: 已结束任务在内存中保留的秒数
+        """
+        self.video_service = video_service
+        self.max_workers = max_workers or Config.TRANSCRIBE_MAX_WORKERS
+        self.max_pending = max_pending or Config.TRANSCRIBE_MAX_PENDING
+        self.job_ttl = job_ttl or Config.TRANSCRIBE_JOB_TTL
+
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                           thread_name_prefix='transcribe')
+        self.jobs = {}
+        self.active_jobs = {}  # (filename, source) -> job_id，避免同一视频重复入队
+        self.callbacks = {}  # job_id -> [任务结束时的回调]
+        self.lock = threading.Lock()
+
+    def submit(self, filename, source_type='upload', on_finished=None):
+        """提交转录任务
+
+        Args:
+            on_finished: 可选回调，任务结束后以任务快照调用（在工作线程中执行）
+
+        Returns:
+            tuple: (job 快照, 错误信息)，队列已满时 job 为 None
+        """
+        key = (filename, source_type)
+        with self.lock:
+            self._purge_expired()
+
+            # 同一视频已有进行中的任务时直接复用
+            existing_id = self.active_jobs.get(key)
+            if existing_id and existing_id in self.jobs:
+                if on_finished:
+                    self.callbacks.setdefault(existing_id, []).append(on_finished)
+                return self._snapshot(self.jobs[existing_id]), None
+
+            if len(self.active_jobs) >= self.max_pending:
+                return None, "转录队列已满，请稍后重试"
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            job = {
+                'id': job_id,
+                'filename': filename,
+                'source': source_type,
+                'stage': self.STAGE_QUEUED,
+                'error': None,
+                'result': None,
+                'created_at': now,
+                'updated_at': now,
+                'finished_at': None,
+                'timings': {},  # 阶段 -> 耗时（毫秒）
+            }
+            self.jobs[job_id] = job
+            self.active_jobs[key] = job_id
+            if on_finished:
+                self.callbacks[job_id] = [on_finished]
+            snapshot = self._snapshot(job)
+
+        self.executor.submit(self._run, job_id)
+        return snapshot, None
+
+    def get_job(self, job_id):
+        """获取任务当前状态的快照"""
+        with self.lock:
+            self._purge_expired()
+            job = self.jobs.get(job_id)
+            return self._snapshot(job) if job else None
+
+    def queue_depth(self):
+        """返回排队和执行中的任务数"""
+        with self.lock:
+            return len(self.active_jobs)
+
+    def _run(self, job_id):
+        """在工作线程中执行转录流程"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            filename, source_type = job['filename'], job['source']
+
+        try:
+            result = self.video_service.process_video(
+                filename,
+                source_type=source_type,
+                on_stage=lambda stage: self._set_stage(job_id, stage)
+            )
+            if result:
+                self._finish(job_id, result=self._serialize_result(result))
+            else:
+                self._finish(job_id, error='视频转录失败')
+        except Exception as e:
+            print(f"转录任务 {job_id} 执行失败: {str(e)}")
+            self._finish(job_id, error=str(e))
+
+    def _set_stage(self, job_id, stage):
+        """更新任务阶段"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job and job['stage'] not in self.FINISHED_STAGES:
+                now = time.time()
+                self._record_timing(job, now)
+                job['stage'] = stage
+                job['updated_at'] = now
+
+    def _finish(self, job_id, result=None, error=None):
+        """标记任务结束并释放占用的队列名额"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job:
+                return
+            now = time.time()
+            self._record_timing(job, now)
+            job['stage'] = self.STAGE_FAILED if error else self.STAGE_COMPLETED
+            job['result'] = result
+            job['error'] = error
+            job['updated_at'] = now
+            job['finished_at'] = now
+            key = (job['filename'], job['source'])
+            if self.active_jobs.get(key) == job_id:
+                del self.active_jobs[key]
+            callbacks = self.callbacks.pop(job_id, [])
+            snapshot = self._snapshot(job)
+
+        for callback in callbacks:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                print(f"转录任务 {job_id} 的回调执行失败: {str(e)}")
+
+    def _record_timing(self, job, now):
+        """累计当前阶段的耗时（调用方需持有锁）"""
+        elapsed = int((now - job['updated_at']) * 1000)
+        job['timings'][job['stage']] = job['timings'].get(job['stage'], 0) + elapsed
+
+    def _serialize_result(self, result):
+        """将 process_video 的结果转换为可 JSON 序列化的数据"""
+        return {
+            'transcription': {
+                'sentences': [
+                    {
+                        'begin_time': sentence.get('begin_time', 0),
+                        'end_time': sentence.get('end_time', 0),
+                        'text': sentence.get('text', '')
+                    }
+                    for sentence in result['transcription'].get('sentences', [])
+                ]
+            },
+            'video_url': result.get('video_url', ''),
+            'history_id': result.get('history_id', ''),
+            'cache_hit': result.get('cache_hit', False)
+        }
+
+    def _snapshot(self, job):
+        """返回任务的浅拷贝，避免调用方在锁外读取到正在修改的数据"""
+        return dict(job, timings=dict(job['timings']))
+
+    def _purge_expired(self):
+        """清理超过保留时间的已结束任务（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job['finished_at'] and now - job['finished_at'] > self.job_ttl
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
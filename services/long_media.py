@@ -0,0 +1,143 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import re
+import subprocess
+import tempfile
+from config import Config
+
+SILENCE_START_PATTERN = re.compile(r'silence_start:\s*(-?[\d.]+)')
+SILENCE_END_PATTERN = re.compile(r'silence_end:\s*(-?[\d.]+)')
+
+
+def detect_silences(audio_path):
+    """用 ffmpeg silencedetect 找出音频中的静音区间
+
+    Returns:
+        list: [(开始秒, 结束秒)]
+    """
+    command = [
+        Config.FFMPEG_BINARY, '-hide_banner', '-nostats',
+        '-i', audio_path,
+        '-af', f"silencedetect=noise={Config.SILENCE_NOISE}:d={Config.SILENCE_MIN_DURATION}",
+        '-f', 'null', '-'
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               timeout=Config.AUDIO_EXTRACT_TIMEOUT)
+    if completed.returncode != 0:
+        raise RuntimeError(f"静音检测失败: {completed.stderr.strip()[-500:]}")
+
+    silences = []
+    start = None
+    for line in completed.stderr.splitlines():
+        match = SILENCE_START_PATTERN.search(line)
+        if match:
+            start = max(float(match.group(1)), 0.0)
+            continue
+        match = SILENCE_END_PATTERN.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    return silences
+
+
+def plan_chunks(duration, silences, target=None, window=None):
+    """规划切分点
+
+    每段目标时长为 target 秒，在目标切分点前后 window 秒内选最长的静音，从静音中点切开，
+    切口不会落在句子中间；找不到静音时直接在目标位置切开。相邻两段首尾相接，不重叠也不留空。
+
+    Returns:
+        list: [(开始秒, 结束秒)]
+    """
+    target = target or Config.LONG_MEDIA_CHUNK_SECONDS
+    window = window if window is not None else Config.LONG_MEDIA_SEARCH_WINDOW
+
+    chunks = []
+    start = 0.0
+    while duration - start > target + window:
+        ideal = start + target
+        candidates = [
+            (end - begin, (begin + end) / 2) for begin, end in silences
+            if ideal - window <= (begin + end) / 2 <= ideal + window
+        ]
+        cut = max(candidates, key=lambda c: (c[0], -abs(c[1] - ideal)))[1] if candidates else ideal
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, duration))
+    return chunks
+
+
+def split_audio(audio_path, chunks):
+    """按规划好的区间切出每段音频（重新编码，保证起点精确）
+
+    Returns:
+        list: 临时文件路径列表（调用方负责删除）
+    """
+    paths = []
+    try:
+        for start, end in chunks:
+            fd, chunk_path = tempfile.mkstemp(suffix='.ogg', dir=Config.CACHE_FOLDER)
+            os.close(fd)
+            paths.append(chunk_path)
+            command = [
+                Config.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+                '-ss', f"{start:.3f}", '-t', f"{end - start:.3f}",
+                '-i', audio_path,
+                '-ac', '1',
+                '-ar', str(Config.AUDIO_SAMPLE_RATE),
+                '-c:a', 'libopus',
+                '-b:a', Config.AUDIO_BITRATE,
+                chunk_path
+            ]
+            completed = subprocess.run(command, capture_output=True, text=True,
+                                       timeout=Config.AUDIO_EXTRACT_TIMEOUT)
+            if completed.returncode != 0 or os.path.getsize(chunk_path) == 0:
+                raise RuntimeError(f"切分音频失败: {completed.stderr.strip()}")
+        return paths
+    except Exception:
+        for path in paths:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+
+def _shift(item, offset_ms):
+    """把句子（及其中的词）的时间加上偏移"""
+    shifted = dict(item)
+    for key in ('begin_time', 'end_time'):
+        if key in shifted:
+            shifted[key] = int(shifted[key]) + offset_ms
+    if isinstance(shifted.get('words'), list):
+        shifted['words'] = [_shift(word, offset_ms) for word in shifted['words']]
+    return shifted
+
+
+def stitch_sentences(chunk_sentences, chunk_starts):
+    """拼接各段的转写结果
+
+    每段的时间戳加上该段在原音频中的起点，按开始时间排序并重新编号。
+    各段本身不重叠，接缝处如果出现文本相同且时间重叠的两句（同一句被两段都识别到），只保留一句。
+
+    Args:
+        chunk_sentences: 每段的句子列表
+        chunk_starts: 每段的起点（秒）
+    """
+    merged = []
+    for sentences, start in zip(chunk_sentences, chunk_starts):
+        offset_ms = int(round(start * 1000))
+        merged.extend(_shift(sentence, offset_ms) for sentence in sentences)
+    merged.sort(key=lambda s: (s.get('begin_time', 0), s.get('end_time', 0)))
+
+    stitched = []
+    for sentence in merged:
+        previous = stitched[-1] if stitched else None
+        if previous and sentence.get('text') == previous.get('text') \
+                and sentence.get('begin_time', 0) < previous.get('end_time', 0):
+            continue
+        stitched.append(sentence)
+
+    for index, sentence in enumerate(stitched):
+        if 'sentence_id' in sentence:
+            sentence['sentence_id'] = index + 1
+    return stitched
@@ -0,0 +1,383 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import json
+import struct
+import subprocess
+import threading
+from collections import OrderedDict
+from config import Config
+
+
+class MediaProbeError(Exception):
+    """无法解析媒体文件"""
+
+
+# 只需要向下展开这些容器 box 就能找到 mvhd/tkhd/mdhd/hdlr/stsd/stts
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+MAX_MOOV_SIZE = 64 * 1024 * 1024  # moov 通常只有几百KB，超过这个大小视为异常文件
+
+
+def read_box_header(f, file_size):
+    """读取当前位置的 box 头
+
+    Returns:
+        tuple: (box 类型, box 总大小, 头部长度)，已到文件末尾时返回 None
+    """
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+
+    size, box_type = struct.unpack('>I4s', header)
+    header_size = 8
+    if size == 1:
+        # 64 位长度
+        large = f.read(8)
+        if len(large) < 8:
+            raise MediaProbeError('box 头不完整')
+        size = struct.unpack('>Q', large)[0]
+        header_size = 16
+    elif size == 0:
+        # 长度为 0 表示一直延续到文件末尾
+        size = file_size - f.tell() + header_size
+
+    if size < header_size:
+        raise MediaProbeError(f'无效的 box 大小: {box_type!r}')
+    return box_type, size, header_size
+
+
+def iter_boxes(data, offset=0, end=None):
+    """遍历内存中一段数据里的子 box
+
+    Yields:
+        tuple: (box 类型, 内容起始位置, 内容结束位置)
+    """
+    end = len(data) if end is None else end
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                break
+            size = struct.unpack_from('>Q', data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            break
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _find_moov(f, file_size):
+    """顺序跳过顶层 box（包括巨大的 mdat）找到 moov，只读取 moov 的内容"""
+    f.seek(0)
+    first = True
+    while True:
+        box = read_box_header(f, file_size)
+        if box is None:
+            raise MediaProbeError('未找到 moov box')
+        box_type, size, header_size = box
+
+        if first and box_type != b'ftyp':
+            raise MediaProbeError('不是 MP4 文件')
+        first = False
+
+        if box_type == b'moov':
+            if size > MAX_MOOV_SIZE:
+                raise MediaProbeError('moov box 过大')
+            data = f.read(size - header_size)
+            if len(data) < size - header_size:
+                raise MediaProbeError('moov box 不完整')
+            return data
+
+        f.seek(size - header_size, os.SEEK_CUR)
+
+
+def _parse_full_box_times(data, start):
+    """解析 mvhd/mdhd 的 timescale 和 duration（区分 version 0/1）"""
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from('>IQ', data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from('>II', data, start + 12)
+    return timescale, duration
+
+
+def _parse_tkhd(data, start):
+    """解析 tkhd 中的宽高（16.16 定点数）"""
+    version = data[start]
+    offset = start + (88 if version == 1 else 76)
+    width, height = struct.unpack_from('>II', data, offset)
+    return width >> 16, height >> 16
+
+
+def _parse_stsd(data, start):
+    """解析 stsd 中第一个 sample entry 的编码格式和宽高"""
+    entry_count = struct.unpack_from('>I', data, start + 4)[0]
+    if entry_count == 0:
+        return None, None, None
+    offset = start + 8
+    codec = data[offset + 4:offset + 8].decode('ascii', 'replace')
+    # VisualSampleEntry: 8 字节 box 头 + 6 保留 + 2 索引 + 16 预定义/保留，之后是宽高
+    width, height = struct.unpack_from('>HH', data, offset + 32)
+    return codec, width, height
+
+
+def _parse_stts(data, start):
+    """统计 stts 中的总帧数"""
+    entry_count = struct.unpack_from('>I', data, start + 4)[0]
+    total = 0
+    for i in range(entry_count):
+        total += struct.unpack_from('>I', data, start + 8 + i * 8)[0]
+    return total
+
+
+def _parse_trak(data, start, end):
+    """解析单个 trak，返回轨道信息"""
+    track = {}
+
+    def walk(offset, stop):
+        for box_type, content_start, content_end in iter_boxes(data, offset, stop):
+            if box_type == b'tkhd':
+                track['tkhd_width'], track['tkhd_height'] = _parse_tkhd(data, content_start)
+            elif box_type == b'mdhd':
+                track['timescale'], track['duration'] = _parse_full_box_times(data, content_start)
+            elif box_type == b'hdlr':
+                track['handler'] = data[content_start + 8:content_start + 12]
+            elif box_type == b'stsd':
+                track['codec'], track['width'], track['height'] = _parse_stsd(data, content_start)
+            elif box_type == b'stts':
+                track['sample_count'] = _parse_stts(data, content_start)
+            elif box_type in CONTAINER_BOXES:
+                walk(content_start, content_end)
+
+    walk(start, end)
+    return track
+
+
+def probe_mp4(video_path):
+    """直接读取 MP4 的 moov 元数据，不启动 ffmpeg 子进程"""
+    file_size = os.path.getsize(video_path)
+    with open(video_path, 'rb') as f:
+        moov = _find_moov(f, file_size)
+
+    duration = 0
+    video_track = None
+    audio_track = None
+    for box_type, content_start, content_end in iter_boxes(moov):
+        if box_type == b'mvhd':
+            timescale, movie_duration = _parse_full_box_times(moov, content_start)
+            if timescale:
+                duration = movie_duration / timescale
+        elif box_type == b'trak':
+            track = _parse_trak(moov, content_start, content_end)
+            if track.get('handler') == b'vide' and video_track is None:
+                video_track = track
+            elif track.get('handler') == b'soun' and audio_track is None:
+                audio_track = track
+
+    # 只有音轨的文件（音频优先下载的 .audio.m4a）没有视频轨，时长取 mvhd 或音轨的 mdhd
+    media_track = video_track or audio_track
+    if not duration and media_track and media_track.get('timescale'):
+        duration = media_track.get('duration', 0) / media_track['timescale']
+
+    # 分片 MP4 (fMP4) 的 moov 中没有时长和帧数，交给 ffprobe 处理
+    if not duration or not media_track:
+        raise MediaProbeError('MP4 缺少时长或音视频轨信息')
+
+    if not video_track:
+        return {
+            'duration': duration,
+            'size': file_size,
+            'fps': 0,
+            'resolution': '',
+            'video_codec': None,
+            'audio_codec': audio_track.get('codec'),
+            'has_audio': True,
+            'has_video': False
+        }
+    if not video_track.get('timescale'):
+        raise MediaProbeError('MP4 视频轨缺少 timescale')
+
+    fps = 0
+    track_seconds = video_track.get('duration', 0) / video_track['timescale']
+    if video_track.get('sample_count') and track_seconds > 0:
+        fps = round(video_track['sample_count'] / track_seconds, 3)
+
+    width = video_track.get('tkhd_width') or video_track.get('width') or 0
+    height = video_track.get('tkhd_height') or video_track.get('height') or 0
+
+    return {
+        'duration': duration,
+        'size': file_size,
+        'fps': fps,
+        'resolution': f"{width}x{height}",
+        'video_codec': video_track.get('codec'),
+        'audio_codec': audio_track.get('codec') if audio_track else None,
+        'has_audio': audio_track is not None,
+        'has_video': True
+    }
+
+
+def probe_with_ffprobe(video_path):
+    """使用 ffprobe 读取非常规容器（以及 webm/opus 等纯音频文件）的元数据"""
+    command = [
+        Config.FFPROBE_BINARY, '-v', 'error',
+        '-print_format', 'json',
+        '-show_format', '-show_streams',
+        video_path
+    ]
+    completed = subprocess.run(command, capture_output=True, text=True, timeout=60)
+    if completed.returncode != 0:
+        raise MediaProbeError(completed.stderr.strip() or 'ffprobe 执行失败')
+
+    info = json.loads(completed.stdout)
+    streams = info.get('streams', [])
+    video_stream = next((s for s in streams if s.get('codec_type') == 'video'), None)
+    audio_stream = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if not video_stream and not audio_stream:
+        raise MediaProbeError('未找到音视频流')
+
+    duration = float(info.get('format', {}).get('duration') or 0)
+    if not video_stream:
+        return {
+            'duration': duration,
+            'size': os.path.getsize(video_path),
+            'fps': 0,
+            'resolution': '',
+            'video_codec': None,
+            'audio_codec': audio_stream.get('codec_name'),
+            'has_audio': True,
+            'has_video': False
+        }
+
+    fps = 0
+    rate = video_stream.get('avg_frame_rate') or video_stream.get('r_frame_rate') or '0/0'
+    numerator, _, denominator = rate.partition('/')
+    if denominator and float(denominator):
+        fps = round(float(numerator) / float(denominator), 3)
+
+    return {
+        'duration': duration,
+        'size': os.path.getsize(video_path),
+        'fps': fps,
+        'resolution': f"{video_stream.get('width', 0)}x{video_stream.get('height', 0)}",
+        'video_codec': video_stream.get('codec_name'),
+        'audio_codec': audio_stream.get('codec_name') if audio_stream else None,
+        'has_audio': audio_stream is not None,
+        'has_video': True
+    }
+
+
+class Mp4StreamValidator:
+    """边接收边校验 MP4 顶层 box 结构
+
+    不缓存文件内容，只跟踪顶层 box 的边界：第一个 box 必须是 ftyp，
+    box 类型必须是可打印字符且声明的大小不能超过上限，
+    这样非 MP4 或损坏的文件在收到前几个字节时就会被拒绝。
+    """
+
+    def __init__(self, max_size=None):
+        self.max_size = max_size
+        self.position = 0  # 已接收的字节数
+        self.header_buf = b''
+        self.skip = 0  # 当前 box 剩余未接收的内容长度
+        self.open_ended = False  # 最后一个 box 声明长度为 0（延续到文件末尾）
+        self.box_types = []
+
+    def feed(self, data):
+        """接收一段数据，结构不合法时抛出 MediaProbeError"""
+        pos = 0
+        length = len(data)
+        while pos < length and not self.open_ended:
+            if self.skip:
+                step = min(self.skip, length - pos)
+                self.skip -= step
+                pos += step
+                continue
+
+            need = 8 if len(self.header_buf) < 8 else 16
+            take = min(need - len(self.header_buf), length - pos)
+            self.header_buf += data[pos:pos + take]
+            pos += take
+            if len(self.header_buf) < 8:
+                continue
+
+            size, box_type = struct.unpack('>I4s', self.header_buf[:8])
+            if size == 1 and len(self.header_buf) < 16:
+                continue
+            self._start_box(size, box_type, self.position + pos - len(self.header_buf))
+            self.header_buf = b''
+
+        self.position += length
+
+    def _start_box(self, size, box_type, box_start):
+        """校验新 box 的头部并设置需要跳过的内容长度"""
+        if not self.box_types and box_type != b'ftyp':
+            raise MediaProbeError('不是 MP4 文件')
+        if not all(32 <= c < 127 for c in box_type):
+            raise MediaProbeError(f'无效的 box 类型: {box_type!r}')
+
+        header_size = len(self.header_buf)
+        if size == 1:
+            size = struct.unpack('>Q', self.header_buf[8:16])[0]
+        elif size == 0:
+            self.open_ended = True
+            self.box_types.append(box_type)
+            return
+
+        if size < header_size:
+            raise MediaProbeError(f'无效的 box 大小: {box_type!r}')
+        if self.max_size and box_start + size > self.max_size:
+            raise MediaProbeError('MP4 声明的大小超过限制')
+
+        self.skip = size - header_size
+        self.box_types.append(box_type)
+
+    def finish(self):
+        """数据接收完毕后检查文件是否完整且包含 moov"""
+        if self.header_buf or (self.skip and not self.open_ended):
+            raise MediaProbeError('MP4 文件不完整')
+        if b'moov' not in self.box_types:
+            raise MediaProbeError('MP4 缺少 moov box')
+
+
+class MediaProbe:
+    """视频元数据探测，结果按 (路径, 大小, 修改时间) 缓存"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def probe(self, video_path):
+        """获取视频元数据，优先解析 MP4 box，失败时退回 ffprobe
+
+        Returns:
+            dict: duration/size/fps/resolution 等信息
+        """
+        stat = os.stat(video_path)
+        key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return dict(self.cache[key])
+
+        try:
+            info = probe_mp4(video_path)
+        except (MediaProbeError, struct.error) as e:
+            print(f"MP4 解析失败，使用 ffprobe: {str(e)}")
+            info = probe_with_ffprobe(video_path)
+
+        with self.lock:
+            self.cache[key] = info
+            if len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return dict(info)
+
+
+# 全局探测实例
+media_probe = MediaProbe()
@@ -0,0 +1,213 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import glob
+import mimetypes
+import uuid
+from flask import Response
+from werkzeug.http import http_date, parse_range_header, quote_etag
+from werkzeug.wsgi import wrap_file
+from config import Config
+
+# 每次从文件读取的块大小（仅在无法零拷贝发送时使用）
+READ_CHUNK_SIZE = 256 * 1024
+# 单次请求允许的最大分段数，超过后按整个文件返回，防止构造大量小分段消耗资源
+MAX_RANGES = 16
+
+
+def resolve_media_path(filename, root=None):
+    """将请求的文件名解析为 records 目录下的绝对路径
+
+    Returns:
+        str: 绝对路径，路径越界时返回 None
+    """
+    root = os.path.abspath(root or Config.RECORDS_FOLDER)
+    abs_path = os.path.abspath(os.path.join(root, filename))
+    if not abs_path.startswith(root + os.sep):
+        return None
+    return abs_path
+
+
+def audio_sidecar_template(filename, root=None):
+    """音频优先下载时音频文件的 yt-dlp 输出模板：与视频同名，扩展名前加 .audio"""
+    root = root or Config.RECORDS_FOLDER
+    return os.path.join(root, os.path.splitext(filename)[0] + '.audio.%(ext)s')
+
+
+def find_audio_file(filename, root=None):
+    """查找与视频同名的音频文件（音频优先下载、视频尚未下载时只有它）
+
+    Returns:
+        str: 音频文件的绝对路径，不存在时返回 None
+    """
+    root = root or Config.RECORDS_FOLDER
+    prefix = os.path.splitext(filename)[0] + '.audio.'
+    pattern = os.path.join(glob.escape(root), glob.escape(prefix) + '*')
+    for path in sorted(glob.glob(pattern)):
+        # 只接受 .audio.<扩展名>，跳过 yt-dlp 下载中的 .part/.ytdl 等临时文件
+        if path[len(os.path.join(root, prefix)):].isalnum() and resolve_media_path(os.path.relpath(path, root), root):
+            return path
+    return None
+
+
+def is_audio_file(path):
+    """是否是音频优先下载的音频文件（<视频名>.audio.<扩展名>）"""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return bool(ext) and stem.endswith('.audio')
+
+
+def make_etag(stat):
+    """根据文件大小、修改时间和 inode 生成强 ETag"""
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}-{stat.st_ino:x}"
+
+
+def _normalize_ranges(range_header, size):
+    """将 Range 头转换为 [(start, end)]（end 不包含），合并重叠的分段
+
+    Returns:
+        list: 分段列表；无法满足时返回空列表
+    """
+    ranges = []
+    for begin, end in range_header.ranges:
+        if begin < 0:
+            # 后缀范围 bytes=-N
+            begin = max(size + begin, 0)
+            end = size
+        else:
+            end = size if end is None else min(end, size)
+        if begin < end:
+            ranges.append((begin, end))
+
+    ranges.sort()
+    merged = []
+    for begin, end in ranges:
+        if merged and begin <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((begin, end))
+    return merged
+
+
+def _iter_file_range(f, begin, end):
+    """按块读取文件中的 [begin, end) 区间"""
+    f.seek(begin)
+    remaining = end - begin
+    while remaining > 0:
+        chunk = f.read(min(READ_CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def _multipart_body(f, ranges, size, content_type, boundary):
+    """生成 multipart/byteranges 响应体"""
+    for begin, end in ranges:
+        yield (
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {begin}-{end - 1}/{size}\r\n\r\n"
+        ).encode('ascii')
+        yield from _iter_file_range(f, begin, end)
+    yield f"\r\n--{boundary}--\r\n".encode('ascii')
+
+
+def _multipart_length(ranges, size, content_type, boundary):
+    """计算 multipart/byteranges 响应体的长度"""
+    length = len(f"\r\n--{boundary}--\r\n")
+    for begin, end in ranges:
+        length += len(
+            f"\r\n--{boundary}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Range: bytes {begin}-{end - 1}/{size}\r\n\r\n"
+        )
+        length += end - begin
+    return length
+
+
+def build_media_response(request, abs_path, accel_path=None):
+    """构建支持 Range/206、ETag 和条件请求的媒体响应
+
+    - If-None-Match 命中时返回 304
+    - If-Range 与当前 ETag 一致时才按 Range 返回，否则返回整个文件
+    - 单个分段或整个文件通过 wsgi.file_wrapper 发送，gunicorn/uwsgi 会使用 sendfile 零拷贝
+    - 配置了 MEDIA_SENDFILE_HEADER 时只返回 X-Sendfile/X-Accel-Redirect 头，由前端代理发送文件
+
+    Args:
+        request: 当前 Flask 请求
+        abs_path: 文件绝对路径
+        accel_path: 交给 X-Accel-Redirect 的内部路径
+    """
+    stat = os.stat(abs_path)
+    size = stat.st_size
+    etag = make_etag(stat)
+    content_type = mimetypes.guess_type(abs_path)[0] or 'application/octet-stream'
+
+    headers = {
+        'ETag': quote_etag(etag),
+        'Last-Modified': http_date(stat.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache',
+    }
+
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    # 交给前端代理发送文件，代理自己处理 Range
+    if Config.MEDIA_SENDFILE_HEADER == 'X-Accel-Redirect' and accel_path:
+        headers['X-Accel-Redirect'] = accel_path
+        return Response(status=200, headers=headers, content_type=content_type)
+    if Config.MEDIA_SENDFILE_HEADER == 'X-Sendfile':
+        headers['X-Sendfile'] = abs_path
+        return Response(status=200, headers=headers, content_type=content_type)
+
+    ranges = None
+    range_header = parse_range_header(request.headers.get('Range'))
+    if range_header and range_header.units == 'bytes':
+        # If-Range 只接受强 ETag 完全匹配，文件已变化时返回整个文件
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range.strip() == quote_etag(etag):
+            ranges = _normalize_ranges(range_header, size)
+            if not ranges:
+                headers['Content-Range'] = f"bytes */{size}"
+                return Response(status=416, headers=headers)
+            if len(ranges) > MAX_RANGES:
+                ranges = None
+
+    f = open(abs_path, 'rb')
+
+    if ranges and len(ranges) > 1:
+        boundary = uuid.uuid4().hex
+        headers['Content-Length'] = str(_multipart_length(ranges, size, content_type, boundary))
+        response = Response(
+            _multipart_body(f, ranges, size, content_type, boundary),
+            status=206,
+            headers=headers,
+            content_type=f"multipart/byteranges; boundary={boundary}",
+            direct_passthrough=True
+        )
+        response.call_on_close(f.close)
+        return response
+
+    begin, end = ranges[0] if ranges else (0, size)
+    headers['Content-Length'] = str(end - begin)
+    if ranges:
+        headers['Content-Range'] = f"bytes {begin}-{end - 1}/{size}"
+
+    if end == size:
+        # 一直读到文件末尾（整个文件或播放器拖动时最常见的 bytes=N-），
+        # 交给 wsgi.file_wrapper，gunicorn/uwsgi 会用 sendfile 零拷贝发送
+        f.seek(begin)
+        body = wrap_file(request.environ, f, buffer_size=READ_CHUNK_SIZE)
+    else:
+        body = _iter_file_range(f, begin, end)
+
+    response = Response(
+        body,
+        status=206 if ranges else 200,
+        headers=headers,
+        content_type=content_type,
+        direct_passthrough=True
+    )
+    response.call_on_close(f.close)
+    return response
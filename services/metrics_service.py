@@ -0,0 +1,182 @@
+import bisect
+import threading
+
+# 耗时直方图的默认分桶上限（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class MetricsRegistry:
+    """进程内指标注册表
+
+    以 (指标名, 标签) 为键累加计数，供各服务记录命中率、失败次数等信息；
+    耗时等分布类数据记录为固定分桶的直方图，内存占用与记录次数无关；
+    队列长度等当前值记录为 gauge，可以直接设置，也可以注册回调在导出时读取。
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}  # key -> {'buckets', 'counts', 'sum', 'count'}
+        self.gauges = {}
+        self.gauge_callbacks = {}  # 指标名 -> 回调
+        self.lock = threading.Lock()
+
+    def _key(self, name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """计数器加 value"""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def get(self, name, **labels):
+        """读取计数器当前值"""
+        with self.lock:
+            return self.counters.get(self._key(name, labels), 0)
+
+    def set_gauge(self, name, value, **labels):
+        """设置 gauge 的当前值"""
+        with self.lock:
+            self.gauges[self._key(name, labels)] = value
+
+    def register_gauge(self, name, callback):
+        """注册导出时才读取的 gauge
+
+        Args:
+            callback: 无参函数，返回一个数值，或 [(标签字典, 数值)] 列表
+        """
+        with self.lock:
+            self.gauge_callbacks[name] = callback
+
+    def _collect_gauges(self):
+        """读取所有 gauge（回调在锁外执行）"""
+        with self.lock:
+            items = list(self.gauges.items())
+            callbacks = list(self.gauge_callbacks.items())
+
+        for name, callback in callbacks:
+            try:
+                value = callback()
+            except Exception as e:
+                print(f"读取指标 {name} 失败: {str(e)}")
+                continue
+            samples = value if isinstance(value, list) else [({}, value)]
+            items.extend((self._key(name, labels), sample) for labels, sample in samples)
+        return sorted(items, key=lambda item: item[0])
+
+    def observe(self, name, value, buckets=DEFAULT_BUCKETS, **labels):
+        """向直方图记录一个观测值（例如一次调用的耗时）"""
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': tuple(buckets),
+                    'counts': [0] * (len(buckets) + 1),  # 最后一个桶是 +Inf
+                    'sum': 0.0,
+                    'count': 0
+                }
+            histogram['counts'][bisect.bisect_left(histogram['buckets'], value)] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def snapshot(self):
+        """导出所有指标
+
+        计数器为 {'labels': {...}, 'value': n}；直方图为
+        {'labels': {...}, 'count', 'sum', 'buckets': {上限: 累计次数}, 'p50', 'p95', 'p99'}，
+        分位数按分桶线性插值估算。格式为 {指标名: [...]}。
+        """
+        with self.lock:
+            items = list(self.counters.items())
+            histograms = [(key, dict(h, counts=list(h['counts']))) for key, h in self.histograms.items()]
+
+        result = {}
+        for (name, labels), value in sorted(items) + self._collect_gauges():
+            result.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        for (name, labels), histogram in sorted(histograms, key=lambda item: item[0]):
+            entry = {
+                'labels': dict(labels),
+                'count': histogram['count'],
+                'sum': round(histogram['sum'], 6),
+                'buckets': self._cumulative(histogram)
+            }
+            for quantile in QUANTILES:
+                entry[f'p{int(quantile * 100)}'] = self._quantile(histogram, quantile)
+            result.setdefault(name, []).append(entry)
+        return result
+
+    def render_prometheus(self):
+        """按 Prometheus 文本格式（0.0.4）导出所有指标"""
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(((key, dict(h, counts=list(h['counts']))) for key, h in self.histograms.items()),
+                                key=lambda item: item[0])
+        gauges = self._collect_gauges()
+
+        lines = []
+        declared = set()
+
+        def declare(name, metric_type):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f'# TYPE {name} {metric_type}')
+
+        for (name, labels), value in counters:
+            declare(name, 'counter')
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), value in gauges:
+            declare(name, 'gauge')
+            lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+        for (name, labels), histogram in histograms:
+            declare(name, 'histogram')
+            for bound, count in self._cumulative(histogram).items():
+                lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {count}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _cumulative(self, histogram):
+        cumulative = {}
+        total = 0
+        for bound, count in zip(list(histogram['buckets']) + ['+Inf'], histogram['counts']):
+            total += count
+            cumulative[str(bound)] = total
+        return cumulative
+
+    def _quantile(self, histogram, quantile):
+        """按分桶估算分位数，落在 +Inf 桶时返回最大的有限上限"""
+        if not histogram['count']:
+            return None
+        rank = quantile * histogram['count']
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(histogram['buckets'], histogram['counts']):
+            if count and seen + count >= rank:
+                return round(lower + (bound - lower) * (rank - seen) / count, 6)
+            seen += count
+            lower = bound
+        return histogram['buckets'][-1]
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        f'{key}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in labels
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+# 全局指标实例
+metrics = MetricsRegistry()
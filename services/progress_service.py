@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import threading
+import time
+from config import Config
+
+
+class ProgressStore:
+    """下载进度存储
+
+    每个任务只保存最新的一份状态和版本号，新的进度直接覆盖旧的，
+    不会像队列那样随回调次数增长；已结束的任务在 ttl 秒后清理，
+    长时间没有更新的任务在 stale_ttl 秒后清理，内存占用与下载数量无关。
+    """
+
+    FINISHED_STATUSES = ('completed', 'error')
+
+    def __init__(self, ttl=None, stale_ttl=None):
+        self.ttl = ttl or Config.PROGRESS_TTL
+        self.stale_ttl = stale_ttl or Config.PROGRESS_STALE_TTL
+        self.tasks = {}  # task_id -> {'version', 'state', 'updated_at', 'finished_at'}
+        self.condition = threading.Condition()
+
+    def update(self, task_id, state):
+        """覆盖任务的最新状态并唤醒等待中的订阅者"""
+        now = time.time()
+        with self.condition:
+            task = self.tasks.get(task_id)
+            if task is None:
+                task = self.tasks[task_id] = {'version': 0, 'state': None,
+                                              'updated_at': now, 'finished_at': None}
+            task['version'] += 1
+            task['state'] = state
+            task['updated_at'] = now
+            if state.get('status') in self.FINISHED_STATUSES:
+                task['finished_at'] = now
+            self._purge_expired(now)
+            self.condition.notify_all()
+
+    def get(self, task_id):
+        """获取任务的 (版本号, 最新状态)，任务不存在时返回 (0, None)"""
+        with self.condition:
+            self._purge_expired(time.time())
+            task = self.tasks.get(task_id)
+            if not task:
+                return 0, None
+            return task['version'], task['state']
+
+    def wait_for_update(self, task_id, since_version, timeout):
+        """等待任务版本号超过 since_version，超时后返回当前状态
+
+        Returns:
+            tuple: (版本号, 最新状态)
+        """
+        deadline = time.time() + timeout
+        with self.condition:
+            while True:
+                task = self.tasks.get(task_id)
+                if task and task['version'] > since_version:
+                    return task['version'], task['state']
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return (task['version'], task['state']) if task else (0, None)
+                self.condition.wait(remaining)
+
+    def __len__(self):
+        with self.condition:
+            return len(self.tasks)
+
+    def _purge_expired(self, now):
+        """清理过期任务（调用方需持有锁）"""
+        expired = [
+            task_id for task_id, task in self.tasks.items()
+            if (task['finished_at'] and now - task['finished_at'] > self.ttl)
+            or now - task['updated_at'] > self.stale_ttl
+        ]
+        for task_id in expired:
+            del self.tasks[task_id]
@@ -0,0 +1,88 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import time
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+from services.metrics_service import metrics
+
+RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+@contextmanager
+def track_call(service, operation):
+    """记录一次远程调用的耗时和结果
+
+    耗时记入直方图 remote_call_seconds，次数按结果（ok/error）记入 remote_calls_total，
+    标签为服务名和操作名。某个依赖变慢时可以直接从分位数上看出来。
+    """
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        metrics.observe('remote_call_seconds', time.perf_counter() - started,
+                        service=service, operation=operation)
+        metrics.inc('remote_calls_total', service=service, operation=operation, outcome=outcome)
+
+
+def call_with_retries(service, operation, func, is_retryable, retries=None, backoff=0.5):
+    """执行幂等的远程调用，可重试的错误按指数退避有限次重试
+
+    每次尝试都通过 track_call 单独计时，重试用完后抛出最后一次的异常。
+
+    Args:
+        func: 无参函数，执行一次调用
+        is_retryable: 判断异常是否值得重试（连接失败、5xx 等），其余异常直接抛出
+    """
+    retries = Config.REMOTE_RETRIES if retries is None else retries
+    for attempt in range(retries + 1):
+        try:
+            with track_call(service, operation):
+                return func()
+        except Exception as e:
+            if attempt == retries or not is_retryable(e):
+                raise
+            delay = backoff * 2 ** attempt
+            print(f"{service} {operation} 失败（第 {attempt + 1} 次），{delay:.1f}s 后重试: {str(e)}")
+            time.sleep(delay)
+
+
+class HttpClient:
+    """共享的 HTTP 客户端
+
+    同一个 requests.Session 复用 keep-alive 连接池，每个请求都带连接/读取超时，
+    连接失败和 429/5xx 按指数退避有限次重试（只重试幂等的 GET/HEAD）。
+    """
+
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None, retries=None):
+        pool_size = pool_size or Config.REMOTE_POOL_SIZE
+        retries = retries if retries is not None else Config.REMOTE_RETRIES
+        self.timeout = (connect_timeout or Config.REMOTE_CONNECT_TIMEOUT,
+                        read_timeout or Config.REMOTE_READ_TIMEOUT)
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=RETRYABLE_STATUS_CODES,
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def get(self, url, service, operation, **kwargs):
+        """发送 GET 请求，耗时记入 service/operation 的直方图"""
+        kwargs.setdefault('timeout', self.timeout)
+        with track_call(service, operation):
+            return self.session.get(url, **kwargs)
+
+
+# 全局客户端实例
+http_client = HttpClient()
@@ -0,0 +1,185 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import html
+import re
+import sqlite3
+import threading
+from config import Config
+from services.metrics_service import metrics
+from services.timeline import TAG_PATTERN
+
+CJK = '\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'  # 假名和中日韩统一表意文字
+TOKEN_PATTERN = re.compile(f'[{CJK}]+|[^\\W_{CJK}]+')
+CJK_PATTERN = re.compile(f'[{CJK}]')
+SNIPPET_RADIUS = 20  # 片段中命中位置前后保留的字符数
+
+
+def tokenize(text):
+    """切分索引词：中日文按相邻两个字切成二元组，其他文字按单词切分并转为小写
+
+    查询词用同样的方式切分后作为短语匹配，连续的二元组命中即等价于子串命中，
+    不需要中文分词词典。
+    """
+    tokens = []
+    for run in TOKEN_PATTERN.findall(text.lower()):
+        if CJK_PATTERN.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def tail_chars(text):
+    """每段中文的最后一个字
+
+    单个汉字要么是某个二元组的第一个字，要么在一段中文的末尾，
+    前者用前缀匹配 tokens 列，后者匹配 tails 列，两者合起来覆盖所有出现位置。
+    """
+    return [run[-1] for run in TOKEN_PATTERN.findall(text.lower()) if CJK_PATTERN.match(run) and len(run) > 1]
+
+
+def _match_expression(term):
+    """把一个查询词转换为 FTS5 查询表达式
+
+    每段文字单独匹配：多字中文按二元组短语匹配，单个汉字匹配二元组的首字或段末的字，
+    其他单词按前缀匹配。各段在原文中是否相邻由查询里的 instr 条件确认。
+    """
+    parts = []
+    for run in TOKEN_PATTERN.findall(term.lower()):
+        if not CJK_PATTERN.match(run):
+            parts.append(f'tokens : "{run}"*')
+        elif len(run) == 1:
+            parts.append(f'(tokens : "{run}"* OR tails : "{run}")')
+        else:
+            parts.append('tokens : "' + ' '.join(tokenize(run)) + '"')
+    return ' AND '.join(parts)
+
+
+class TranscriptSearchIndex:
+    """转录文本的全文索引（SQLite FTS5）
+
+    每个句子是一行，记录所属的历史记录 ID 和开始/结束时间，
+    搜索结果按 bm25 排序，可以直接跳转到视频中的对应时刻。
+    转录写入时按记录整体替换，删除记录时一起删除，索引是增量维护的。
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.SEARCH_INDEX_PATH
+        self.local = threading.local()
+        self._init_db()
+
+    def _connect(self):
+        """每个线程复用一个连接，搜索时不必反复打开数据库文件"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    def _init_db(self):
+        folder = os.path.dirname(self.db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        with self._connect() as conn:
+            # segments 保存原文和时间，history_id 有索引，按记录删除不必扫描全表；
+            # segments_fts 只保存切分后的索引词（见 tokenize/tail_chars），rowid 与 segments.id 一致
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS segments (
+                    id INTEGER PRIMARY KEY,
+                    history_id TEXT NOT NULL,
+                    begin_time INTEGER NOT NULL,
+                    end_time INTEGER NOT NULL,
+                    text TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS segments_history_id ON segments (history_id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS segments_fts USING fts5(tokens, tails);
+            ''')
+
+    def _delete(self, conn, history_id):
+        conn.execute(
+            'DELETE FROM segments_fts WHERE rowid IN (SELECT id FROM segments WHERE history_id = ?)',
+            (history_id,)
+        )
+        conn.execute('DELETE FROM segments WHERE history_id = ?', (history_id,))
+
+    def index_transcript(self, history_id, sentences):
+        """写入（或替换）一条记录的全部句子"""
+        history_id = str(history_id)
+        try:
+            with self._connect() as conn:
+                self._delete(conn, history_id)
+                for sentence in sentences:
+                    text = TAG_PATTERN.sub('', sentence.get('text', '')).strip()
+                    if not text:
+                        continue
+                    cursor = conn.execute(
+                        'INSERT INTO segments (history_id, begin_time, end_time, text) VALUES (?, ?, ?, ?)',
+                        (history_id, int(sentence.get('begin_time', 0)), int(sentence.get('end_time', 0)), text)
+                    )
+                    conn.execute(
+                        'INSERT INTO segments_fts (rowid, tokens, tails) VALUES (?, ?, ?)',
+                        (cursor.lastrowid, ' '.join(tokenize(text)), ' '.join(tail_chars(text)))
+                    )
+        except sqlite3.Error as e:
+            print(f"更新搜索索引失败: {str(e)}")
+
+    def remove(self, history_id):
+        """删除一条记录的索引"""
+        try:
+            with self._connect() as conn:
+                self._delete(conn, str(history_id))
+        except sqlite3.Error as e:
+            print(f"删除搜索索引失败: {str(e)}")
+
+    def search(self, query, limit=20):
+        """搜索句子，空格分隔的多个词需要同时命中
+
+        Returns:
+            list: [{'history_id', 'begin_time', 'end_time', 'snippet'}]，按相关度排序
+        """
+        terms = [term for term in query.split() if tokenize(term)]
+        if not terms:
+            return []
+        limit = min(limit, Config.SEARCH_MAX_RESULTS)
+        metrics.inc('search_queries_total')
+
+        # 先用索引找出候选句子，再用 instr 确认整个词在原文中连续出现；多个词之间是 AND
+        match = ' AND '.join(_match_expression(term) for term in terms)
+        conditions = ' AND '.join(['instr(lower(s.text), lower(?)) > 0'] * len(terms))
+        rows = self._connect().execute(f'''
+            SELECT s.history_id, s.begin_time, s.end_time, s.text
+            FROM segments_fts
+            JOIN segments s ON s.id = segments_fts.rowid
+            WHERE segments_fts MATCH ? AND {conditions}
+            ORDER BY bm25(segments_fts)
+            LIMIT ?
+        ''', (match, *terms, limit)).fetchall()
+
+        return [
+            {
+                'history_id': history_id,
+                'begin_time': begin_time,
+                'end_time': end_time,
+                'snippet': self._make_snippet(text, terms[0])
+            }
+            for history_id, begin_time, end_time, text in rows
+        ]
+
+    def _make_snippet(self, text, term):
+        """截取命中位置附近的文本，命中的词用 <mark> 标记
+
+        返回可以直接插入页面的 HTML：转录文本的每一段都先做 HTML 转义，只有 <mark> 标签是标记。
+        """
+        position = text.lower().find(term.lower())
+        if position < 0:
+            return html.escape(text[:SNIPPET_RADIUS * 2])
+        end_of_term = position + len(term)
+        start = max(position - SNIPPET_RADIUS, 0)
+        end = min(end_of_term + SNIPPET_RADIUS, len(text))
+        return ('…' if start > 0 else '') + html.escape(text[start:position]) + \
+            '<mark>' + html.escape(text[position:end_of_term]) + '</mark>' + \
+            html.escape(text[end_of_term:end]) + ('…' if end < len(text) else '')
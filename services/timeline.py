@@ -0,0 +1,154 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import base64
+import bisect
+import re
+import struct
+from array import array
+
+# 时间轴二进制格式（小端）：
+#   魔数 b'TLN1' | 句子数 N (uint32) | 文本字节数 (uint32)
+#   begin_ms[N] (uint32) | end_ms[N] (uint32) | offsets[N+1] (uint32) | UTF-8 文本
+MAGIC = b'TLN1'
+HEADER = struct.Struct('<4sII')
+
+TAG_PATTERN = re.compile(r'<\|[^>]+\|>')
+
+
+def _uint32_array(values):
+    """构造小端 uint32 数组"""
+    arr = array('I', values)
+    if arr.itemsize != 4:
+        arr = array('L', values)
+    if sys.byteorder == 'big':
+        arr.byteswap()
+    return arr
+
+
+class Timeline:
+    """按开始时间排序的句子时间轴
+
+    begin_ms/end_ms 是并行的整数数组，所有句子文本保存在一个 UTF-8 缓冲区中，
+    第 i 句的文本是 text_buffer[offsets[i]:offsets[i+1]]。
+    """
+
+    def __init__(self, begins, ends, offsets, text_buffer):
+        self.begins = begins
+        self.ends = ends
+        self.offsets = offsets
+        self.text_buffer = text_buffer
+        self._max_ends = None
+
+    def __len__(self):
+        return len(self.begins)
+
+    def text(self, index):
+        """读取第 index 句的文本"""
+        return bytes(self.text_buffer[self.offsets[index]:self.offsets[index + 1]]).decode('utf-8')
+
+    def sentence(self, index):
+        return {
+            'begin_time': self.begins[index],
+            'end_time': self.ends[index],
+            'text': self.text(index)
+        }
+
+    @property
+    def duration(self):
+        """最后一句的结束时间（毫秒）"""
+        return max(self.ends) if len(self) else 0
+
+    def window(self, from_ms, to_ms):
+        """返回与 [from_ms, to_ms) 有重叠的句子下标范围 (start, stop)
+
+        begins 已排序，ends 取前缀最大值后也单调，两端各做一次二分查找，
+        不需要遍历全部句子。
+        """
+        if self._max_ends is None:
+            max_ends, current = [], 0
+            for end in self.ends:
+                current = max(current, end)
+                max_ends.append(current)
+            self._max_ends = max_ends
+        start = bisect.bisect_right(self._max_ends, from_ms)
+        stop = bisect.bisect_left(self.begins, to_ms)
+        return start, max(start, stop)
+
+    def segments(self, from_ms, to_ms):
+        """返回 [from_ms, to_ms) 时间窗口内的句子"""
+        start, stop = self.window(from_ms, to_ms)
+        return [self.sentence(i) for i in range(start, stop)]
+
+    def to_columns(self):
+        """转换为列式 JSON 结构"""
+        return {
+            'begin_ms': list(self.begins),
+            'end_ms': list(self.ends),
+            'texts': [self.text(i) for i in range(len(self))]
+        }
+
+    @classmethod
+    def from_sentences(cls, sentences):
+        """由 SenseVoice 返回的句子列表构建时间轴（去掉情感/事件标签并按开始时间排序）"""
+        rows = sorted(
+            (
+                int(sentence.get('begin_time', 0)),
+                int(sentence.get('end_time', 0)),
+                TAG_PATTERN.sub('', sentence.get('text', '')).strip().encode('utf-8')
+            )
+            for sentence in sentences
+        )
+        offsets = [0]
+        for _, _, text in rows:
+            offsets.append(offsets[-1] + len(text))
+        return cls(
+            [row[0] for row in rows],
+            [row[1] for row in rows],
+            offsets,
+            b''.join(row[2] for row in rows)
+        )
+
+    def pack(self):
+        """序列化为紧凑的二进制格式"""
+        return b''.join([
+            HEADER.pack(MAGIC, len(self), len(self.text_buffer)),
+            _uint32_array(self.begins).tobytes(),
+            _uint32_array(self.ends).tobytes(),
+            _uint32_array(self.offsets).tobytes(),
+            bytes(self.text_buffer)
+        ])
+
+    @classmethod
+    def unpack(cls, data):
+        """从二进制数据还原时间轴，数组直接映射到数据上，不逐条解析"""
+        magic, count, text_length = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError('无效的时间轴数据')
+
+        view = memoryview(data)
+        offset = HEADER.size
+        array_size = count * 4
+        if len(data) != offset + array_size * 3 + 4 + text_length:
+            raise ValueError('时间轴数据长度不正确')
+
+        def read_uint32(start, length):
+            arr = array('I' if array('I').itemsize == 4 else 'L')
+            arr.frombytes(view[start:start + length])
+            if sys.byteorder == 'big':
+                arr.byteswap()
+            return arr
+
+        begins = read_uint32(offset, array_size)
+        ends = read_uint32(offset + array_size, array_size)
+        offsets = read_uint32(offset + array_size * 2, array_size + 4)
+        text_buffer = view[offset + array_size * 3 + 4:]
+        return cls(begins, ends, offsets, text_buffer)
+
+    def to_base64(self):
+        """编码为 base64，用于保存到历史记录的文本列"""
+        return base64.b64encode(self.pack()).decode('ascii')
+
+    @classmethod
+    def from_base64(cls, value):
+        return cls.unpack(base64.b64decode(value))
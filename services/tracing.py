@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import functools
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from config import Config
+from services.metrics_service import metrics
+
+_local = threading.local()
+# 最近完成的追踪，供 /api/metrics 查看单次处理的各阶段明细
+recent_traces = deque(maxlen=Config.TRACE_HISTORY)
+
+
+class Span:
+    """一个处理阶段：耗时、结果和附加属性（如字节数），可以包含子阶段"""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.outcome = 'ok'
+        self.error = None
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def fail(self, message):
+        """标记阶段失败（用于以返回 None 表示失败、不抛异常的函数）"""
+        self.outcome = 'error'
+        self.error = message
+
+    def to_dict(self):
+        data = {
+            'name': self.name,
+            'duration_ms': round(self.duration * 1000, 1) if self.duration is not None else None,
+            'outcome': self.outcome,
+        }
+        if self.attributes:
+            data['attributes'] = dict(self.attributes)
+        if self.error:
+            data['error'] = self.error
+        if self.children:
+            data['children'] = [child.to_dict() for child in self.children]
+        return data
+
+
+class _NoopSpan:
+    """当前线程不在任何阶段中时 current_span 返回它，调用方不必判断"""
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, message):
+        pass
+
+
+def current_span():
+    return getattr(_local, 'current', None) or _NoopSpan()
+
+
+@contextmanager
+def span(name, root=False, **attributes):
+    """记录一个处理阶段
+
+    阶段的耗时按 (stage, outcome) 记入直方图 pipeline_stage_seconds，
+    设置了 bytes 属性的阶段把字节数记入 pipeline_stage_bytes_total。
+    同一线程中嵌套的阶段组成一棵树；root=True 的阶段结束时作为一次完整的追踪打印并保留。
+    其他线程中的阶段（例如分段并发上传）没有父阶段，只记入指标。
+    """
+    parent = getattr(_local, 'current', None)
+    current = Span(name, attributes)
+    if parent:
+        parent.children.append(current)
+    _local.current = current
+    try:
+        yield current
+    except Exception as e:
+        current.fail(str(e))
+        raise
+    finally:
+        current.duration = time.perf_counter() - current.started
+        _local.current = parent
+        metrics.observe('pipeline_stage_seconds', current.duration, stage=name, outcome=current.outcome)
+        if current.attributes.get('bytes'):
+            metrics.inc('pipeline_stage_bytes_total', current.attributes['bytes'], stage=name)
+        if root and parent is None:
+            _finish_trace(current)
+
+
+def traced(name, root=False):
+    """把函数调用记录为一个阶段，函数返回 None 时视为失败"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, root=root) as current:
+                result = func(*args, **kwargs)
+                if result is None:
+                    current.fail(f'{func.__name__} 返回空结果')
+                return result
+        return wrapper
+    return decorator
+
+
+def _finish_trace(root):
+    trace = root.to_dict()
+    trace['trace_id'] = uuid.uuid4().hex[:16]
+    trace['started_at'] = root.started_at
+    recent_traces.append(trace)
+
+    stages = ', '.join(f"{child.name} {child.duration * 1000:.0f}ms" for child in root.children)
+    print(f"[trace {trace['trace_id']}] {root.name} {root.outcome} {root.duration * 1000:.0f}ms（{stages}）")
@@ -0,0 +1,143 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from config import Config
+from services.metrics_service import metrics
+
+
+class TranscriptionCache:
+    """按视频内容哈希缓存转录结果
+
+    同一份字节（换了文件名上传、或重复下载同一个链接）只转录一次：
+    - file_hashes 表记录 (路径, 大小, 修改时间) → 内容哈希，每个文件只需完整读取一次
+    - transcriptions 表记录 内容哈希 → (OSS 对象, 句子列表, 格式化文本, 视频信息)
+    """
+
+    HASH_CHUNK_SIZE = 1024 * 1024  # 计算哈希时每次读取1MB
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or Config.TRANSCRIPTION_CACHE_PATH
+        self.lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        """每次操作使用独立连接，避免跨线程共享 sqlite 连接"""
+        return sqlite3.connect(self.db_path, timeout=10)
+
+    def _init_db(self):
+        """创建缓存表"""
+        folder = os.path.dirname(self.db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT NOT NULL
+                )
+            ''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS transcriptions (
+                    content_hash TEXT PRIMARY KEY,
+                    oss_object TEXT,
+                    sentences TEXT NOT NULL,
+                    plain_text TEXT NOT NULL,
+                    formatted_text TEXT NOT NULL,
+                    video_info TEXT,
+                    created_at REAL NOT NULL
+                )
+            ''')
+
+    def file_hash(self, file_path):
+        """获取文件内容的 SHA-256
+
+        文件的大小和修改时间没有变化时直接返回记录的哈希，否则流式重新计算。
+        """
+        stat = os.stat(file_path)
+        path = os.path.abspath(file_path)
+
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT size, mtime_ns, content_hash FROM file_hashes WHERE path = ?',
+                (path,)
+            ).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+            return row[2]
+
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+
+        self.remember_hash(file_path, content_hash)
+        return content_hash
+
+    def remember_hash(self, file_path, content_hash):
+        """记录已经算好的文件哈希（例如在接收上传时顺带计算的哈希）"""
+        stat = os.stat(file_path)
+        with self.lock, self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO file_hashes (path, size, mtime_ns, content_hash) VALUES (?, ?, ?, ?)',
+                (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns, content_hash)
+            )
+
+    def forget_file(self, file_path):
+        """文件被删除时移除对应的哈希记录"""
+        with self.lock, self._connect() as conn:
+            conn.execute('DELETE FROM file_hashes WHERE path = ?', (os.path.abspath(file_path),))
+
+    def get(self, content_hash):
+        """查询转录缓存，并记录命中/未命中次数
+
+        Returns:
+            dict: 缓存的转录结果，未命中时返回 None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT oss_object, sentences, plain_text, formatted_text, video_info '
+                'FROM transcriptions WHERE content_hash = ?',
+                (content_hash,)
+            ).fetchone()
+
+        if not row:
+            metrics.inc('transcription_cache_requests_total', result='miss')
+            return None
+
+        metrics.inc('transcription_cache_requests_total', result='hit')
+        return {
+            'content_hash': content_hash,
+            'oss_object': row[0],
+            'sentences': json.loads(row[1]),
+            'plain_text': row[2],
+            'formatted_text': row[3],
+            'video_info': json.loads(row[4]) if row[4] else None
+        }
+
+    def put(self, content_hash, oss_object, sentences, plain_text, formatted_text, video_info=None):
+        """写入转录缓存"""
+        with self.lock, self._connect() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO transcriptions '
+                '(content_hash, oss_object, sentences, plain_text, formatted_text, video_info, created_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (content_hash, oss_object, json.dumps(sentences, ensure_ascii=False),
+                 plain_text, formatted_text,
+                 json.dumps(video_info) if video_info else None, time.time())
+            )
+
+    def forget_oss_object(self, oss_object):
+        """OSS 对象被删除后，保留转录结果但清除对象引用"""
+        with self.lock, self._connect() as conn:
+            conn.execute(
+                'UPDATE transcriptions SET oss_object = NULL WHERE oss_object = ?',
+                (oss_object,)
+            )
@@ -0,0 +1,90 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import copy
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlsplit, parse_qs
+from config import Config
+from services.metrics_service import metrics
+
+YOUTUBE_ID_PATTERN = re.compile(r'^[\w-]{11}$')
+BILIBILI_ID_PATTERN = re.compile(r'/video/(BV\w+|av\d+)', re.IGNORECASE)
+
+
+def normalize_url(url):
+    """把同一个视频的不同写法归一为同一个键
+
+    youtu.be、m.youtube.com、shorts、embed 等形式统一为 youtube:<视频 ID>，
+    Bilibili 统一为 bilibili:<BV 号>[:分 P]，分享参数、时间点等无关参数被忽略。
+    无法识别的链接原样返回（去掉 fragment）。
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or '').lower()
+    path = parts.path
+    query = parse_qs(parts.query)
+
+    if host == 'youtu.be' or host.endswith('youtube.com'):
+        video_id = None
+        if host == 'youtu.be':
+            video_id = path.strip('/').split('/')[0]
+        elif path == '/watch':
+            video_id = (query.get('v') or [None])[0]
+        else:
+            segments = path.strip('/').split('/')
+            if len(segments) >= 2 and segments[0] in ('shorts', 'embed', 'live', 'v'):
+                video_id = segments[1]
+        if video_id and YOUTUBE_ID_PATTERN.match(video_id):
+            return f'youtube:{video_id}'
+
+    elif host.endswith('bilibili.com'):
+        match = BILIBILI_ID_PATTERN.search(path)
+        if match:
+            key = f'bilibili:{match.group(1)}'
+            page = (query.get('p') or ['1'])[0]
+            return key if page == '1' else f'{key}:{page}'
+
+    return parts._replace(fragment='').geturl()
+
+
+class UrlInfoCache:
+    """yt-dlp 提取结果的缓存，按归一化后的链接保存，带过期时间
+
+    提取信息要请求视频页面、播放器脚本和格式列表，同一个链接短时间内再次下载时直接复用。
+    格式中的直链会过期，所以过期时间不宜太长；调用方在使用缓存信息下载失败时应调用 invalidate。
+    """
+
+    def __init__(self, ttl=None, max_entries=None):
+        self.ttl = ttl or Config.YTDLP_INFO_CACHE_TTL
+        self.max_entries = max_entries or Config.YTDLP_INFO_CACHE_MAX_ENTRIES
+        self.entries = OrderedDict()  # key -> (过期时间, info)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """返回缓存信息的副本（下载过程会修改 info），未命中时返回 None"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] < time.time():
+                del self.entries[key]
+                entry = None
+            if not entry:
+                metrics.inc('ytdlp_info_cache_total', result='miss')
+                return None
+            self.entries.move_to_end(key)
+            info = entry[1]
+        metrics.inc('ytdlp_info_cache_total', result='hit')
+        return copy.deepcopy(info)
+
+    def set(self, key, info):
+        info = copy.deepcopy(info)
+        with self.lock:
+            self.entries[key] = (time.time() + self.ttl, info)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
@@ -0,0 +1,193 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import threading
+import time
+from datetime import datetime
+from config import Config
+from services.metrics_service import metrics
+from services.youtube_service import MODE_AUDIO
+
+
+class UrlIngestPipeline:
+    """链接导入流水线：下载 → 上传 → 转录各阶段重叠执行
+
+    只先下载音轨，音轨一落地就写入历史记录并提交转录任务（提取 → 上传 OSS → ASR），
+    同时在下载队列中补下载视频画面，不必等视频合并完成、也不需要用户再点一次转录。
+    每个阶段记录相对流水线开始时间的起止时刻，可以直接看出哪些阶段是重叠的、瓶颈在哪里。
+    """
+
+    # 流水线阶段
+    STAGE_AUDIO = 'audio_download'
+    STAGE_HISTORY = 'history_write'
+    STAGE_VIDEO = 'video_download'
+    STAGE_TRANSCRIPTION = 'transcription'
+
+    def __init__(self, download_service, video_service, job_service, ttl=None):
+        self.download_service = download_service
+        self.video_service = video_service
+        self.job_service = job_service
+        self.ttl = ttl or Config.TRANSCRIBE_JOB_TTL
+        self.runs = {}  # task_id -> 流水线状态
+        self.lock = threading.Lock()
+
+    def start(self, user_input, priority=0):
+        """提交链接，返回 (task_id, 排队位置)，task_id 同时是音轨下载任务的 ID
+
+        Raises:
+            ValueError / QueueFullError: 同 VideoDownloadService.enqueue
+        """
+        run = {
+            'task_id': None,
+            'status': 'running',
+            'started_at': time.time(),
+            'started': time.monotonic(),
+            'finished_at': None,
+            'stages': {},
+            'pending': {self.STAGE_AUDIO},  # 尚未结束的阶段
+            'filename': None,
+            'history_id': None,
+            'job_id': None,
+            'video_task_id': None,
+            'error': None,
+        }
+        self._begin(run, self.STAGE_AUDIO)
+        task_id, position = self.download_service.enqueue(
+            user_input,
+            on_finished=lambda result: self._on_audio(run, result),
+            priority=priority,
+            mode=MODE_AUDIO
+        )
+        with self.lock:
+            self._purge_expired()
+            run['task_id'] = task_id
+            self.runs[task_id] = run
+        return task_id, position
+
+    def get(self, task_id):
+        """流水线当前状态，各阶段耗时以毫秒表示，不存在时返回 None"""
+        with self.lock:
+            run = self.runs.get(task_id)
+            if not run:
+                return None
+            return {
+                'task_id': run['task_id'],
+                'status': run['status'],
+                'filename': run['filename'],
+                'history_id': run['history_id'],
+                'job_id': run['job_id'],
+                'video_task_id': run['video_task_id'],
+                'error': run['error'],
+                'stages': {name: dict(stage) for name, stage in run['stages'].items()},
+                'total_ms': self._total_ms(run)
+            }
+
+    def running_count(self):
+        """进行中的流水线数"""
+        with self.lock:
+            return sum(1 for run in self.runs.values() if run['status'] == 'running')
+
+    def _on_audio(self, run, result):
+        """音轨下载结束（在下载线程中执行）"""
+        if not result:
+            progress = self.download_service.get_progress(run['task_id']) or {}
+            self._end(run, self.STAGE_AUDIO, error=progress.get('message') or '音轨下载失败')
+            return
+
+        filename = run['filename'] = result['filename']
+        with self.lock:
+            run['pending'].update((self.STAGE_HISTORY, self.STAGE_TRANSCRIPTION, self.STAGE_VIDEO))
+        self._end(run, self.STAGE_AUDIO)
+
+        # 视频画面的下载与转录并行，排在普通下载之后
+        self._begin(run, self.STAGE_VIDEO)
+        try:
+            run['video_task_id'] = self.download_service.fetch_video(
+                result['source_url'], filename,
+                on_finished=lambda video: self._end(run, self.STAGE_VIDEO,
+                                                    error=None if video else '视频画面下载失败'),
+                priority=0
+            )
+        except Exception as e:
+            self._end(run, self.STAGE_VIDEO, error=str(e))
+
+        # 先写历史记录再提交转录：转录命中缓存时很快进入保存阶段，需要能找到这条记录
+        self._begin(run, self.STAGE_HISTORY)
+        history_id = self.video_service.save_to_history({
+            'title': result['title'],
+            'source': 'youtube',
+            'video_path': filename,
+            'duration': result['duration'],
+            'source_url': result['source_url'],
+        }, reuse_existing=True)
+        run['history_id'] = history_id
+        self._end(run, self.STAGE_HISTORY, error=None if history_id else '保存历史记录失败')
+
+        self._begin(run, self.STAGE_TRANSCRIPTION)
+        job, error = self.job_service.submit(
+            filename, source_type='youtube',
+            on_finished=lambda job: self._on_transcribed(run, job)
+        )
+        if not job:
+            self._end(run, self.STAGE_TRANSCRIPTION, error=error)
+            return
+        run['job_id'] = job['id']
+
+    def _on_transcribed(self, run, job):
+        """转录任务结束（在转录线程中执行），记录转录内部各阶段的耗时"""
+        with self.lock:
+            run['stages'][self.STAGE_TRANSCRIPTION]['steps'] = job['timings']
+        self._end(run, self.STAGE_TRANSCRIPTION, error=job['error'])
+
+    def _begin(self, run, name):
+        with self.lock:
+            run['stages'][name] = {
+                'start_ms': self._elapsed_ms(run),
+                'end_ms': None,
+                'duration_ms': None,
+                'outcome': 'running'
+            }
+
+    def _end(self, run, name, error=None):
+        """结束一个阶段；所有阶段结束后流水线结束"""
+        with self.lock:
+            stage = run['stages'][name]
+            stage['end_ms'] = self._elapsed_ms(run)
+            stage['duration_ms'] = stage['end_ms'] - stage['start_ms']
+            stage['outcome'] = 'error' if error else 'ok'
+            if error:
+                stage['error'] = error
+                # 视频画面下载失败不影响转录，播放器打开时会重新补下载
+                if name != self.STAGE_VIDEO and not run['error']:
+                    run['error'] = error
+            run['pending'].discard(name)
+            if run['pending']:
+                return
+            run['status'] = 'failed' if run['error'] else 'completed'
+            run['finished_at'] = time.time()
+            summary = ', '.join(f"{stage_name} {stage['duration_ms']}ms"
+                                for stage_name, stage in run['stages'].items())
+            total_ms = self._total_ms(run)
+
+        metrics.inc('ingest_pipelines_total', outcome=run['status'])
+        print(f"[{datetime.now():%H:%M:%S}] 链接导入流水线 {run['task_id']} {run['status']}，"
+              f"总耗时 {total_ms}ms（{summary}）")
+
+    def _elapsed_ms(self, run):
+        return int((time.monotonic() - run['started']) * 1000)
+
+    def _total_ms(self, run):
+        """已结束的流水线取最后一个阶段的结束时刻，进行中的取当前时刻"""
+        if run['finished_at'] is None:
+            return self._elapsed_ms(run)
+        return max(stage['end_ms'] for stage in run['stages'].values())
+
+    def _purge_expired(self):
+        """清理超过保留时间的已结束流水线（调用方需持有锁）"""
+        now = time.time()
+        expired = [
+            task_id for task_id, run in self.runs.items()
+            if run['finished_at'] and now - run['finished_at'] > self.ttl
+        ]
+        for task_id in expired:
+            del self.runs[task_id]
@@ -4,32 +4,98 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import oss2
 import dashscope
 from config import Config
-from http import HTTPStatus
 import json
 import uuid
-# from redis import Redis  # 移除 Redis 导入
+import base64
 import time
-from moviepy.editor import VideoFileClip
-import requests
+import threading
 from datetime import datetime, timezone # 导入 timezone
 import re
-from supabase import create_client, Client  # 导入 Supabase 客户端
+import subprocess
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from services.transcription_cache import TranscriptionCache
+from services.metrics_service import metrics
+from services.media_probe import media_probe
+from services.history_cache import HistoryCache
+from services.timeline import Timeline
+from services.search_index import TranscriptSearchIndex
+from services.history_repository import create_history_repository
+from services.asr_batcher import TranscriptionBatcher
+from services.long_media import detect_silences, plan_chunks, split_audio, stitch_sentences
+from services.media_service import find_audio_file, is_audio_file
+from services.remote_client import http_client, track_call, call_with_retries
+from services.tracing import span, traced, current_span
+
+
+# 历史记录列表只返回的摘要列，不包含 transcription/origin 两个长文本列
+HISTORY_SUMMARY_COLUMNS = 'id,title,source,video_path,duration,created_at,transcribed,text_preview'
+# 历史记录详情返回的列，二进制时间轴由单独的接口返回
+HISTORY_DETAIL_COLUMNS = 'id,title,source,video_path,duration,file_size,fps,resolution,created_at,' \
+                         'transcribed,transcription,origin,text_preview,video_url,source_url'
+# OSS 上传平均速度（MB/s）直方图的分桶
+UPLOAD_SPEED_BUCKETS = (0.5, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _is_retryable_oss_error(error):
+    """连接失败（RequestError）、429 和 5xx 可以重试，对象不存在等 4xx 不重试"""
+    if isinstance(error, oss2.exceptions.RequestError):
+        return True
+    return isinstance(error, oss2.exceptions.OssError) and (error.status == 429 or error.status >= 500)
 
 
 class VideoService:
 
+    TIMELINE_INDEX_SIZE = 32  # 保留多少条已解码的时间轴
+
     def __init__(self):
         """初始化视频服务
         - 初始化OSS服务
         - 初始化DashScope服务
-        - 初始化 Supabase
+        - 初始化历史记录存储（Supabase 或本地 SQLite）
         - 创建必要的文件夹
+        - 初始化转录缓存
         """
         self._init_oss()
         self._init_dashscope()
-        self._init_supabase()  # 初始化 Supabase
+        # 合并提交 SenseVoice 转写任务
+        self.asr_batcher = TranscriptionBatcher()
+        self.history_repo = create_history_repository()
         # 初始化文件夹
         Config.init_folders()
+        # 按内容哈希缓存转录结果
+        self.transcription_cache = TranscriptionCache()
+        # 历史记录版本号，每次写入历史记录时递增，用于生成 ETag
+        self.history_epoch = uuid.uuid4().hex[:8]  # 进程重启后旧的 ETag 全部失效
+        self.history_version = 0
+        self.history_version_lock = threading.Lock()
+        # 历史记录读穿缓存（进程内 LRU 或 Redis）
+        self.history_cache = HistoryCache()
+        # 转录文本全文索引
+        self.search_index = TranscriptSearchIndex()
+        # 已解码的时间轴，按记录 ID 保存 (历史版本号, Timeline)，分段查询直接在上面二分查找
+        self.timeline_index = OrderedDict()
+        self.timeline_index_lock = threading.Lock()
+
+    def bump_history_version(self):
+        """历史记录发生写入后递增版本号"""
+        with self.history_version_lock:
+            self.history_version += 1
+
+    def _history_changed(self, history_id=None):
+        """历史记录写入后递增版本号并失效相关缓存
+
+        Args:
+            history_id: 被更新或删除的记录 ID，新增记录时为 None
+        """
+        self.history_cache.invalidate(history_id)
+        self.bump_history_version()
+
+    def history_etag(self, *parts):
+        """根据当前历史记录版本号生成 ETag，parts 用于区分不同的查询"""
+        tag = '-'.join([self.history_epoch, str(self.history_version)] + [str(p) for p in parts])
+        return f"history-{tag}"
 
     def _init_oss(self):
         """初始化阿里云OSS服务"""
@@ -39,9 +105,19 @@ class VideoService:
             if not self.endpoint.startswith('http'):
                 self.endpoint = f'https://{self.endpoint}'
 
-            # 创建 Bucket 实例
+            # 创建 Bucket 实例，所有 OSS 请求（包括分片上传的并发线程）共用一个 keep-alive 连接池
+            # oss2 自身只在列举类接口中重试，删除等调用的重试见 _oss_call，上传的重试见 upload_to_oss
+            oss2.defaults.connection_pool_size = max(Config.REMOTE_POOL_SIZE, Config.OSS_UPLOAD_THREADS)
             auth = oss2.Auth(Config.OSS_ACCESS_KEY_ID, Config.OSS_ACCESS_KEY_SECRET)
-            self.bucket = oss2.Bucket(auth, self.endpoint, Config.OSS_BUCKET_NAME)
+            self.bucket = oss2.Bucket(auth, self.endpoint, Config.OSS_BUCKET_NAME,
+                                      session=oss2.Session(),
+                                      connect_timeout=Config.REMOTE_READ_TIMEOUT)  # oss2 同时用作读取超时
+
+            # 分片上传的断点记录保存在本地，进程重启后也能续传
+            self.upload_checkpoint_store = oss2.ResumableStore(
+                root=Config.CACHE_FOLDER,
+                dir=Config.OSS_CHECKPOINT_DIR
+            )
 
         except Exception as e:
             print(f"OSS 初始化失败: {str(e)}")
@@ -55,25 +131,13 @@ class VideoService:
             print(f"DashScope 初始化失败: {str(e)}")
             raise
 
-    def _init_supabase(self):
-        """初始化 Supabase 客户端"""
-        try:
-            # 从配置中获取 Supabase URL 和 API 密钥
-            supabase_url: str = Config.SUPABASE_URL
-            supabase_key: str = Config.SUPABASE_KEY
-
-            # 创建 Supabase 客户端实例
-            self.supabase: Client = create_client(supabase_url, supabase_key)
-            print("Supabase 初始化成功")
-
-        except Exception as e:
-            print(f"Supabase 初始化失败: {str(e)}")
-            raise
-
     #  移除 _build_history_key 和 _get_recent_history_key 方法，因为不再需要 Redis key
 
     def check_video(self, video_path):
-        """检查视频文件是否有效且可以处理"""
+        """检查视频文件是否有效且可以处理
+
+        音频优先下载的 .audio.* 文件只有音轨，只要求能读出时长和音轨，不检查视频轨。
+        """
         try:
             if not os.path.exists(video_path):
                 return False, "视频文件不存在"
@@ -83,34 +147,134 @@ class VideoService:
             if file_size > Config.MAX_VIDEO_SIZE:
                 return False, f"视频文件过大，最大允许 {Config.MAX_VIDEO_SIZE/(1024*1024)}MB"
 
-            # 检查视频时长
-            with VideoFileClip(video_path) as video:
-                duration = video.duration
-                if duration > Config.MAX_VIDEO_DURATION:
-                    return False, f"视频时长过长，最大允许 {Config.MAX_VIDEO_DURATION/60}分钟"
+            info = media_probe.probe(video_path)
+            if is_audio_file(video_path):
+                if not info.get('has_audio'):
+                    return False, "音频文件缺少音轨"
+            elif not info.get('has_video', True):
+                return False, "视频文件缺少视频轨"
+
+            # 检查视频时长（超过 MAX_VIDEO_DURATION 的视频分段转写）
+            duration = info['duration']
+            if duration > Config.LONG_MEDIA_MAX_DURATION:
+                return False, f"视频时长过长，最大允许 {Config.LONG_MEDIA_MAX_DURATION/60}分钟"
 
             return True, None
 
         except Exception as e:
             return False, f"视频文件检查失败: {str(e)}"
 
-    def upload_to_oss(self, video_path):
-        """上传视频到OSS存储"""
+    @traced('extract_audio')
+    def extract_audio(self, video_path, output_path=None):
+        """从视频中提取单声道压缩音轨，用于替代整个视频上传到 OSS
+
+        SenseVoice 只需要音频，16kHz 单声道 Opus 通常只有原视频体积的百分之一左右。
+        aresample 的 first_pts=0 会在音轨晚于视频开始时补齐开头的静音，
+        保证转写返回的时间戳与原视频的播放时间轴完全一致。
+
+        Args:
+            output_path: 输出路径，默认生成临时文件。传入固定路径时先写临时文件再原子重命名，
+                该路径已有文件时直接复用：分片上传的断点记录按本地路径保存并校验文件的
+                大小和修改时间，进程中断后重新处理同一视频必须上传同一个文件才能续传
+
+        Returns:
+            str: 音频文件路径，提取失败时返回 None（调用方负责删除该文件）
+        """
+        if output_path and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            print(f"复用已提取的音频: {os.path.basename(output_path)}")
+            current_span().set(reused=True, output_bytes=os.path.getsize(output_path))
+            return output_path
+
+        fd, audio_path = tempfile.mkstemp(suffix='.ogg', dir=os.path.dirname(output_path or '') or Config.CACHE_FOLDER)
+        os.close(fd)
+        command = [
+            Config.FFMPEG_BINARY, '-hide_banner', '-loglevel', 'error', '-y',
+            '-i', video_path,
+            '-map', '0:a:0',
+            '-vn',
+            '-af', 'aresample=async=1:first_pts=0',
+            '-ac', '1',
+            '-ar', str(Config.AUDIO_SAMPLE_RATE),
+            '-c:a', 'libopus',
+            '-b:a', Config.AUDIO_BITRATE,
+            audio_path
+        ]
+        try:
+            print(f"开始提取音频: {os.path.basename(video_path)}")
+            completed = subprocess.run(command, capture_output=True, text=True,
+                                       timeout=Config.AUDIO_EXTRACT_TIMEOUT)
+            if completed.returncode != 0 or os.path.getsize(audio_path) == 0:
+                print(f"提取音频失败: {completed.stderr.strip()}")
+                os.remove(audio_path)
+                return None
+
+            print(f"音频提取完成: {os.path.getsize(video_path)} → {os.path.getsize(audio_path)} 字节")
+            current_span().set(bytes=os.path.getsize(video_path), output_bytes=os.path.getsize(audio_path))
+            if output_path:
+                os.replace(audio_path, output_path)
+                return output_path
+            return audio_path
+
+        except Exception as e:
+            print(f"提取音频失败: {str(e)}")
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
+            return None
+
+    @traced('upload_to_oss')
+    def upload_to_oss(self, video_path, object_key=None):
+        """上传视频到OSS存储
+
+        超过 OSS_MULTIPART_THRESHOLD 的文件使用分片并发上传，并在本地保存断点记录，
+        上传中断后再次上传同一文件（路径、大小、修改时间都不变）到同一对象名时会从已完成的分片继续。
+        重试次数用完仍失败时取消分片上传并删除断点记录，不在 OSS 上留下未完成的分片。
+
+        Args:
+            video_path: 本地文件路径
+            object_key: OSS 对象名，默认生成随机文件名；传入固定对象名才能断点续传
+        """
         try:
             # 生成唯一文件名
-            file_extension = os.path.splitext(video_path)[1]
-            unique_filename = f"{uuid.uuid4()}{file_extension}"
-            
-            print(f"开始上传视频到OSS: {os.path.basename(video_path)}")
-            
-            # 直接上传文件，不设置额外的元数据
-            self.bucket.put_object_from_file(
-                unique_filename, 
-                video_path
-            )
-            
+            if not object_key:
+                file_extension = os.path.splitext(video_path)[1]
+                object_key = f"{uuid.uuid4()}{file_extension}"
+
+            file_size = os.path.getsize(video_path)
+            current_span().set(bytes=file_size)
+            print(f"开始上传视频到OSS: {os.path.basename(video_path)} ({file_size} 字节)")
+
+            start_time = time.time()
+            for attempt in range(1, Config.OSS_UPLOAD_RETRIES + 1):
+                try:
+                    with track_call('oss', 'resumable_upload'):
+                        oss2.resumable_upload(
+                            self.bucket,
+                            object_key,
+                            video_path,
+                            store=self.upload_checkpoint_store,
+                            multipart_threshold=Config.OSS_MULTIPART_THRESHOLD,
+                            part_size=Config.OSS_PART_SIZE,
+                            num_threads=Config.OSS_UPLOAD_THREADS,
+                            progress_callback=self._create_upload_progress_callback(object_key)
+                        )
+                    break
+                except oss2.exceptions.OssError as e:
+                    if attempt == Config.OSS_UPLOAD_RETRIES or not _is_retryable_oss_error(e):
+                        self._abort_upload(object_key, video_path)
+                        raise
+                    # 断点记录仍然保留，重试时只上传未完成的分片
+                    print(f"上传中断（第 {attempt} 次），准备续传: {str(e)}")
+                    time.sleep(attempt)
+
+            elapsed = max(time.time() - start_time, 1e-6)
+            speed = file_size / elapsed / (1024 * 1024)
+            metrics.inc('oss_upload_bytes_total', file_size)
+            metrics.inc('oss_upload_seconds_total', elapsed)
+            metrics.observe('oss_upload_speed_mb_per_second', speed, buckets=UPLOAD_SPEED_BUCKETS)
+            print(f"上传耗时 {elapsed:.1f}s，平均速度 {speed:.2f}MB/s")
+
             # 生成文件访问URL（24小时有效）
-            url = self.bucket.sign_url('GET', unique_filename, 24*3600)
+            url = self.bucket.sign_url('GET', object_key, 24*3600)
             
             print(f"视频上传到OSS成功: {url}")
             return url
@@ -119,58 +283,155 @@ class VideoService:
             print(f"视频上传到OSS失败: {str(e)}")
             return None
 
-    def transcribe_video(self, video_url):
-        """转写视频音频内容"""
+    def _oss_call(self, operation, func, *args):
+        """执行幂等的 OSS 请求（删除对象、取消分片上传），连接失败、限流和 5xx 时有限次重试"""
+        return call_with_retries('oss', operation, lambda: func(*args), _is_retryable_oss_error)
+
+    def _abort_upload(self, object_key, file_path):
+        """取消未完成的分片上传并删除本地断点记录"""
+        store = self.upload_checkpoint_store
+        store_key = store.make_store_key(self.bucket.bucket_name, object_key, os.path.abspath(file_path))
         try:
-            print(f"开始转写视频: {video_url}")
+            record = store.get(store_key)
+            if record and record.get('upload_id'):
+                self._oss_call('abort_multipart_upload', self.bucket.abort_multipart_upload,
+                               object_key, record['upload_id'])
+                print(f"已取消分片上传: {object_key}")
+        except oss2.exceptions.NoSuchUpload:
+            pass
+        except Exception as e:
+            print(f"取消分片上传失败: {str(e)}")
+        finally:
+            store.delete(store_key)
+
+    def _create_upload_progress_callback(self, object_key):
+        """创建上传进度回调，每秒最多打印一次当前速度"""
+        state = {'start': time.time(), 'last_report': 0.0}
+
+        def progress_callback(consumed_bytes, total_bytes):
+            now = time.time()
+            if now - state['last_report'] < 1 and consumed_bytes != total_bytes:
+                return
+            state['last_report'] = now
+            elapsed = max(now - state['start'], 1e-6)
+            percent = consumed_bytes * 100 / total_bytes if total_bytes else 100
+            print(f"上传 {object_key}: {percent:.1f}% "
+                  f"{consumed_bytes / elapsed / (1024 * 1024):.2f}MB/s")
+
+        return progress_callback
+
+    def _extracted_audio_path(self, content_hash):
+        """提取音轨的固定路径，由内容哈希决定"""
+        folder = os.path.join(Config.CACHE_FOLDER, Config.EXTRACTED_AUDIO_DIR)
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, f"{content_hash}.ogg")
+
+    def _oss_object_key(self, oss_url):
+        """从 OSS URL 中提取对象名
+
+        OSS URL 格式: https://bucket.endpoint/object_key?params
+        """
+        return oss_url.split('?')[0].split('/')[-1] if oss_url else None
 
-            # 调用转写API
-            task_response = dashscope.audio.asr.Transcription.async_call(
-                model='sensevoice-v1',
-                file_urls=[video_url],
-                language_hints=['en'],  # 添加 language_hints 参数
-            )
-            print("转写任务创建响应：", json.dumps(task_response.output, indent=2, ensure_ascii=False))
+    @traced('transcribe')
+    def transcribe_video(self, video_url, media_seconds=None):
+        """转写视频音频内容
 
-            print("等待转写结果...")
+        文件交给 TranscriptionBatcher，与同时等待转写的其他文件合并为一个 SenseVoice 任务
 
-            # 等待并获取结果
-            transcribe_response = dashscope.audio.asr.Transcription.wait(
-                task=task_response.output.task_id
-            )
-            print("转写完成响应：", json.dumps(transcribe_response.output, indent=2, ensure_ascii=False))
-
-            if transcribe_response.status_code == HTTPStatus.OK:
-                print("转写成功！")
-                # 获取转录URL
-                transcription_url = transcribe_response.output['results'][0]['transcription_url'] if \
-                transcribe_response.output.get('results') and len(transcribe_response.output['results']) > 0 else None
-                if not transcription_url:
-                    print("未找到转录URL")
-                    return None
+        Args:
+            video_url: 文件的 OSS 地址
+            media_seconds: 音视频时长（秒），用于估计转写耗时
+        """
+        try:
+            print(f"开始转写视频: {video_url}")
 
-                # 获取转录内容
-                response = requests.get(transcription_url)
-                if response.status_code != 200:
-                    print(f"获取转录内容失败: {response.status_code}")
-                    return None
+            # 等待批量任务完成，取回本文件的转录URL
+            expected = media_seconds * Config.ASR_REALTIME_FACTOR if media_seconds else None
+            with span('asr_wait', media_seconds=media_seconds):
+                transcription_url = self.asr_batcher.submit(video_url, expected).result()
+            print("转写成功！")
 
-                transcription_data = response.json()
-                # 提取sentences
-                if transcription_data.get('transcripts') and len(transcription_data['transcripts']) > 0:
-                    return {
-                        'sentences': transcription_data['transcripts'][0].get('sentences', [])
-                    }
+            sentences = self._fetch_sentences(transcription_url)
+            return {'sentences': sentences} if sentences is not None else None
+
+        except Exception as e:
+            print(f"转写过程发生错误：{str(e)}")
+            return None
+
+    def _fetch_sentences(self, transcription_url):
+        """下载转录结果并提取句子列表，失败时返回 None"""
+        with span('fetch_transcription') as stage:
+            response = http_client.get(transcription_url, 'dashscope', 'fetch_transcription')
+            stage.set(bytes=len(response.content), status=response.status_code)
+            if response.status_code != 200:
+                stage.fail(f"HTTP {response.status_code}")
+                print(f"获取转录内容失败: {response.status_code}")
                 return None
-            else:
-                print(f"转写失败，状态码：{transcribe_response.status_code}")
-                print("详细错误信息：", json.dumps(transcribe_response.output, indent=2, ensure_ascii=False))  # 打印详细错误
+
+            transcription_data = response.json()
+        # 提取sentences
+        if transcription_data.get('transcripts') and len(transcription_data['transcripts']) > 0:
+            return transcription_data['transcripts'][0].get('sentences', [])
+        return None
+
+    @traced('transcribe_long_media')
+    def transcribe_long_media(self, audio_path, content_hash, media_seconds):
+        """长音视频分段转写
+
+        在静音处把音轨切成约 LONG_MEDIA_CHUNK_SECONDS 秒的多段，全部上传后同时提交，
+        由 TranscriptionBatcher 合并为批量任务并发转写，总耗时接近最长一段的转写时间；
+        最后按每段在原音频中的起点拼接时间戳。各段的 OSS 对象只用于转写，完成后删除。
+
+        Args:
+            audio_path: 已提取的完整音轨
+            content_hash: 视频内容哈希，用于生成各段的对象名
+            media_seconds: 音视频时长（秒）
+        """
+        chunk_paths = []
+        object_keys = []
+        try:
+            chunks = plan_chunks(media_seconds, detect_silences(audio_path))
+            print(f"长视频分为 {len(chunks)} 段转写: {[round(end - start) for start, end in chunks]} 秒")
+            chunk_paths = split_audio(audio_path, chunks)
+
+            object_keys = [f"{content_hash}-part{index}.ogg" for index in range(len(chunks))]
+            with ThreadPoolExecutor(max_workers=Config.OSS_UPLOAD_THREADS) as pool:
+                urls = list(pool.map(
+                    lambda args: self.upload_to_oss(*args), zip(chunk_paths, object_keys)
+                ))
+            if not all(urls):
+                print("上传分段音频失败")
                 return None
 
+            futures = self.asr_batcher.submit_many([
+                (url, (end - start) * Config.ASR_REALTIME_FACTOR)
+                for url, (start, end) in zip(urls, chunks)
+            ])
+            chunk_sentences = []
+            for index, future in enumerate(futures):
+                sentences = self._fetch_sentences(future.result())
+                if sentences is None:
+                    print(f"第 {index + 1} 段转写失败")
+                    return None
+                chunk_sentences.append(sentences)
+
+            return {'sentences': stitch_sentences(chunk_sentences, [start for start, _ in chunks])}
+
         except Exception as e:
-            print(f"转写过程发生错误：{str(e)}")
+            print(f"分段转写失败：{str(e)}")
             return None
 
+        finally:
+            for chunk_path in chunk_paths:
+                if os.path.exists(chunk_path):
+                    os.remove(chunk_path)
+            for object_key in object_keys:
+                try:
+                    self._oss_call('delete_object', self.bucket.delete_object, object_key)
+                except Exception as e:
+                    print(f"删除分段音频失败: {str(e)}")
+
     def format_time(self, milliseconds):
         """将毫秒数转换为时分秒格式
         
@@ -200,53 +461,150 @@ class VideoService:
             print(f"时间格式化失败: {str(e)}")
             return "00:00"
 
-    def process_video(self, filename, source_type='upload'):
-        """处理视频文件，上传到OSS，转录，并将结果保存到 Supabase"""
+    def format_sentences(self, sentences):
+        """将转写句子格式化为纯文本和带时间戳的文本
+
+        Returns:
+            tuple: (纯文本, 带时间戳的文本)
+        """
+        plain_text = []
+        formatted_text = []
+        for sentence in sentences:
+            start_time = self.format_time(sentence.get('begin_time', 0))
+            end_time = self.format_time(sentence.get('end_time', 0))
+            text = re.sub(r'<\|[^>]+\|>', '', sentence.get('text', '')).strip()
+
+            plain_text.append(text)
+            formatted_text.append(f"[{start_time} - {end_time}] {text}")
+
+        return '\n\n'.join(plain_text), '\n\n'.join(formatted_text)
+
+    def make_text_preview(self, plain_text):
+        """生成历史记录卡片上显示的转录文本预览"""
+        preview = re.sub(r'\s+', ' ', plain_text or '').strip()
+        if len(preview) > Config.HISTORY_PREVIEW_LENGTH:
+            preview = preview[:Config.HISTORY_PREVIEW_LENGTH].rstrip() + '…'
+        return preview
+
+    @traced('process_video', root=True)
+    def process_video(self, filename, source_type='upload', on_stage=None):
+        """处理视频文件，上传到OSS，转录，并将结果保存到历史记录
+
+        Args:
+            filename: records 目录下的视频文件名
+            source_type: 视频来源 (upload/youtube)
+            on_stage: 可选回调，进入每个处理阶段时以阶段名调用
+        """
+        def report(stage):
+            if on_stage:
+                on_stage(stage)
+
         try:
+            report('checking')
             video_path = os.path.join(Config.RECORDS_FOLDER, filename)
-            is_valid, error_msg = self.check_video(video_path)
-            if not is_valid:
-                print(error_msg)
-                return None
+            if not os.path.exists(video_path):
+                # 音频优先下载的记录在视频画面下载之前只有音频文件，直接用它转录
+                video_path = find_audio_file(filename)
+                if not video_path:
+                    print("视频文件不存在")
+                    return None
 
-            # 上传到OSS
-            video_url = self.upload_to_oss(video_path)
-            if not video_url:
-                return None
+            current_span().set(source=source_type)
+
+            # 按内容哈希查找转录缓存，相同字节的视频无需重新上传和转写
+            with span('cache_lookup', bytes=os.path.getsize(video_path)) as stage:
+                content_hash = self.transcription_cache.file_hash(video_path)
+                cached = self.transcription_cache.get(content_hash)
+                stage.set(hit=bool(cached))
+
+            if cached:
+                print(f"命中转录缓存: {content_hash}")
+                transcription = {'sentences': cached['sentences']}
+                plain_text = cached['plain_text']
+                transcription_text = cached['formatted_text']
+                video_url = self.bucket.sign_url('GET', cached['oss_object'], 24*3600) \
+                    if cached['oss_object'] else None
+                report('saving')
+                video_info = cached['video_info'] or self.get_video_info(video_path)
+            else:
+                with span('check_video') as stage:
+                    is_valid, error_msg = self.check_video(video_path)
+                    if not is_valid:
+                        stage.fail(error_msg)
+                        print(error_msg)
+                        return None
+
+                    media_seconds = media_probe.probe(video_path)['duration']
+                    stage.set(media_seconds=media_seconds)
+                long_media = media_seconds > Config.MAX_VIDEO_DURATION
+
+                # 只上传音轨，提取失败时退回上传整个视频；长视频必须提取音轨才能分段转写
+                audio_path = None
+                if Config.EXTRACT_AUDIO_BEFORE_UPLOAD or long_media:
+                    report('extracting')
+                    audio_path = self.extract_audio(video_path, self._extracted_audio_path(content_hash))
+                    if long_media and not audio_path:
+                        print("长视频提取音频失败，无法分段转写")
+                        return None
 
-            # 转写视频
-            transcription = self.transcribe_video(video_url)
-            if not transcription:
-                return None
+                try:
+                    # 上传到OSS，对象名和提取的音轨路径都由内容哈希决定，进程中断后重新处理同一视频可以续传
+                    report('uploading')
+                    upload_path = audio_path or video_path
+                    object_key = f"{content_hash}{os.path.splitext(upload_path)[1]}"
+                    if long_media:
+                        # 分段转写只读取各段的对象，完整音轨的对象只作为记录的 video_url，与分段转写同时上传
+                        with ThreadPoolExecutor(max_workers=1) as pool:
+                            upload = pool.submit(self.upload_to_oss, upload_path, object_key)
+                            report('transcribing')
+                            transcription = self.transcribe_long_media(audio_path, content_hash, media_seconds)
+                            video_url = upload.result()
+                        if not video_url:
+                            return None
+                    else:
+                        video_url = self.upload_to_oss(upload_path, object_key=object_key)
+                        if not video_url:
+                            return None
+
+                        # 转写视频
+                        report('transcribing')
+                        transcription = self.transcribe_video(video_url, media_seconds)
+                finally:
+                    # 正常结束（包括上传失败并已取消分片）后不再需要；进程中断时留下的文件供下次续传
+                    if audio_path and os.path.exists(audio_path):
+                        try:
+                            os.remove(audio_path)
+                        except OSError as e:
+                            print(f"删除提取的音频失败: {str(e)}")
+                if not transcription:
+                    return None
 
-            # 获取视频信息（用于保存到 Supabase）
-            video_info = self.get_video_info(video_path)
-            if not video_info:
-                video_info = {'duration': '0:00', 'size': 0, 'fps': 0, 'resolution': ''}
+                # 获取视频信息（用于保存到历史记录）
+                report('saving')
+                video_info = self.get_video_info(video_path)
 
-            # 格式化转录文本
-            plain_text = []
-            formatted_text = []
-            for sentence in transcription.get('sentences', []):
-                start_time = self.format_time(sentence.get('begin_time', 0))
-                end_time = self.format_time(sentence.get('end_time', 0))
-                text = re.sub(r'<\|[^>]+\|>', '', sentence.get('text', '')).strip()
+                # 格式化转录文本
+                with span('format', sentences=len(transcription.get('sentences', []))):
+                    plain_text, transcription_text = self.format_sentences(transcription.get('sentences', []))
 
-                plain_text.append(text)
-                formatted_text.append(f"[{start_time} - {end_time}] {text}")
+                self.transcription_cache.put(
+                    content_hash,
+                    self._oss_object_key(video_url),
+                    transcription.get('sentences', []),
+                    plain_text,
+                    transcription_text,
+                    video_info
+                )
 
-            plain_text = '\n\n'.join(plain_text)
-            transcription_text = '\n\n'.join(formatted_text)
+            if not video_info:
+                video_info = {'duration': '0:00', 'size': 0, 'fps': 0, 'resolution': ''}
 
-            # 查找并更新 Supabase 记录
-            existing_record = self.supabase.table('video_history') \
-                .select('*') \
-                .eq('title', filename) \
-                .eq('source', source_type) \
-                .execute()
+            # 按本地文件名查找历史记录（YouTube 记录的 title 是视频标题，不能按 title 查找）
+            with span('history_lookup'):
+                history_id = self.history_repo.find_id(filename, source_type)
 
             # 准备要更新的数据 - 保持原来的 video_path
-            supabase_data = {
+            history_data = {
                 'duration': str(video_info['duration']),
                 'file_size': video_info['size'],
                 'fps': video_info['fps'],
@@ -254,31 +612,36 @@ class VideoService:
                 'transcribed': "1",
                 'transcription': plain_text,
                 'origin': transcription_text,
+                'text_preview': self.make_text_preview(plain_text),
+                'timeline': Timeline.from_sentences(transcription.get('sentences', [])).to_base64(),
                 'video_url': video_url  # 添加 OSS URL
             }
 
-            if existing_record.data:
-                # 更新第一条匹配的记录
-                history_id = existing_record.data[0]['id']
-                result = self.supabase.table('video_history') \
-                    .update(supabase_data) \
-                    .eq('id', history_id) \
-                    .execute()
-            else:
-                # 如果记录不存在，添加必要的字段创建新记录
-                supabase_data.update({
-                    'title': filename,
-                    'source': source_type,
-                    'video_path': filename,  # 使用原始文件名
-                    'created_at': datetime.utcnow().isoformat() + 'Z',
-                })
-                result = self.supabase.table('video_history').insert(supabase_data).execute()
-                history_id = result.data[0]['id'] if result.data else None
+            with span('history_write', bytes=len(history_data['origin'].encode('utf-8'))) as stage:
+                if history_id is not None:
+                    self.history_repo.update(history_id, history_data)
+                else:
+                    # 如果记录不存在，添加必要的字段创建新记录
+                    history_data.update({
+                        'title': filename,
+                        'source': source_type,
+                        'video_path': filename,  # 使用原始文件名
+                        'created_at': datetime.utcnow().isoformat() + 'Z',
+                    })
+                    record = self.history_repo.insert(history_data)
+                    history_id = record['id'] if record else None
+                    if history_id is None:
+                        stage.fail('插入历史记录失败')
+            self._history_changed(history_id)
+            if history_id is not None:
+                with span('search_index'):
+                    self.search_index.index_transcript(history_id, transcription.get('sentences', []))
 
             return {
                 'transcription': transcription,
                 'video_url': video_url,
-                'history_id': str(history_id)
+                'history_id': str(history_id),
+                'cache_hit': bool(cached)
             }
 
         except Exception as e:
@@ -288,22 +651,28 @@ class VideoService:
     def get_video_info(self, video_path):
         """获取视频文件信息"""
         try:
-            with VideoFileClip(video_path) as video:
-                return {
-                    'duration': video.duration,
-                    'size': os.path.getsize(video_path),
-                    'fps': video.fps,
-                    'resolution': f"{video.size[0]}x{video.size[1]}"
-                }
+            info = media_probe.probe(video_path)
+            return {
+                'duration': info['duration'],
+                'size': info['size'],
+                'fps': info['fps'],
+                'resolution': info['resolution']
+            }
         except Exception as e:
             print(f"获取视频信息失败: {str(e)}")
             return None
 
-    def save_to_history(self, video_data):
-      """保存视频信息到 Supabase"""
+    def save_to_history(self, video_data, reuse_existing=False):
+      """保存视频信息到历史记录
+
+      Args:
+          reuse_existing: 同一个文件已有记录时直接返回它的 ID（多个请求共享同一次下载时，
+              先完成的请求已经写入了记录）。为 False 时（上传），同名文件已被新内容覆盖，
+              已有记录的元数据和转录结果全部重置，仍然只保留一条记录
+      """
       try:
-            # 准备要插入到 Supabase 的数据, 添加缺少的字段
-            supabase_data = {
+            # 准备要插入的数据, 添加缺少的字段
+            history_data = {
               'title': video_data.get('title', '未命名视频'),
               'source': video_data.get('source', 'upload'),
               'video_path': video_data.get('video_path', ''),
@@ -311,92 +680,180 @@ class VideoService:
               'created_at': datetime.utcnow().isoformat() + 'Z',
               'transcribed': '0',
               'transcription': '',
-              'origin': ''
+              'origin': '',
+              'text_preview': ''
             }
-
-            # 使用 Supabase 客户端插入数据
-            result = self.supabase.table('video_history').insert(supabase_data).execute()
-            print("Supabase 插入结果:", result)
-
-            # 检查是否成功插入数据, 并返回 Supabase 记录的 ID
-            if result.data:
-                record_id = result.data[0]['id']
-                return str(record_id)
+            if video_data.get('source_url'):
+                history_data['source_url'] = video_data['source_url']
+
+            # 同一个文件只保存一条记录
+            existing_id = self.history_repo.find_id(history_data['video_path'], history_data['source'])
+            if existing_id is not None and reuse_existing:
+                return str(existing_id)
+            if existing_id is not None:
+                return self._reset_history(existing_id, history_data)
+
+            record = self.history_repo.insert(history_data)
+            self._history_changed()
+
+            # 检查是否成功插入数据, 并返回记录的 ID
+            if record:
+                return str(record['id'])
             else:
-                print("Supabase 插入失败:", result)
+                print("历史记录插入失败")
                 return None
 
       except Exception as e:
-        print(f"保存历史记录到 Supabase 失败: {str(e)}")
+        print(f"保存历史记录失败: {str(e)}")
         return None
 
+    def _reset_history(self, history_id, history_data):
+      """同名文件被重新上传后重置已有记录：旧的时长、转录结果、时间轴和 OSS 对象都已失效"""
+      record = self.history_repo.get(history_id, 'id,video_url')
+      history_data.update({
+          'file_size': None,
+          'fps': None,
+          'resolution': None,
+          'timeline': None,
+          'video_url': None,
+      })
+      self.history_repo.update(history_id, history_data)
+      self._history_changed(history_id)
+      self.search_index.remove(history_id)
+
+      object_key = self._oss_object_key(record.get('video_url')) if record else None
+      if object_key:
+          self._release_oss_object(object_key, history_id)
+      return str(history_id)
+
     def get_recent_history(self, limit=10):
-      """从 Supabase 获取最近的历史记录"""
+      """获取最近的历史记录（经过历史记录缓存）"""
       try:
-        # 从 Supabase 查询最近的记录，按 created_at 字段降序排列
-        result = self.supabase.table('video_history') \
-            .select('*') \
-            .order('created_at', desc=True) \
-            .limit(limit) \
-            .execute()
-        if result.data:
-            return result.data  # 返回 Supabase 查询结果
-        else:
-            print("获取最近历史记录失败:", result)
-            return []
+        items, _ = self.history_cache.get_list(
+            'recent', lambda: self._query_history_keyset(None, limit), limit
+        ) or ([], None)
+        return items
 
       except Exception as e:
-        print(f"从 Supabase 获取历史记录失败: {str(e)}")
+        print(f"获取历史记录失败: {str(e)}")
         return []
 
+    def get_history_page(self, cursor=None, per_page=10):
+      """按游标分页获取历史记录（经过历史记录缓存）
+
+      Args:
+          cursor: 上一页返回的 next_cursor，为空时返回第一页
+          per_page: 每页记录数
+
+      Returns:
+          tuple: (记录列表, 下一页游标)，没有更多记录时游标为 None
+
+      Raises:
+          ValueError: 游标格式不正确
+      """
+      position = self.decode_history_cursor(cursor) if cursor else None
+      items, next_cursor = self.history_cache.get_list(
+          'page', lambda: self._query_history_keyset(position, per_page), cursor or '', per_page
+      ) or ([], None)
+      return items, next_cursor
+
+    def encode_history_cursor(self, record):
+      """将 (created_at, id) 编码为不透明的游标"""
+      raw = json.dumps([record['created_at'], record['id']], separators=(',', ':'))
+      return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+    def decode_history_cursor(self, cursor):
+      """解析游标，返回 (created_at, id)"""
+      try:
+          padded = cursor + '=' * (-len(cursor) % 4)
+          created_at, record_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+          return created_at, record_id
+      except Exception:
+          raise ValueError('无效的分页游标')
+
+    def _query_history_keyset(self, position, limit):
+      """按 (created_at, id) 降序做键集分页查询
+
+      每一页都从游标位置直接定位，代价与翻到第几页无关，新插入的记录也不会让后面的页错位。
+      列表只需要绘制卡片，只查询摘要列，完整的转录文本只在详情接口返回。
+
+      Returns:
+          list: [记录列表, 下一页游标]（使用列表以便缓存序列化）
+      """
+      # 多取一条用来判断是否还有下一页
+      items = self.history_repo.list_page(position, limit + 1, HISTORY_SUMMARY_COLUMNS)
+      next_cursor = None
+      if len(items) > limit:
+          items = items[:limit]
+          next_cursor = self.encode_history_cursor(items[-1])
+      return [items, next_cursor]
+
+    def _release_oss_object(self, object_key, history_id):
+        """记录不再使用某个 OSS 对象时调用，没有其他记录引用它时才删除
+
+        对象名由内容哈希决定，相同内容的视频（转录缓存命中）的多条记录共用同一个对象。
+        删除前先从转录缓存中摘掉该对象，之后命中缓存的处理不会再签出它的 URL。
+
+        Returns:
+            bool: 是否删除了对象
+        """
+        try:
+            others = [
+                row['id'] for row in self.history_repo.find_by_oss_object(object_key)
+                if str(row['id']) != str(history_id) and self._oss_object_key(row['video_url']) == object_key
+            ]
+            if others:
+                print(f"OSS文件 {object_key} 仍被 {len(others)} 条记录使用，保留")
+                return False
+
+            self.transcription_cache.forget_oss_object(object_key)
+            self._oss_call('delete_object', self.bucket.delete_object, object_key)
+            print(f"已删除OSS文件: {object_key}")
+            return True
+        except Exception as e:
+            print(f"删除OSS文件失败: {str(e)}")
+            return False
+
     def delete_history(self, history_id):
-      """从 Supabase 删除历史记录及相关数据"""
+      """删除历史记录及相关数据"""
       try:
-            # 1. 从 Supabase 获取记录信息
-            result = self.supabase.table('video_history') \
-                .select('*') \
-                .eq('id', history_id) \
-                .execute()
+            # 1. 获取记录信息
+            record = self.history_repo.get(history_id, 'id,video_path,video_url')
 
-            if not result.data:
+            if not record:
                 return False, "记录不存在"
 
-            history_data = result.data
-            
             # 2. 删除本地文件
-            video_path = os.path.join(Config.RECORDS_FOLDER, history_data[0].get('video_path', ''))
+            video_path = os.path.join(Config.RECORDS_FOLDER, record.get('video_path') or '')
             if os.path.exists(video_path):
                 try:
                     os.remove(video_path)
+                    self.transcription_cache.forget_file(video_path)
                     print(f"已删除本地文件: {video_path}")
                 except Exception as e:
                     print(f"删除本地文件失败: {str(e)}")
 
-            # 3. 删除OSS文件
-            if history_data[0].get('video_url'):
+            # 音频优先下载时保存的音轨
+            audio_path = find_audio_file(record.get('video_path') or '') if record.get('video_path') else None
+            if audio_path:
                 try:
-                    # 从 URL 中提取 OSS 对象名
-                    oss_url = history_data[0]['video_url']
-                    # OSS URL 格式: https://bucket.endpoint/object_key?params
-                    object_key = oss_url.split('?')[0].split('/')[-1]
-                    
-                    if object_key:
-                        try:
-                            self.bucket.delete_object(object_key)
-                            print(f"已删除OSS文件: {object_key}")
-                        except Exception as e:
-                            print(f"删除OSS文件失败: {str(e)}")
+                    os.remove(audio_path)
+                    self.transcription_cache.forget_file(audio_path)
                 except Exception as e:
-                    print(f"处理OSS文件删除失败: {str(e)}")
+                    print(f"删除本地音频失败: {str(e)}")
 
-            # 4. 从 Supabase 删除记录
-            delete_result = self.supabase.table('video_history') \
-                .delete() \
-                .eq('id', history_id) \
-                .execute()
+            # 3. 删除OSS文件（其他记录仍在使用时保留）
+            object_key = self._oss_object_key(record.get('video_url'))
+            if object_key:
+                self._release_oss_object(object_key, history_id)
 
-            if not delete_result.data:
-                print("Supabase 删除失败:", delete_result)
+            # 4. 删除历史记录
+            deleted = self.history_repo.delete(history_id)
+            self._history_changed(history_id)
+            self.search_index.remove(history_id)
+
+            if not deleted:
+                print(f"历史记录删除失败: {history_id}")
                 return False, "删除失败，记录可能不存在或已被删除"
 
             print("所有相关数据已删除")
@@ -407,20 +864,74 @@ class VideoService:
             return False, str(e)
     
     def get_history_detail(self, history_id):
-      """根据 Supabase 中的 ID 获取视频记录详情"""
+      """根据 ID 获取视频记录详情（经过历史记录缓存）"""
       try:
-          # 从 Supabase 查询单个记录
-          result = self.supabase.table('video_history') \
-              .select('*') \
-              .eq('id', history_id) \
-              .execute()
-
-          if result.data:
-              return result.data[0]  # 返回 Supabase 查询结果
-          else:
-              print("历史记录未找到:", result)  # Supabase 错误信息更详细
+          return self.history_cache.get_detail(
+              history_id, lambda: self._query_history_detail(history_id)
+          )
+
+      except Exception as e:
+          print(f"获取历史记录详情失败: {str(e)}")
+          return None
+
+    def _query_history_detail(self, history_id):
+      """从历史记录存储查询单个记录"""
+      record = self.history_repo.get(history_id, HISTORY_DETAIL_COLUMNS)
+      if not record:
+          print(f"历史记录未找到: {history_id}")
+      return record
+
+    def get_history_timeline(self, history_id):
+      """获取记录的句子时间轴（经过历史记录缓存）
+
+      Returns:
+          Timeline: 时间轴，记录不存在或没有时间轴数据时返回 None
+      """
+      try:
+          version = self.history_version
+          with self.timeline_index_lock:
+              entry = self.timeline_index.get(history_id)
+              if entry and entry[0] == version:
+                  self.timeline_index.move_to_end(history_id)
+                  return entry[1]
+
+          encoded = self.history_cache.get_detail(
+              history_id, lambda: self._query_history_timeline(history_id), part='timeline'
+          )
+          if not encoded:
               return None
 
+          timeline = Timeline.from_base64(encoded)
+          with self.timeline_index_lock:
+              self.timeline_index[history_id] = (version, timeline)
+              self.timeline_index.move_to_end(history_id)
+              while len(self.timeline_index) > self.TIMELINE_INDEX_SIZE:
+                  self.timeline_index.popitem(last=False)
+          return timeline
+
       except Exception as e:
-          print(f"从 Supabase 获取历史记录详情失败: {str(e)}")
-          return None
\ No newline at end of file
+          print(f"获取时间轴失败: {str(e)}")
+          return None
+
+    def _query_history_timeline(self, history_id):
+      """只读取时间轴列"""
+      record = self.history_repo.get(history_id, 'timeline')
+      return record.get('timeline') if record else None
+
+    def get_history_segments(self, history_id, from_ms=0, to_ms=None):
+      """获取时间窗口 [from_ms, to_ms) 内的句子
+
+      Returns:
+          dict: 包含 segments 和 duration_ms，记录没有时间轴时返回 None
+      """
+      timeline = self.get_history_timeline(history_id)
+      if not timeline:
+          return None
+      duration = timeline.duration
+      to_ms = duration + 1 if to_ms is None else to_ms
+      return {
+          'from_ms': from_ms,
+          'to_ms': to_ms,
+          'duration_ms': duration,
+          'segments': timeline.segments(from_ms, to_ms)
+      }
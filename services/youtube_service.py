@@ -1,19 +1,119 @@
 import sys
 import os
 import re
+import uuid
+import threading
+from concurrent.futures import Future
 from datetime import datetime
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import yt_dlp
 from config import Config
-import queue
-import time
+from services.progress_service import ProgressStore
+from services.download_scheduler import DownloadScheduler
+from services.url_info_cache import UrlInfoCache, normalize_url
+from services.metrics_service import metrics
+from services.media_service import audio_sidecar_template, find_audio_file
+from services.remote_client import track_call
+
+# 下载模式：audio 只下载音轨（视频画面在播放时再下载），video 下载合并好的视频
+MODE_AUDIO = 'audio'
+MODE_VIDEO = 'video'
 
 class VideoDownloadService:
     """视频下载服务类"""
 
     def __init__(self):
         """初始化视频下载服务"""
-        self.progress_queues = {}
+        self.progress = ProgressStore()
+        self.scheduler = DownloadScheduler(self._run_task, on_position=self._report_position)
+        self.info_cache = UrlInfoCache()
+        self.inflight = {}  # (归一化链接, 下载模式, 指定文件名) -> {'future', 'task_ids'}，正在进行的下载
+        self.video_fetches = {}  # 文件名 -> {'task_id', 'callbacks'}，正在补下载视频画面的任务
+        self.inflight_lock = threading.Lock()
+
+    def enqueue(self, user_input, on_finished=None, priority=0, mode=None):
+        """把下载任务加入调度队列
+
+        Args:
+            user_input: 包含视频链接的文本
+            on_finished: 下载结束后以 download_video 的返回值调用，失败时为 None（在下载线程中执行）
+            priority: 数值越小越先下载
+            mode: MODE_AUDIO 或 MODE_VIDEO，默认由 DOWNLOAD_MODE 配置决定
+
+        Returns:
+            tuple: (task_id, 排队位置)
+
+        Raises:
+            ValueError: 没有找到链接或站点不受支持
+            QueueFullError: 下载队列已满
+        """
+        url = self._extract_url(user_input)
+        if not url:
+            raise ValueError("未找到有效的 URL")
+        host = self._detect_host(url)
+        if not host:
+            raise ValueError("不支持的视频 URL")
+
+        if mode is None:
+            mode = MODE_AUDIO if Config.DOWNLOAD_MODE == 'audio_first' else MODE_VIDEO
+
+        task_id = uuid.uuid4().hex
+        self.progress.update(task_id, {'status': 'queued', 'position': 0, 'progress': 0})
+        position = self.scheduler.submit(task_id, host, (url, on_finished, mode, None), priority)
+        return task_id, position
+
+    def fetch_video(self, source_url, filename, on_finished=None, priority=-1):
+        """为只下载了音轨的记录补下载视频画面，保存为 filename
+
+        播放器第一次打开这类记录时调用，默认插队到下载队列最前面；
+        同一个文件已在补下载时返回已有的任务，on_finished 同样会在它结束时被调用。
+
+        Returns:
+            str: task_id，可通过 /progress/<task_id> 订阅进度
+        """
+        host = self._detect_host(source_url)
+        if not host:
+            raise ValueError("不支持的视频 URL")
+
+        with self.inflight_lock:
+            fetch = self.video_fetches.get(filename)
+            if fetch:
+                if on_finished:
+                    fetch['callbacks'].append(on_finished)
+                return fetch['task_id']
+            task_id = uuid.uuid4().hex
+            self.video_fetches[filename] = {'task_id': task_id, 'callbacks': [on_finished] if on_finished else []}
+
+        self.progress.update(task_id, {'status': 'queued', 'position': 0, 'progress': 0})
+        try:
+            self.scheduler.submit(task_id, host, (source_url, None, MODE_VIDEO, filename), priority)
+        except Exception:
+            with self.inflight_lock:
+                self.video_fetches.pop(filename, None)
+            raise
+        return task_id
+
+    def _run_task(self, task_id, payload):
+        """在调度器的下载线程中执行"""
+        url, on_finished, mode, filename = payload
+        result = None
+        callbacks = [on_finished] if on_finished else []
+        try:
+            result = self.download_video(url, task_id, mode=mode, filename=filename)
+        finally:
+            if filename:
+                with self.inflight_lock:
+                    fetch = self.video_fetches.pop(filename, None)
+                callbacks.extend(fetch['callbacks'] if fetch else [])
+            for callback in callbacks:
+                try:
+                    callback(result)
+                except Exception as e:
+                    print(f"下载任务 {task_id} 的回调执行失败: {str(e)}")
+
+    def _report_position(self, task_id, position):
+        """排队位置变化时更新进度，前端据此显示前面还有几个任务"""
+        self.progress.update(task_id, {'status': 'queued', 'position': position, 'progress': 0})
 
     def _extract_url(self, text):
         """从文本中提取 URL"""
@@ -23,6 +123,14 @@ class VideoDownloadService:
             return url.rstrip('/?.#')
         return None
 
+    def _detect_host(self, url):
+        """识别链接所属的站点，不支持的站点返回 None"""
+        if "youtube.com" in url or "youtu.be" in url:
+            return 'youtube'
+        if "bilibili.com" in url:
+            return 'bilibili'
+        return None
+
     def _format_size(self, bytes_size):
         """格式化文件大小"""
         if bytes_size is None:
@@ -43,123 +151,217 @@ class VideoDownloadService:
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         return f"{title}_{timestamp}.mp4"
 
-    def _create_progress_hook(self, task_id):
-        """创建下载进度回调函数"""
-        progress_queue = self.progress_queues.get(task_id)
-        if not progress_queue:
-            return None
+    def _create_progress_hook(self, task_ids, host):
+        """创建下载进度回调函数
 
+        yt-dlp 每收到一块数据就会回调一次，这里只覆盖任务的最新状态，不做累积。
+        共享同一次下载的所有任务收到相同的进度。
+        """
         def progress_hook(d):
             """下载进度回调"""
             if d['status'] == 'downloading':
-                percent = d.get('percent')
-                if percent is None:
-                    percent = 0
+                downloaded = d.get('downloaded_bytes') or 0
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                percent = downloaded * 100 / total if total else 0
 
                 progress = {
                     'status': 'downloading',
-                    'downloaded': self._format_size(d.get('downloaded_bytes', 0)),
-                    'total': self._format_size(d.get('total_bytes') or d.get('total_bytes_estimate')),
-                    'speed': self._format_size(d.get('speed', 0)) + '/s',
+                    'downloaded': self._format_size(downloaded),
+                    'total': self._format_size(total),
+                    'speed': self._format_size(d.get('speed') or 0) + '/s',
                     'eta': str(d.get('eta', '未知')),
                     'progress': percent
                 }
-                progress_queue.put(progress)
+                for task_id in list(task_ids):
+                    self.progress.update(task_id, progress)
 
             elif d['status'] == 'finished':
-                video_path = d.get('filename', '').replace('\\', '/')
-                filename = os.path.basename(video_path)
-                progress_queue.put({
-                    'status': 'completed',
-                    'video_path': filename
-                })
+                # 单个音视频流下载完成，之后可能还需要合并，真正完成由 download_video 通知
+                metrics.inc('download_bytes_total', d.get('total_bytes') or d.get('downloaded_bytes') or 0, host=host)
+                if d.get('elapsed'):
+                    metrics.observe('download_stream_seconds', d['elapsed'], host=host)
+                for task_id in list(task_ids):
+                    self.progress.update(task_id, {
+                        'status': 'processing',
+                        'progress': 100
+                    })
 
         return progress_hook
 
-    def download_video(self, user_input, task_id):
-        """下载视频"""
+    def download_video(self, user_input, task_id, mode=MODE_VIDEO, filename=None):
+        """下载视频
+
+        同一个视频（按归一化后的链接判断）以同一模式、同一指定文件名正在下载时不会重复下载，
+        后到的任务等待同一次下载完成并共享进度和结果。
+        补下载视频画面的任务各自指定了文件名，不会共享其他记录的下载结果。
+
+        Args:
+            mode: MODE_VIDEO 下载合并好的视频；MODE_AUDIO 只下载音轨，
+                  保存为与视频同名的 .audio.<扩展名> 文件，返回值中的 filename 仍是视频文件名
+            filename: 指定保存的视频文件名（补下载视频画面时使用），默认由标题生成
+        """
         try:
             url = self._extract_url(user_input)
             if not url:
                 raise ValueError("未找到有效的 URL")
+            host = self._detect_host(url)
+            if not host:
+                raise ValueError("不支持的视频 URL")
 
-            self.progress_queues[task_id] = queue.Queue()
+            key = normalize_url(url)
+            inflight_key = (key, mode, filename)
+            with self.inflight_lock:
+                download = self.inflight.get(inflight_key)
+                leader = download is None
+                if leader:
+                    download = self.inflight[inflight_key] = {'future': Future(), 'task_ids': [task_id]}
+                else:
+                    download['task_ids'].append(task_id)
 
-            ydl_opts = {
-                'format': 'bestvideo+bestaudio/best',
-                'merge_output_format': 'mp4',
-                'progress_hooks': [self._create_progress_hook(task_id)],
-                'retries': 10,
-                'fragment_retries': 10,
-                'retry-sleep': '5-10',
-            }
-            
+            if not leader:
+                metrics.inc('downloads_deduplicated_total', host=host)
+                self.progress.update(task_id, {'status': 'pending', 'progress': 0})
+                result = download['future'].result()
+                self.progress.update(task_id, {
+                    'status': 'completed',
+                    'progress': 100,
+                    'video_path': result['filename']
+                })
+                return result
 
-            if "youtube.com" in url or "youtu.be" in url:
-                if Config.YOUTUBE_COOKIES_PATH:
-                    ydl_opts['cookiefile'] = Config.YOUTUBE_COOKIES_PATH
-                elif Config.YOUTUBE_BROWSER:
-                    ydl_opts['cookiesfrombrowser'] = (Config.YOUTUBE_BROWSER,)
+            try:
+                result = self._download(url, host, key, download['task_ids'], mode, filename)
+                download['future'].set_result(result)
+                return result
+            except Exception as e:
+                download['future'].set_exception(e)
+                raise
+            finally:
+                with self.inflight_lock:
+                    self.inflight.pop(inflight_key, None)
 
-            elif "bilibili.com" in url:
-                if Config.BILIBILI_COOKIES_PATH:
-                    ydl_opts['cookiefile'] = Config.BILIBILI_COOKIES_PATH
+        except Exception as e:
+            print(f"下载视频失败: {str(e)}")
+            self.progress.update(task_id, {
+                'status': 'error',
+                'message': str(e)
+            })
+            return None
 
-            else:
-                raise ValueError("不支持的视频 URL")
+    def _download(self, url, host, key, task_ids, mode, filename=None):
+        """提取信息并下载，提取结果直接用于下载，不再重新解析页面
+
+        Args:
+            task_ids: 共享这次下载的任务 ID 列表，其他任务加入时会追加到这个列表
+        """
+        for task_id in list(task_ids):
+            self.progress.update(task_id, {'status': 'pending', 'progress': 0})
+
+        if mode == MODE_AUDIO:
+            # 优先选 m4a（MP4 容器，解析时长不需要 ffprobe），没有单独音轨时退回完整文件
+            format_opts = {'format': 'bestaudio[ext=m4a]/bestaudio/best'}
+        else:
+            format_opts = {'format': 'bestvideo+bestaudio/best', 'merge_output_format': 'mp4'}
+
+        ydl_opts = {
+            **format_opts,
+            'progress_hooks': [self._create_progress_hook(task_ids, host)],
+            'retries': 10,
+            'fragment_retries': 10,
+            'retry-sleep': '5-10',
+            'socket_timeout': Config.REMOTE_READ_TIMEOUT,
+        }
+
+        if host == 'youtube':
+            if Config.YOUTUBE_COOKIES_PATH:
+                ydl_opts['cookiefile'] = Config.YOUTUBE_COOKIES_PATH
+            elif Config.YOUTUBE_BROWSER:
+                ydl_opts['cookiesfrombrowser'] = (Config.YOUTUBE_BROWSER,)
 
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                video_info = ydl.extract_info(url, download=False)
-                if not video_info:
-                    raise Exception("无法获取视频信息")
+        elif host == 'bilibili':
+            if Config.BILIBILI_COOKIES_PATH:
+                ydl_opts['cookiefile'] = Config.BILIBILI_COOKIES_PATH
 
-                safe_filename = self._sanitize_filename(video_info.get('title', 'video'))
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            video_info = self.info_cache.get(key)
+            cached = video_info is not None
+            if not cached:
+                video_info = self._extract_info(ydl, url, key, host)
+
+            safe_filename = filename or self._sanitize_filename(video_info.get('title', 'video'))
+            if mode == MODE_AUDIO:
+                filepath = audio_sidecar_template(safe_filename)
+            else:
                 filepath = os.path.join(Config.RECORDS_FOLDER, safe_filename)
-                ydl_opts['outtmpl'] = filepath
+            # outtmpl 在 YoutubeDL 初始化时已被整理为字典
+            ydl.params['outtmpl']['default'] = filepath
 
+            try:
                 try:
-                    with yt_dlp.YoutubeDL(ydl_opts) as ydl_download:
-                        ydl_download.download([url])
+                    with track_call(host, 'download'):
+                        ydl.process_ie_result(video_info, download=True)
                 except Exception as e:
-                    print(f"下载过程中发生错误: {str(e)}")
-                    # 删除部分下载的文件
-                    if os.path.exists(filepath):
-                        try:
-                            os.remove(filepath)
-                            print(f"已删除部分下载的文件: {filepath}")
-                        except OSError as remove_err:
-                            print(f"删除文件时出错: {remove_err}")
-                    raise
-
-                return {
-                    'title': video_info.get('title', '视频'),
-                    'filename': safe_filename,
-                    'duration': video_info.get('duration', 0)
-                }
+                    if not cached:
+                        raise
+                    # 缓存中的直链可能已经过期，重新提取后再试一次
+                    print(f"使用缓存的视频信息下载失败，重新提取: {str(e)}")
+                    self.info_cache.invalidate(key)
+                    self._remove_partial(self._output_path(safe_filename, mode))
+                    video_info = self._extract_info(ydl, url, key, host)
+                    with track_call(host, 'download'):
+                        ydl.process_ie_result(video_info, download=True)
+            except Exception as e:
+                print(f"下载过程中发生错误: {str(e)}")
+                self._remove_partial(self._output_path(safe_filename, mode))
+                raise
 
-        except Exception as e:
-            print(f"下载视频失败: {str(e)}")
-            if task_id in self.progress_queues:
-                self.progress_queues[task_id].put({
-                    'status': 'error',
-                    'message': str(e)
-                })
-            return None
-        finally:
-            if task_id in self.progress_queues:
-                self.progress_queues[task_id].put(None)
+        if mode == MODE_AUDIO and not find_audio_file(safe_filename):
+            raise Exception("未找到下载的音频文件")
+
+        for task_id in list(task_ids):
+            self.progress.update(task_id, {
+                'status': 'completed',
+                'progress': 100,
+                'video_path': safe_filename
+            })
+        return {
+            'title': video_info.get('title', '视频'),
+            'filename': safe_filename,
+            'duration': video_info.get('duration', 0),
+            'audio_only': mode == MODE_AUDIO,
+            'source_url': url
+        }
 
-    def get_progress_queue(self, task_id):
-        """获取进度队列"""
-        return self.progress_queues.get(task_id)
+    def _extract_info(self, ydl, url, key, host):
+        """提取视频信息（含格式选择）并写入缓存"""
+        with track_call(host, 'extract_info'):
+            video_info = ydl.extract_info(url, download=False)
+        if not video_info:
+            raise Exception("无法获取视频信息")
+        self.info_cache.set(key, video_info)
+        return video_info
 
-    def remove_progress_queue(self, task_id):
-        """移除进度队列"""
-        if task_id in self.progress_queues:
-            del self.progress_queues[task_id]
+    def _output_path(self, filename, mode):
+        """下载完成（或部分完成）的文件路径；只下载音轨时扩展名由实际格式决定"""
+        if mode == MODE_AUDIO:
+            return find_audio_file(filename)
+        return os.path.join(Config.RECORDS_FOLDER, filename)
+
+    def _remove_partial(self, filepath):
+        """删除部分下载的文件"""
+        if filepath and os.path.exists(filepath):
+            try:
+                os.remove(filepath)
+                print(f"已删除部分下载的文件: {filepath}")
+            except OSError as remove_err:
+                print(f"删除文件时出错: {remove_err}")
+
+    def get_progress(self, task_id):
+        """获取任务的最新进度，任务不存在或已过期时返回 None"""
+        return self.progress.get(task_id)[1]
 
 if __name__ == "__main__":
-    video_service = VideoService()
+    video_service = VideoDownloadService()
 
     print("视频下载器 (输入 'q' 退出)")
     print("提示：")
@@ -172,23 +374,11 @@ if __name__ == "__main__":
         if user_input.lower() == 'q':
             break
 
-        task_id = str(int(time.time()))
+        task_id = uuid.uuid4().hex
         result = video_service.download_video(user_input, task_id)
 
-        progress_queue = video_service.get_progress_queue(task_id)
-        if progress_queue:
-            while True:
-                progress = progress_queue.get()
-                if progress is None:
-                    break
-                if progress.get('status') == 'error':
-                    print(f"\n{progress['message']}")
-                    break
-                elif progress.get('status') == 'completed':
-                    print(f"\n下载完成：{progress.get('video_path')}")
-                    break
-                else:
-                    print(f"\r进度: {progress.get('progress'):.1f}%  "
-                          f"已下载: {progress.get('downloaded')} / {progress.get('total')}  "
-                          f"速度: {progress.get('speed')}  剩余时间: {progress.get('eta')}", end="")
-                    sys.stdout.flush()
+        progress = video_service.get_progress(task_id)
+        if progress and progress.get('status') == 'error':
+            print(f"\n{progress['message']}")
+        elif progress and progress.get('status') == 'completed':
+            print(f"\n下载完成：{progress.get('video_path')}")
@@ -1,7 +1,7 @@
 // 历史记录处理
 class HistoryManager {
     constructor() {
-        this.page = 1;
+        this.cursor = null;  // 服务端返回的下一页游标
         this.pageSize = 10;
         this.loading = false;
         this.hasMore = true;
@@ -22,6 +22,16 @@ class HistoryManager {
     bindEvents() {
         this.refreshBtn.addEventListener('click', () => this.refresh());
         this.loadMoreBtn.addEventListener('click', () => this.loadMore());
+
+        // 滚动到“加载更多”按钮附近时自动加载下一页
+        if ('IntersectionObserver' in window) {
+            this.observer = new IntersectionObserver((entries) => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    this.loadMore();
+                }
+            }, { rootMargin: '200px' });
+            this.observer.observe(this.loadMoreBtn);
+        }
         
         // 委托事件处理
         this.historyList.addEventListener('click', (e) => {
@@ -41,14 +51,19 @@ class HistoryManager {
             this.loading = true;
             this.updateLoadingState(true);
             
-            const response = await fetch(`/api/history?page=${this.page}&size=${this.pageSize}`);
+            const params = new URLSearchParams({ per_page: this.pageSize });
+            if (append && this.cursor) {
+                params.set('cursor', this.cursor);
+            }
+            const response = await fetch(`/api/history?${params}`);
             const data = await response.json();
             
             if (!append) {
                 this.historyList.innerHTML = '';
             }
             
-            this.renderHistory(data.items);
+            this.renderHistory(data.items, append);
+            this.cursor = data.next_cursor;
             this.hasMore = data.has_more;
             this.updateLoadMoreButton();
             
@@ -60,8 +75,23 @@ class HistoryManager {
         }
     }
     
-    renderHistory(items) {
-        if (items.length === 0 && this.page === 1) {
+    refresh() {
+        this.cursor = null;
+        this.hasMore = true;
+        this.loadHistory(false);
+    }
+    
+    loadMore() {
+        if (!this.hasMore || !this.cursor) return;
+        this.loadHistory(true);
+    }
+    
+    updateLoadMoreButton() {
+        this.loadMoreBtn.classList.toggle('d-none', !this.hasMore);
+    }
+    
+    renderHistory(items, append = false) {
+        if (items.length === 0 && !append) {
             this.emptyState.classList.remove('d-none');
             return;
         }
@@ -8,6 +8,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const uploadTranscribeBtn = document.getElementById('upload-transcribe-btn');
     const downloadProgress = document.getElementById('download-progress');
     const downloadStatus = document.getElementById('download-status');
+    const autoTranscribeCheckbox = document.getElementById('auto-transcribe');
     const info = document.getElementById('info');
     const transcriptionText = document.getElementById('transcription-text');
     const transcriptionContainer = document.getElementById('transcription-container');
@@ -131,6 +132,8 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
+        const autoTranscribe = autoTranscribeCheckbox.checked;
+
         try {
             showInfo('正在获取视频信息...');
             disableUI();
@@ -138,16 +141,39 @@ document.addEventListener('DOMContentLoaded', function() {
             const progressBar = downloadProgress.querySelector('.progress-bar');
             progressBar.style.width = '0%';
 
-            // 创建任务ID
-            const taskId = Date.now().toString();
-            
-            // 设置SSE连接
+            const response = await fetch('/download', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                },
+                body: JSON.stringify({ 
+                    url: url,
+                    auto_transcribe: autoTranscribe
+                })
+            });
+
+            const data = await response.json();
+            if (!response.ok) {
+                showError(data.error || '下载失败');
+                enableUI();
+                downloadProgress.classList.add('d-none');
+                return;
+            }
+
+            // 使用服务端返回的任务ID订阅下载进度
+            const taskId = data.task_id;
             const eventSource = new EventSource(`/progress/${taskId}`);
             
             eventSource.onmessage = function(event) {
                 const data = JSON.parse(event.data);
-                if (data.status === 'downloading') {
+                if (data.status === 'queued') {
+                    downloadStatus.textContent = data.position > 1
+                        ? `排队中，前面还有 ${data.position - 1} 个下载任务...`
+                        : '等待下载...';
+                } else if (data.status === 'downloading') {
                     updateDownloadProgress(data);
+                } else if (data.status === 'processing') {
+                    downloadStatus.textContent = '正在合并音视频...';
                 } else if (data.status === 'completed') {
                     eventSource.close();
                     showSuccess('下载完成！');
@@ -159,6 +185,10 @@ document.addEventListener('DOMContentLoaded', function() {
                     urlInput.value = '';
                     enableUI();
                     downloadProgress.classList.add('d-none');
+
+                    if (autoTranscribe) {
+                        followPipeline(taskId);
+                    }
                 } else if (data.status === 'error') {
                     showError(data.message);
                     eventSource.close();
@@ -166,23 +196,6 @@ document.addEventListener('DOMContentLoaded', function() {
                     downloadProgress.classList.add('d-none');
                 }
             };
-
-            const response = await fetch('/download', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify({ 
-                    url: url,
-                    task_id: taskId
-                })
-            });
-
-            if (!response.ok) {
-                const data = await response.json();
-                showError(data.error || '下载失败');
-                eventSource.close();
-            }
         } catch (error) {
             showError('网络错误，请稍后重试');
         }
@@ -205,20 +218,30 @@ document.addEventListener('DOMContentLoaded', function() {
                 })
             });
 
-            const data = await response.json();
+            const job = await response.json();
+            console.log('转录任务:', job); // 添加调试日志
+
+            if (!response.ok) {
+                showError(job.error || '转录失败');
+                console.log('转录请求失败:', job);
+                return;
+            }
+
+            const data = await waitForTranscriptionJob(job.job_id);
             console.log('转录响应:', data); // 添加调试日志
 
-            if (response.ok) {
+            if (data.stage === 'completed') {
                 if (data.transcription && data.transcription.sentences) {
                     showSuccess('转录完成！');
                     updateTranscription(data);
+                    loadRecentHistory();
                 } else {
                     showError('转录结果格式不正确');
                     console.log('错误的转录结果格式:', data);
                 }
             } else {
                 showError(data.error || '转录失败');
-                console.log('转录请求失败:', data);
+                console.log('转录任务失败:', data);
             }
         } catch (error) {
             console.error('转录请求出错:', error);
@@ -228,6 +251,79 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // 自动转录：音轨下载完成后服务端已提交转录任务，等待它完成并显示各阶段耗时
+    async function followPipeline(taskId) {
+        try {
+            disableUI();
+            showInfo('正在转录视频...');
+            let pipeline = null;
+            while (true) {
+                const response = await fetch(`/download/${taskId}/pipeline`);
+                const data = await response.json();
+                if (!response.ok) {
+                    showError(data.error || '转录失败');
+                    return;
+                }
+                pipeline = data.pipeline;
+                if (pipeline.job_id || pipeline.status !== 'running') {
+                    break;
+                }
+                await new Promise(resolve => setTimeout(resolve, 500));
+            }
+            if (!pipeline.job_id) {
+                showError(pipeline.error || '转录失败');
+                return;
+            }
+
+            const data = await waitForTranscriptionJob(pipeline.job_id);
+            if (data.stage === 'completed' && data.transcription && data.transcription.sentences) {
+                showSuccess('转录完成！');
+                updateTranscription(data);
+                loadRecentHistory();
+
+                const response = await fetch(`/download/${taskId}/pipeline`);
+                if (response.ok) {
+                    const stages = (await response.json()).pipeline.stages;
+                    console.log('流水线各阶段耗时:', stages);
+                    const audio = stages.audio_download || {};
+                    const transcription = stages.transcription || {};
+                    downloadStatus.textContent = `音轨下载 ${((audio.duration_ms || 0) / 1000).toFixed(1)} 秒，` +
+                        `转录完成于第 ${((transcription.end_ms || 0) / 1000).toFixed(1)} 秒`;
+                }
+            } else {
+                showError(data.error || '转录失败');
+            }
+        } catch (error) {
+            console.error('自动转录出错:', error);
+            showError('网络错误，请稍后重试');
+        } finally {
+            enableUI();
+        }
+    }
+
+    // 转录任务各阶段的提示文字
+    const TRANSCRIPTION_STAGE_TEXT = {
+        queued: '转录任务排队中...',
+        checking: '正在检查视频...',
+        extracting: '正在提取音频...',
+        uploading: '正在上传视频...',
+        transcribing: '正在转录视频...',
+        saving: '正在保存转录结果...'
+    };
+
+    // 轮询转录任务直到完成或失败
+    async function waitForTranscriptionJob(jobId, interval = 2000) {
+        while (true) {
+            const response = await fetch(`/transcribe/${jobId}`);
+            const data = await response.json();
+            if (!response.ok || data.stage === 'completed' || data.stage === 'failed') {
+                return data;
+            }
+            showInfo(TRANSCRIPTION_STAGE_TEXT[data.stage] || '正在转录视频...');
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    }
+
     // YouTube视频转录按钮
     youtubeTranscribeBtn.addEventListener('click', function() {
         if (currentVideo.source === 'youtube' && currentVideo.filename) {
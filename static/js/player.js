@@ -8,16 +8,20 @@ document.addEventListener('DOMContentLoaded', function() {
     // 从window.videoInfo获取视频信息
     const videoPath = window.videoInfo.path;
     const source = window.videoInfo.source;
+    const historyId = window.videoInfo.history_id;
     const transcribed = window.videoInfo.transcribed === '1';
-    const transcription = window.videoInfo.transcription;
 
     console.log('Video Info:', window.videoInfo);  // 调试日志
 
-    // 如果已经转录过，直接显示结果
-    if (transcribed && transcription) {
+    // 如果已经转录过，随播放进度分段加载转录结果
+    if (transcribed && historyId) {
         transcribeBtn.classList.add('d-none');
-        transcriptionText.value = transcription;  // 直接使用Redis中的纯文本
-        transcriptionContainer.classList.remove('d-none');
+        initTranscriptSync(historyId).catch(() => loadFullTranscription(historyId));
+    }
+
+    // 只下载了音轨的记录：先播放音频，视频画面下载完成后切换过去并保持播放位置
+    if (window.videoInfo.video_task_id) {
+        waitForVideo(window.videoInfo.video_task_id);
     }
 
     // 转录按钮点击事件
@@ -39,15 +43,26 @@ document.addEventListener('DOMContentLoaded', function() {
                 })
             });
 
-            const data = await response.json();
+            const job = await response.json();
+            console.log('转录任务:', job);
+
+            if (!response.ok) {
+                showError(job.error || '转录失败');
+                return;
+            }
+
+            const data = await waitForTranscriptionJob(job.job_id);
             console.log('转录响应:', data);
 
-            if (response.ok) {
+            if (data.stage === 'completed') {
                 if (data.transcription && data.transcription.sentences) {
                     showSuccess('转录完成！');
-                    updateTranscription(data);
                     transcribeBtn.classList.add('d-none');
-                    transcriptionContainer.classList.remove('d-none');
+                    if (data.history_id) {
+                        initTranscriptSync(data.history_id).catch(() => updateTranscription(data));
+                    } else {
+                        updateTranscription(data);
+                    }
                 } else {
                     showError('转录结果格式不正确');
                 }
@@ -62,6 +77,61 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // 转录任务各阶段的提示文字
+    const TRANSCRIPTION_STAGE_TEXT = {
+        queued: '转录任务排队中...',
+        checking: '正在检查视频...',
+        extracting: '正在提取音频...',
+        uploading: '正在上传视频...',
+        transcribing: '正在转录视频...',
+        saving: '正在保存转录结果...'
+    };
+
+    // 轮询转录任务直到完成或失败
+    async function waitForTranscriptionJob(jobId, interval = 2000) {
+        while (true) {
+            const response = await fetch(`/transcribe/${jobId}`);
+            const data = await response.json();
+            if (!response.ok || data.stage === 'completed' || data.stage === 'failed') {
+                return data;
+            }
+            showInfo(TRANSCRIPTION_STAGE_TEXT[data.stage] || '正在转录视频...');
+            await new Promise(resolve => setTimeout(resolve, interval));
+        }
+    }
+
+    function waitForVideo(taskId) {
+        showInfo('正在后台下载视频画面，当前先播放音频...');
+        const eventSource = new EventSource(`/progress/${taskId}`);
+
+        eventSource.onmessage = function(event) {
+            const state = JSON.parse(event.data);
+            if (state.status === 'downloading') {
+                showInfo(`正在后台下载视频画面 ${(state.progress || 0).toFixed(1)}%，当前先播放音频...`);
+            } else if (state.status === 'completed') {
+                eventSource.close();
+                switchToVideo();
+            } else if (state.status === 'error') {
+                eventSource.close();
+                showError(`视频画面下载失败: ${state.message}`);
+            }
+        };
+    }
+
+    function switchToVideo() {
+        const player = videojs('video-player');
+        const position = player.currentTime();
+        const paused = player.paused();
+        player.src({ src: `/video/${encodeURIComponent(videoPath)}`, type: 'video/mp4' });
+        player.one('loadedmetadata', function() {
+            player.currentTime(position);
+            if (!paused) {
+                player.play();
+            }
+        });
+        showSuccess('视频画面已加载');
+    }
+
     // 辅助函数
     function showInfo(message) {
         info.textContent = message;
@@ -81,7 +151,24 @@ document.addEventListener('DOMContentLoaded', function() {
         info.classList.remove('d-none');
     }
 
-    // updateTranscription 只在新转录时使用
+    // 没有时间轴的旧记录：读取记录详情，显示完整的纯文本
+    async function loadFullTranscription(id) {
+        try {
+            const response = await fetch(`/api/history/${id}`);
+            const data = await response.json();
+            if (data.success && data.history_item.transcription) {
+                transcriptionText.value = data.history_item.transcription;
+                transcriptionContainer.classList.remove('d-none');
+            } else {
+                transcribeBtn.classList.remove('d-none');
+            }
+        } catch (error) {
+            console.error('加载转录文本失败:', error);
+            transcribeBtn.classList.remove('d-none');
+        }
+    }
+
+    // updateTranscription 只在新转录且无法分段加载时使用
     function updateTranscription(data) {
         if (data && data.transcription && Array.isArray(data.transcription.sentences)) {
             const sentences = data.transcription.sentences;
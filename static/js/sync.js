@@ -1,19 +1,123 @@
-// 视频播放器监听
-const videoPlayer = document.getElementById('video-player');
-const textContainer = document.getElementById('text-container');
-
-videoPlayer.addEventListener('timeupdate', () => {
-    const currentTime = videoPlayer.currentTime * 1000; // 转换为毫秒
-    
-    // 遍历所有文本段落，找到当前应该高亮的段落
-    sentences.forEach(sentence => {
-        const textElement = document.getElementById(`text-${sentence.begin_time}`);
-        if (currentTime >= sentence.begin_time && currentTime <= sentence.end_time) {
-            textElement.classList.add('highlight');
-            // 确保高亮文本在可视区域内
-            textElement.scrollIntoView({ behavior: 'smooth', block: 'center' });
-        } else {
-            textElement.classList.remove('highlight');
+// 转录分段与视频播放同步
+// 句子按时间窗口从 /api/history/<id>/segments 分段加载，播放到哪里加载到哪里，
+// 已加载的句子按开始时间排序，高亮时二分查找当前句子，不再遍历全部句子。
+
+const SEGMENT_WINDOW_MS = 60 * 1000;   // 每次加载的时间窗口长度
+const SEGMENT_PREFETCH_MS = 15 * 1000; // 距离窗口结束不足该时长时预加载下一个窗口
+
+function initTranscriptSync(historyId) {
+    const player = videojs('video-player');
+    const container = document.getElementById('segment-container');
+    const list = document.getElementById('segment-list');
+
+    const windows = new Map();  // 窗口序号 -> 加载中的 Promise
+    const segments = [];        // 已加载的句子，按 begin_time 排序
+    const elements = [];        // 与 segments 一一对应的 DOM 元素
+    const loadedKeys = new Set();
+    let durationMs = null;
+    let activeElement = null;
+    let unavailable = false;    // 记录没有时间轴（旧记录）时不再请求
+
+    // 跨越窗口边界的句子会在两个窗口中都返回，按起止时间去重
+    function segmentKey(segment) {
+        return `${segment.begin_time}-${segment.end_time}`;
+    }
+
+    // 第一个 begin_time 大于 ms 的句子下标
+    function upperBound(ms) {
+        let low = 0;
+        let high = segments.length;
+        while (low < high) {
+            const mid = (low + high) >> 1;
+            if (segments[mid].begin_time <= ms) {
+                low = mid + 1;
+            } else {
+                high = mid;
+            }
+        }
+        return low;
+    }
+
+    function insertSegments(newSegments) {
+        newSegments.forEach(segment => {
+            const key = segmentKey(segment);
+            if (loadedKeys.has(key)) return;
+            loadedKeys.add(key);
+
+            const element = document.createElement('div');
+            element.className = 'segment';
+            element.textContent = segment.text;
+            element.addEventListener('click', () => player.currentTime(segment.begin_time / 1000));
+
+            const index = upperBound(segment.begin_time);
+            list.insertBefore(element, elements[index] || null);
+            segments.splice(index, 0, segment);
+            elements.splice(index, 0, element);
+        });
+    }
+
+    function loadWindow(index) {
+        if (index < 0 || (durationMs !== null && index * SEGMENT_WINDOW_MS > durationMs)) {
+            return Promise.resolve();
         }
-    });
-}); 
\ No newline at end of file
+        if (windows.has(index)) {
+            return windows.get(index);
+        }
+
+        const from = index * SEGMENT_WINDOW_MS;
+        const to = from + SEGMENT_WINDOW_MS;
+        const promise = fetch(`/api/history/${historyId}/segments?from_ms=${from}&to_ms=${to}`)
+            .then(response => {
+                if (response.status === 404) {
+                    unavailable = true;
+                }
+                if (!response.ok) {
+                    throw new Error(`加载转录分段失败: ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(data => {
+                durationMs = data.duration_ms;
+                insertSegments(data.segments);
+                container.classList.remove('d-none');
+            })
+            .catch(error => {
+                windows.delete(index);  // 允许之后重试
+                throw error;
+            });
+        windows.set(index, promise);
+        return promise;
+    }
+
+    function highlight(ms) {
+        const index = upperBound(ms) - 1;
+        const element = index >= 0 && ms <= segments[index].end_time ? elements[index] : null;
+        if (element === activeElement) return;
+
+        if (activeElement) {
+            activeElement.classList.remove('highlight');
+        }
+        if (element) {
+            element.classList.add('highlight');
+            // 只在切换句子时滚动，确保高亮文本在可视区域内
+            element.scrollIntoView({ behavior: 'smooth', block: 'nearest' });
+        }
+        activeElement = element;
+    }
+
+    function onTimeUpdate() {
+        if (unavailable) return;
+        const ms = player.currentTime() * 1000;
+        const index = Math.floor(ms / SEGMENT_WINDOW_MS);
+        loadWindow(index).then(() => highlight(ms)).catch(error => console.error(error));
+        if ((index + 1) * SEGMENT_WINDOW_MS - ms < SEGMENT_PREFETCH_MS) {
+            loadWindow(index + 1).catch(error => console.error(error));
+        }
+    }
+
+    player.on('timeupdate', onTimeUpdate);
+    player.on('seeked', onTimeUpdate);
+
+    // 先加载当前播放位置所在的窗口，调用方据此判断记录是否有时间轴
+    return loadWindow(Math.floor(player.currentTime() * 1000 / SEGMENT_WINDOW_MS));
+}
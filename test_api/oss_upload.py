@@ -1,7 +1,6 @@
 import oss2
 from dotenv import load_dotenv
 import os
-from moviepy.editor import VideoFileClip
 import uuid
 
 def process_video(video_path):
@@ -0,0 +1,116 @@
+import os
+import struct
+import sys
+import time
+
+# 服务在导入和初始化时读取配置，测试环境不连接真实的 OSS/DashScope/Supabase
+os.environ.setdefault('OSS_ENDPOINT', 'oss-test.example.com')
+os.environ.setdefault('OSS_ACCESS_KEY_ID', 'test')
+os.environ.setdefault('OSS_ACCESS_KEY_SECRET', 'test')
+os.environ.setdefault('OSS_BUCKET_NAME', 'test')
+os.environ.setdefault('DASHSCOPE_API_KEY', 'test')
+os.environ['HISTORY_BACKEND'] = 'sqlite'
+os.environ['HISTORY_CACHE_BACKEND'] = 'memory'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from config import Config
+
+
+def box(box_type, payload=b''):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def build_mp4(seconds=12, video=False, movie_duration=True, timescale=1000):
+    """构造最小的 MP4（ftyp + moov + mdat），默认只有音轨，不依赖 ffmpeg"""
+    duration = int(seconds * timescale)
+    mvhd = box(b'mvhd', struct.pack('>IIIII', 0, 0, 0, timescale, duration if movie_duration else 0) + bytes(80))
+
+    def trak(handler, sample_entry, extra=b'', width=0, height=0):
+        tkhd = box(b'tkhd', bytes(76) + struct.pack('>II', width << 16, height << 16))
+        mdhd = box(b'mdhd', struct.pack('>IIIIIHH', 0, 0, 0, timescale, duration, 0, 0))
+        hdlr = box(b'hdlr', struct.pack('>II4s', 0, 0, handler) + bytes(12) + b'\0')
+        stsd = box(b'stsd', struct.pack('>II', 0, 1) + sample_entry)
+        stbl = box(b'stbl', stsd + extra)
+        return box(b'trak', tkhd + box(b'mdia', mdhd + hdlr + box(b'minf', stbl)))
+
+    tracks = trak(b'soun', box(b'mp4a', bytes(28)))
+    if video:
+        frames = int(seconds * 25)
+        visual_entry = box(b'avc1', bytes(24) + struct.pack('>HH', 1280, 720) + bytes(50))
+        stts = box(b'stts', struct.pack('>IIII', 0, 1, frames, timescale // 25))
+        tracks = trak(b'vide', visual_entry, stts, 1280, 720) + tracks
+    return box(b'ftyp', b'isom\0\0\0\0isommp41') + box(b'moov', mvhd + tracks) + box(b'mdat', bytes(64))
+
+
+def wait_for(predicate, timeout=5):
+    """轮询直到 predicate 为真，超时返回 False"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class FakeBucket:
+    """记录对象的增删，代替 oss2.Bucket"""
+
+    bucket_name = 'test'
+
+    def __init__(self):
+        self.objects = set()
+        self.deleted = []
+        self.aborted = []
+
+    def sign_url(self, method, key, expires):
+        return f'https://oss.example.com/{key}?Expires={expires}'
+
+    def object_exists(self, key):
+        return key in self.objects
+
+    def delete_object(self, key):
+        self.deleted.append(key)
+        self.objects.discard(key)
+
+    def abort_multipart_upload(self, key, upload_id):
+        self.aborted.append((key, upload_id))
+
+
+@pytest.fixture
+def isolated_config(tmp_path, monkeypatch):
+    """把所有本地文件和数据库放到临时目录"""
+    records = tmp_path / 'records'
+    cache = tmp_path / 'cache'
+    records.mkdir()
+    cache.mkdir()
+    monkeypatch.setattr(Config, 'RECORDS_FOLDER', str(records))
+    monkeypatch.setattr(Config, 'CACHE_FOLDER', str(cache))
+    monkeypatch.setattr(Config, 'TRANSCRIPTION_CACHE_PATH', str(cache / 'transcriptions.db'))
+    monkeypatch.setattr(Config, 'SEARCH_INDEX_PATH', str(cache / 'search_index.db'))
+    monkeypatch.setattr(Config, 'HISTORY_DB_PATH', str(tmp_path / 'history.db'))
+    monkeypatch.setattr(Config, 'HISTORY_BACKEND', 'sqlite')
+    monkeypatch.setattr(Config, 'HISTORY_CACHE_BACKEND', 'memory')
+    return tmp_path
+
+
+@pytest.fixture
+def video_service(isolated_config, monkeypatch):
+    """使用本地 SQLite 和假 OSS 的 VideoService，上传和转写按文件内容返回固定结果"""
+    from services.video_service import VideoService
+
+    service = VideoService()
+    service.bucket = FakeBucket()
+
+    def upload_to_oss(path, object_key=None):
+        service.bucket.objects.add(object_key)
+        return service.bucket.sign_url('GET', object_key, 3600)
+
+    def transcribe_video(video_url, media_seconds=None):
+        return {'sentences': [{'begin_time': 0, 'end_time': 1500, 'text': f'hello {video_url.split("?")[0][-12:]}'}]}
+
+    monkeypatch.setattr(service, 'upload_to_oss', upload_to_oss)
+    monkeypatch.setattr(service, 'transcribe_video', transcribe_video)
+    monkeypatch.setattr(Config, 'EXTRACT_AUDIO_BEFORE_UPLOAD', False)
+    return service
@@ -0,0 +1,38 @@
+import threading
+import time
+from services.asr_batcher import TranscriptionBatcher
+
+
+class RecordingBatcher(TranscriptionBatcher):
+    """只记录提交的批次，不调用 DashScope"""
+
+    def __init__(self, **kwargs):
+        self.batches = []
+        self.submitted = threading.Event()
+        super().__init__(poller=object(), **kwargs)
+
+    def _submit_batch(self, batch):
+        self.batches.append((time.monotonic(), [item[0] for item in batch]))
+        self.submitted.set()
+
+
+def test_single_file_waits_at_most_max_wait():
+    batcher = RecordingBatcher(batch_size=8, max_wait=0.2)
+    started = time.monotonic()
+    batcher.submit('a')
+
+    assert batcher.submitted.wait(2)
+    submitted_at, urls = batcher.batches[0]
+    assert urls == ['a']
+    assert 0.15 <= submitted_at - started < 1
+
+
+def test_submit_many_flushes_without_waiting():
+    batcher = RecordingBatcher(batch_size=8, max_wait=30)
+    started = time.monotonic()
+    batcher.submit_many([('part0', 1), ('part1', 1), ('part2', 1)])
+
+    assert batcher.submitted.wait(2)
+    submitted_at, urls = batcher.batches[0]
+    assert urls == ['part0', 'part1', 'part2']
+    assert submitted_at - started < 1
@@ -0,0 +1,46 @@
+import sys
+import types
+import pytest
+from flask import Flask
+from flask_restful import Api
+from resources.history_resource import HistoryResource, HistorySegmentsResource
+from resources.search_resource import SearchResource
+
+
+@pytest.fixture
+def client(video_service, monkeypatch):
+    # resources 在请求时才 from app import video_service，这里换成测试用的实例
+    monkeypatch.setitem(sys.modules, 'app', types.SimpleNamespace(video_service=video_service))
+    app = Flask(__name__)
+    api = Api(app)
+    api.add_resource(HistoryResource, '/api/history')
+    api.add_resource(HistorySegmentsResource, '/api/history/<history_id>/segments')
+    api.add_resource(SearchResource, '/api/search')
+    return app.test_client()
+
+
+def test_invalid_cursor_returns_400(client):
+    response = client.get('/api/history?cursor=@@@')
+
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_history_page(client, video_service):
+    video_service.save_to_history({'title': 'a.mp4', 'video_path': 'a.mp4'})
+
+    response = client.get('/api/history')
+
+    assert response.status_code == 200
+    assert [item['title'] for item in response.get_json()['items']] == ['a.mp4']
+
+
+def test_invalid_segment_window_returns_400(client):
+    assert client.get('/api/history/1/segments?from_ms=x').status_code == 400
+
+
+def test_search_without_query_returns_400(client):
+    response = client.get('/api/search')
+
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
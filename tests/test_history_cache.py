@@ -0,0 +1,31 @@
+from services.history_cache import HistoryCache, MemoryCacheBackend
+
+
+def test_detail_loaded_before_update_is_not_served_after_it():
+    cache = HistoryCache(backend=MemoryCacheBackend(), ttl=60)
+    rows = {'1': {'id': 1, 'transcribed': '0'}}
+
+    def stale_loader():
+        row = dict(rows['1'])
+        # 读取完成后、写回缓存之前，另一个请求更新了记录并失效缓存
+        rows['1'] = {'id': 1, 'transcribed': '1'}
+        cache.invalidate('1')
+        return row
+
+    assert cache.get_detail('1', stale_loader) == {'id': 1, 'transcribed': '0'}
+    assert cache.get_detail('1', lambda: dict(rows['1'])) == {'id': 1, 'transcribed': '1'}
+
+
+def test_detail_is_cached_until_invalidated():
+    cache = HistoryCache(backend=MemoryCacheBackend(), ttl=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {'id': 1, 'version': len(loads)}
+
+    assert cache.get_detail('1', loader) == {'id': 1, 'version': 1}
+    assert cache.get_detail('1', loader) == {'id': 1, 'version': 1}
+    cache.invalidate('1')
+    assert cache.get_detail('1', loader) == {'id': 1, 'version': 2}
+    assert cache.get_detail('1', loader, part='timeline') == {'id': 1, 'version': 3}
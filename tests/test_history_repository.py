@@ -0,0 +1,20 @@
+import pytest
+from services.history_repository import HistoryRepository, SqliteHistoryRepository
+
+
+def test_incomplete_repository_cannot_be_instantiated():
+    class PartialRepository(HistoryRepository):
+        def insert(self, data):
+            return None
+
+    with pytest.raises(TypeError):
+        PartialRepository()
+
+
+def test_sqlite_repository_implements_interface(tmp_path):
+    repo = SqliteHistoryRepository(str(tmp_path / 'history.db'))
+    record = repo.insert({'title': 'a.mp4', 'video_path': 'a.mp4', 'source': 'upload', 'created_at': '2024-01-01 00:00:00',
+                          'video_url': 'https://oss.example.com/k/a.ogg?Expires=1'})
+
+    assert repo.find_id('a.mp4', 'upload') == record['id']
+    assert [row['id'] for row in repo.find_by_oss_object('k/a.ogg')] == [record['id']]
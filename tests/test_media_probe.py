@@ -0,0 +1,51 @@
+import pytest
+from conftest import build_mp4
+from services.media_probe import MediaProbe, MediaProbeError, probe_mp4
+
+
+def test_probe_audio_only_m4a(tmp_path):
+    path = tmp_path / 'lecture.audio.m4a'
+    path.write_bytes(build_mp4(seconds=12))
+
+    info = probe_mp4(str(path))
+
+    assert info['duration'] == 12
+    assert info['has_audio'] and not info['has_video']
+    assert info['fps'] == 0
+    assert info['resolution'] == ''
+    assert info['audio_codec'] == 'mp4a'
+
+
+def test_probe_audio_duration_from_mdhd(tmp_path):
+    path = tmp_path / 'lecture.audio.m4a'
+    path.write_bytes(build_mp4(seconds=7.5, movie_duration=False))
+
+    assert MediaProbe().probe(str(path))['duration'] == 7.5
+
+
+def test_probe_rejects_non_mp4(tmp_path):
+    path = tmp_path / 'broken.mp4'
+    path.write_bytes(b'not an mp4 file at all')
+
+    with pytest.raises(MediaProbeError):
+        probe_mp4(str(path))
+
+
+def test_check_video_accepts_audio_sidecar(video_service, isolated_config):
+    path = isolated_config / 'records' / 'lecture.audio.m4a'
+    path.write_bytes(build_mp4())
+
+    assert video_service.check_video(str(path)) == (True, None)
+
+
+def test_process_video_transcribes_audio_sidecar(video_service, isolated_config):
+    (isolated_config / 'records' / 'lecture.audio.m4a').write_bytes(build_mp4())
+    stages = []
+
+    result = video_service.process_video('lecture.mp4', 'youtube', on_stage=stages.append)
+
+    assert result is not None
+    assert stages[:2] == ['checking', 'uploading']
+    assert result['transcription']['sentences']
+    record = video_service.history_repo.get(result['history_id'], 'transcribed,resolution')
+    assert record == {'transcribed': '1', 'resolution': ''}
@@ -0,0 +1,34 @@
+import os
+import oss2
+from config import Config
+from services.video_service import VideoService
+
+
+def test_failed_upload_aborts_multipart_and_drops_checkpoint(video_service, isolated_config, monkeypatch):
+    path = isolated_config / 'cache' / 'audio.ogg'
+    path.write_bytes(b'x' * 1024)
+    store = video_service.upload_checkpoint_store
+    store_key = store.make_store_key('test', 'abc.ogg', os.path.abspath(path))
+    store.put(store_key, {'upload_id': 'upload-1'})
+
+    def fail(*args, **kwargs):
+        raise oss2.exceptions.ServerError(503, {}, b'', {})
+
+    monkeypatch.setattr(oss2, 'resumable_upload', fail)
+    monkeypatch.setattr(Config, 'OSS_UPLOAD_RETRIES', 2)
+    monkeypatch.setattr('services.video_service.time.sleep', lambda seconds: None)
+
+    # fixture 替换了实例上的 upload_to_oss，这里调用真正的实现
+    assert VideoService.upload_to_oss(video_service, str(path), object_key='abc.ogg') is None
+    assert video_service.bucket.aborted == [('abc.ogg', 'upload-1')]
+    assert store.get(store_key) is None
+
+
+def test_extract_audio_reuses_file_at_stable_path(video_service):
+    path = video_service._extracted_audio_path('abc')
+    with open(path, 'wb') as f:
+        f.write(b'OggS')
+    mtime = os.stat(path).st_mtime_ns
+
+    assert video_service.extract_audio('missing.mp4', path) == path
+    assert os.stat(path).st_mtime_ns == mtime
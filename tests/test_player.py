@@ -0,0 +1,42 @@
+import os
+import sys
+import types
+import pytest
+from flask import Flask
+from flask_restful import Api
+from conftest import build_mp4
+from resources.player_resource import PlayerResource
+from services.download_scheduler import QueueFullError
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'templates')
+
+
+class FullYoutubeService:
+    def fetch_video(self, source_url, filename, on_finished=None, priority=-1):
+        raise QueueFullError('下载队列已满')
+
+
+@pytest.fixture
+def client(video_service, monkeypatch):
+    monkeypatch.setitem(sys.modules, 'app', types.SimpleNamespace(
+        video_service=video_service, youtube_service=FullYoutubeService()))
+    app = Flask(__name__, template_folder=TEMPLATES)
+    Api(app).add_resource(PlayerResource, '/player/<path:video_path>')
+    return app.test_client()
+
+
+def test_audio_player_renders_when_download_queue_full(client, video_service, isolated_config):
+    (isolated_config / 'records' / 'lecture.audio.m4a').write_bytes(build_mp4())
+    history_id = video_service.save_to_history({
+        'title': 'Lecture',
+        'source': 'youtube',
+        'video_path': 'lecture.mp4',
+        'source_url': 'https://youtu.be/dQw4w9WgXcQ',
+    }, reuse_existing=True)
+
+    response = client.get(f'/player/lecture.mp4?source=youtube&history_id={history_id}')
+
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert '/video/lecture.audio.m4a' in page
+    assert 'video_task_id: ""' in page
@@ -0,0 +1,46 @@
+import oss2
+import pytest
+from services import remote_client
+from services.remote_client import call_with_retries
+from services.video_service import _is_retryable_oss_error
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(remote_client.time, 'sleep', lambda seconds: None)
+
+
+def flaky(errors, result='ok'):
+    calls = []
+
+    def func():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return func, calls
+
+
+def test_retries_transient_oss_errors():
+    func, calls = flaky([oss2.exceptions.ServerError(503, {}, b'', {}), oss2.exceptions.RequestError(OSError('reset'))])
+
+    assert call_with_retries('oss', 'delete_object', func, _is_retryable_oss_error, retries=3) == 'ok'
+    assert len(calls) == 3
+
+
+def test_does_not_retry_client_errors():
+    func, calls = flaky([oss2.exceptions.NoSuchUpload(404, {}, b'', {})])
+
+    with pytest.raises(oss2.exceptions.NoSuchUpload):
+        call_with_retries('oss', 'abort_multipart_upload', func, _is_retryable_oss_error, retries=3)
+    assert len(calls) == 1
+
+
+def test_gives_up_after_retries():
+    error = oss2.exceptions.ServerError(500, {}, b'', {})
+    func, calls = flaky([error] * 5)
+
+    with pytest.raises(oss2.exceptions.ServerError):
+        call_with_retries('oss', 'delete_object', func, _is_retryable_oss_error, retries=2)
+    assert len(calls) == 3
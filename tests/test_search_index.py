@@ -0,0 +1,16 @@
+from services.search_index import TranscriptSearchIndex
+
+
+def test_snippet_escapes_transcript_text(tmp_path):
+    index = TranscriptSearchIndex(str(tmp_path / 'search.db'))
+    index.index_transcript(1, [{
+        'begin_time': 0,
+        'end_time': 1000,
+        'text': '<script>alert(1)</script> hello & <b>world</b>'
+    }])
+
+    hits = index.search('hello')
+
+    snippet = hits[0]['snippet']
+    assert '<mark>hello</mark> &amp; &lt;b&gt;world&lt;/b&gt;' in snippet
+    assert '<' not in snippet.replace('<mark>', '').replace('</mark>', '')
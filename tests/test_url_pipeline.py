@@ -0,0 +1,48 @@
+from conftest import build_mp4, wait_for
+from services.job_service import TranscriptionJobService
+from services.url_pipeline import UrlIngestPipeline
+
+
+class FakeDownloadService:
+    """只记录回调，由测试决定下载何时完成"""
+
+    def __init__(self):
+        self.audio_callback = None
+        self.video_callbacks = []
+
+    def enqueue(self, user_input, on_finished=None, priority=0, mode=None):
+        self.audio_callback = on_finished
+        return 'audio-task', 1
+
+    def fetch_video(self, source_url, filename, on_finished=None, priority=-1):
+        self.video_callbacks.append(on_finished)
+        return 'video-task'
+
+    def get_progress(self, task_id):
+        return None
+
+
+def test_pipeline_transcribes_audio_only_download(video_service, isolated_config):
+    downloads = FakeDownloadService()
+    jobs = TranscriptionJobService(video_service, max_workers=1)
+    pipeline = UrlIngestPipeline(downloads, video_service, jobs)
+
+    task_id, _ = pipeline.start('https://youtu.be/dQw4w9WgXcQ')
+    # 默认的音频优先模式下只有音轨落地，视频画面还在下载
+    (isolated_config / 'records' / 'lecture.audio.m4a').write_bytes(build_mp4())
+    downloads.audio_callback({
+        'filename': 'lecture.mp4',
+        'title': 'Lecture',
+        'duration': '0:12',
+        'source_url': 'https://youtu.be/dQw4w9WgXcQ',
+    })
+
+    assert wait_for(lambda: pipeline.get(task_id)['stages']['transcription']['outcome'] != 'running')
+    for callback in downloads.video_callbacks:
+        callback({'filename': 'lecture.mp4'})
+
+    run = pipeline.get(task_id)
+    assert run['status'] == 'completed', run
+    assert {stage['outcome'] for stage in run['stages'].values()} == {'ok'}
+    record = video_service.history_repo.get(run['history_id'], 'transcribed,source_url')
+    assert record == {'transcribed': '1', 'source_url': 'https://youtu.be/dQw4w9WgXcQ'}
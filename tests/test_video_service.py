@@ -0,0 +1,100 @@
+import threading
+from conftest import build_mp4
+from config import Config
+
+
+def process(video_service, records, name, data):
+    (records / f'{name}.audio.m4a').write_bytes(data)
+    result = video_service.process_video(f'{name}.mp4', 'youtube')
+    assert result is not None
+    return result
+
+
+def test_delete_keeps_oss_object_shared_with_other_records(video_service, isolated_config):
+    records = isolated_config / 'records'
+    data = build_mp4(seconds=5)
+    first = process(video_service, records, 'first', data)
+    second = process(video_service, records, 'second', data)
+    # 相同内容命中转录缓存，两条记录指向同一个 OSS 对象
+    assert second['cache_hit']
+    object_key = video_service._oss_object_key(first['video_url'])
+    assert video_service._oss_object_key(second['video_url']) == object_key
+
+    assert video_service.delete_history(first['history_id'])[0]
+    assert video_service.bucket.deleted == []
+    assert video_service.transcription_cache.get(video_service.transcription_cache.file_hash(
+        str(records / 'second.audio.m4a')))['oss_object'] == object_key
+
+    assert video_service.delete_history(second['history_id'])[0]
+    assert video_service.bucket.deleted == [object_key]
+
+
+def upload(video_service, records, name, data):
+    """模拟 /upload：覆盖 records 中的同名文件后保存历史记录"""
+    (records / name).write_bytes(data)
+    return video_service.save_to_history({
+        'title': name,
+        'source': 'upload',
+        'video_path': name,
+        'duration': str(video_service.get_video_info(str(records / name))['duration']),
+    })
+
+
+def test_reupload_under_same_filename_resets_record(video_service, isolated_config):
+    records = isolated_config / 'records'
+    history_id = upload(video_service, records, 'clip.mp4', build_mp4(seconds=5, video=True))
+    first = video_service.process_video('clip.mp4', 'upload')
+    old_object = video_service._oss_object_key(first['video_url'])
+
+    assert upload(video_service, records, 'clip.mp4', build_mp4(seconds=9, video=True)) == history_id
+    record = video_service.get_history_detail(history_id)
+    assert record['duration'] == '9.0'
+    assert record['transcribed'] == '0'
+    assert record['transcription'] == '' and record['video_url'] is None
+    assert video_service.get_history_timeline(history_id) is None
+    assert video_service.bucket.deleted == [old_object]
+
+    second = video_service.process_video('clip.mp4', 'upload')
+    assert second['history_id'] == history_id and not second['cache_hit']
+    assert video_service.get_history_detail(history_id)['transcribed'] == '1'
+
+
+def test_shared_download_reuses_record(video_service, isolated_config):
+    records = isolated_config / 'records'
+    data = {'title': 'Lecture', 'source': 'youtube', 'video_path': 'lecture.mp4', 'duration': '0:12'}
+    history_id = video_service.save_to_history(dict(data), reuse_existing=True)
+    process(video_service, records, 'lecture', build_mp4())
+
+    assert video_service.save_to_history(dict(data), reuse_existing=True) == history_id
+    assert video_service.get_history_detail(history_id)['transcribed'] == '1'
+
+
+def test_long_media_uploads_full_audio_while_chunks_transcribe(video_service, isolated_config, monkeypatch):
+    records = isolated_config / 'records'
+    (records / 'long.mp4').write_bytes(build_mp4(seconds=12, video=True))
+    extracted = records / 'long.ogg'
+    extracted.write_bytes(b'audio')
+    monkeypatch.setattr(Config, 'MAX_VIDEO_DURATION', 5)
+    monkeypatch.setattr(video_service, 'extract_audio', lambda video_path, output_path=None: str(extracted))
+    transcribing = threading.Event()
+    overlapped = []
+    upload = video_service.upload_to_oss
+
+    def slow_upload(path, object_key=None):
+        # 串行时整个音轨上传完才开始分段转写，这里会等到超时
+        overlapped.append(transcribing.wait(2))
+        return upload(path, object_key)
+
+    def transcribe_long_media(audio_path, content_hash, media_seconds):
+        transcribing.set()
+        return {'sentences': [{'begin_time': 0, 'end_time': 1500, 'text': 'long'}]}
+
+    monkeypatch.setattr(video_service, 'upload_to_oss', slow_upload)
+    monkeypatch.setattr(video_service, 'transcribe_long_media', transcribe_long_media)
+
+    result = video_service.process_video('long.mp4', 'upload')
+
+    assert result is not None
+    assert overlapped == [True]
+    assert result['video_url']
+    assert not extracted.exists()
@@ -0,0 +1,49 @@
+import sys
+import types
+import pytest
+from flask import Flask
+from flask_restful import Api
+from resources.youtube_resource import YoutubeDownloadResource
+
+
+class FakeYoutubeService:
+    def __init__(self):
+        self.priorities = []
+
+    def enqueue(self, user_input, on_finished=None, priority=0, mode=None):
+        self.priorities.append(priority)
+        return 'task', 1
+
+
+@pytest.fixture
+def youtube_service(monkeypatch):
+    service = FakeYoutubeService()
+    monkeypatch.setitem(sys.modules, 'app', types.SimpleNamespace(
+        youtube_service=service, video_service=None, url_pipeline=None))
+    return service
+
+
+@pytest.fixture
+def client(youtube_service):
+    app = Flask(__name__)
+    Api(app).add_resource(YoutubeDownloadResource, '/api/youtube/download')
+    return app.test_client()
+
+
+def test_client_cannot_raise_priority(client, youtube_service):
+    response = client.post('/api/youtube/download', json={'url': 'https://youtu.be/x', 'priority': -100})
+
+    assert response.status_code == 200
+    assert youtube_service.priorities == [0]
+
+
+def test_client_can_lower_priority(client, youtube_service):
+    client.post('/api/youtube/download', json={'url': 'https://youtu.be/x', 'priority': 5})
+
+    assert youtube_service.priorities == [5]
+
+
+def test_non_integer_priority_returns_400(client):
+    response = client.post('/api/youtube/download', json={'url': 'https://youtu.be/x', 'priority': 'high'})
+
+    assert response.status_code == 400
@@ -0,0 +1,57 @@
+import threading
+import pytest
+from conftest import wait_for
+from services.youtube_service import VideoDownloadService, MODE_VIDEO
+
+
+@pytest.fixture
+def downloads(isolated_config, monkeypatch):
+    """_download 阻塞到测试放行，记录每次真正下载的文件名"""
+    service = VideoDownloadService()
+    release = threading.Event()
+    started = []
+
+    def fake_download(url, host, key, task_ids, mode, filename=None):
+        started.append(filename)
+        release.wait(5)
+        return {'title': 'Lecture', 'filename': filename or 'Lecture.mp4', 'duration': 12,
+                'audio_only': False, 'source_url': url}
+
+    monkeypatch.setattr(service, '_download', fake_download)
+    service.release = release
+    service.started = started
+    return service
+
+
+def run(service, task_id, filename):
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(
+        result=service.download_video('https://youtu.be/dQw4w9WgXcQ', task_id, mode=MODE_VIDEO, filename=filename)))
+    thread.start()
+    return thread, results
+
+
+def test_overlapping_video_fetches_keep_their_own_filenames(downloads):
+    first, first_result = run(downloads, 'task-a', 'a.mp4')
+    second, second_result = run(downloads, 'task-b', 'b.mp4')
+    assert wait_for(lambda: len(downloads.started) == 2)
+    downloads.release.set()
+    first.join(5)
+    second.join(5)
+
+    assert sorted(downloads.started) == ['a.mp4', 'b.mp4']
+    assert first_result['result']['filename'] == 'a.mp4'
+    assert second_result['result']['filename'] == 'b.mp4'
+
+
+def test_same_download_is_shared(downloads):
+    first, first_result = run(downloads, 'task-a', None)
+    second, second_result = run(downloads, 'task-b', None)
+    assert wait_for(lambda: sum(len(d['task_ids']) for d in downloads.inflight.values()) == 2)
+    downloads.release.set()
+    first.join(5)
+    second.join(5)
+
+    assert downloads.started == [None]
+    assert first_result['result'] == second_result['result']
+    assert downloads.get_progress('task-b')['video_path'] == 'Lecture.mp4'